@@ -0,0 +1,180 @@
+import os
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import ai_response
+
+# --- AI Response Cache ---
+# Two-tier cache for AI responses: an in-memory LRU in front of an on-disk store
+# that survives restarts. Entries are keyed on (provider, model, prompt, tools hash),
+# so the same prompt sent to a different model or with different tools is a miss.
+# Disk entries are JSON (an AIResult's text, tool calls and metadata), never pickles, so a file
+# planted in the cache directory can at worst be a wrong narration, not code that runs on load.
+
+CACHE_FILE_SUFFIX = ".json"
+LEGACY_CACHE_FILE_SUFFIX = ".pkl" # Pickled entries of older versions: never read, only removed by clear()
+
+def hash_tools(tools):
+    """Returns a stable short hash for a tool/function declaration list."""
+    if not tools:
+        return "no-tools"
+    try:
+        encoded = json.dumps(tools, sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        encoded = repr(tools)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+def make_cache_key(provider, model, prompt_text, tools_hash):
+    """Builds the content-addressed key used by both cache tiers."""
+    raw_key = "\x1f".join([str(provider), str(model), tools_hash, prompt_text])
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    def __init__(self, cache_dir=None, max_memory_entries=256, max_disk_entries=4096, ttl_seconds=None):
+        # Resolved once, so a relative directory does not follow later changes of the working directory
+        self.cache_dir = os.path.abspath(cache_dir) if cache_dir else None
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict() # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError as e:
+                print(f"Error creating AI cache directory {self.cache_dir}: {e}. Disk cache disabled.")
+                self.cache_dir = None
+
+    # --- Internal helpers ---
+    def _is_expired(self, stored_at):
+        return self.ttl_seconds is not None and (time.time() - stored_at) > self.ttl_seconds
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}{CACHE_FILE_SUFFIX}")
+
+    def _remember_in_memory(self, key, stored_at, value):
+        # Caller must hold self._lock
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            stored_at = entry["stored_at"]
+            value = ai_response.AIResult.from_dict(entry["result"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            # Corrupted or incompatible entry (e.g. written by another version) - drop it
+            self._remove_disk(key)
+            return None
+        if self._is_expired(stored_at):
+            self._remove_disk(key)
+            return None
+        return stored_at, value
+
+    def _write_disk(self, key, stored_at, value):
+        if not self.cache_dir or not isinstance(value, ai_response.AIResult):
+            return # Only AIResults have a disk form; anything else stays in the memory tier
+        path = self._disk_path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"stored_at": stored_at, "result": value.to_dict()}, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            # Tool-call arguments that are not JSON-serializable; memory tier still works
+            try: os.remove(tmp_path)
+            except OSError: pass
+            return
+        self._enforce_disk_limit()
+
+    def _remove_disk(self, key):
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _enforce_disk_limit(self):
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith(CACHE_FILE_SUFFIX)]
+        except OSError:
+            return
+        overflow = len(entries) - self.max_disk_entries
+        if overflow <= 0:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime) # Oldest first
+        for entry in entries[:overflow]:
+            try:
+                os.remove(entry.path)
+                self.evictions += 1
+            except OSError:
+                pass
+
+    # --- Public API ---
+    def get(self, key):
+        """Returns the cached value for key, or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._is_expired(stored_at):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+        disk_entry = self._read_disk(key)
+        with self._lock:
+            if disk_entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = disk_entry
+            self._remember_in_memory(key, stored_at, value)
+            self.hits += 1
+            self.disk_hits += 1
+            return value
+
+    def put(self, key, value):
+        stored_at = time.time()
+        with self._lock:
+            self._remember_in_memory(key, stored_at, value)
+        self._write_disk(key, stored_at, value)
+
+    def clear(self, include_disk=True):
+        with self._lock:
+            self._memory.clear()
+        if include_disk and self.cache_dir:
+            try:
+                for entry in os.scandir(self.cache_dir):
+                    if entry.name.endswith((CACHE_FILE_SUFFIX, LEGACY_CACHE_FILE_SUFFIX)):
+                        try: os.remove(entry.path)
+                        except OSError: pass
+            except OSError:
+                pass
+
+    def stats(self):
+        """Returns hit/miss counters for debugging and metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
@@ -0,0 +1,159 @@
+import time
+import random
+import threading
+
+# --- Client-Side Rate Limiting and Circuit Breaking ---
+# ai_utils keeps one RateLimiter and one CircuitBreaker per process and routes every provider call
+# (sync, async, streamed, prefetched) through them, so a provider brownout slows and then stops our
+# traffic instead of multiplying it with retries.
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate_per_minute, holding at most `capacity` tokens."""
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self._last_refill = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_second)
+
+    def reserve(self, amount, now):
+        """Takes `amount` tokens, going into debt if needed. Returns the seconds until the debt is repaid."""
+        self._refill(now)
+        self.tokens -= amount
+        if self.tokens >= 0 or self.rate_per_second <= 0:
+            return 0.0
+        return -self.tokens / self.rate_per_second
+
+    def refund(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class RateLimiter:
+    """Limits requests per minute and (estimated) tokens per minute. Thread-safe."""
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+        self.total_wait_seconds = 0.0
+        self.throttled_requests = 0
+
+    def reserve(self, estimated_tokens):
+        """Reserves capacity for one request and returns how long the caller must wait before sending it.
+
+        Reserving up front (instead of polling) keeps callers in FIFO order and works the same for
+        time.sleep() and asyncio.sleep() callers.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait_seconds = 0.0
+            if self.request_bucket:
+                wait_seconds = max(wait_seconds, self.request_bucket.reserve(1, now))
+            if self.token_bucket:
+                wait_seconds = max(wait_seconds, self.token_bucket.reserve(estimated_tokens, now))
+            if wait_seconds > 0:
+                self.throttled_requests += 1
+                self.total_wait_seconds += wait_seconds
+            return wait_seconds
+
+    def reconcile(self, estimated_tokens, actual_tokens):
+        """Corrects the token bucket once the provider reports real usage."""
+        if not self.token_bucket or actual_tokens is None:
+            return
+        with self._lock:
+            difference = estimated_tokens - actual_tokens
+            if difference > 0:
+                self.token_bucket.refund(difference)
+            else:
+                self.token_bucket.tokens += difference # Used more than estimated; take it now
+
+    def get_state(self):
+        with self._lock:
+            now = time.monotonic()
+            state = {"throttled_requests": self.throttled_requests, "total_wait_seconds": round(self.total_wait_seconds, 3)}
+            if self.request_bucket:
+                self.request_bucket._refill(now)
+                state["request_tokens_available"] = round(self.request_bucket.tokens, 2)
+            if self.token_bucket:
+                self.token_bucket._refill(now)
+                state["model_tokens_available"] = round(self.token_bucket.tokens, 2)
+            return state
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and stays open for `reset_timeout` seconds.
+
+    After the timeout one trial request is let through (half-open); its result closes or re-opens the circuit.
+    Callers must report every request they were allowed: record_success() or record_failure() for one that reached
+    the provider, release() for one that ended before it did (no client, a caller that stopped listening), which
+    frees a half-open trial without counting against the provider. A trial that never reports back (a crashed
+    caller) expires after another reset_timeout so the next request can try.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._trial_started_at = None
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and self._trial_in_flight and now - self._trial_started_at >= self.reset_timeout:
+                self._trial_in_flight = False # The trial never reported back; let another one through
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_started_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def release(self):
+        """Ends an allowed request that says nothing about the provider's health; the state is unchanged."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def get_state(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+            }
+
+def backoff_delay(attempt, base_seconds, max_seconds, rng=random):
+    """Exponential backoff with full jitter: uniform in [0, min(max, base * 2**attempt)]."""
+    return rng.uniform(0, min(max_seconds, base_seconds * (2 ** attempt)))
+
+def estimate_tokens(prompt_text, expected_completion_tokens):
+    # Roughly four characters per token for English prose
+    return len(prompt_text) // 4 + expected_completion_tokens
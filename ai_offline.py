@@ -0,0 +1,131 @@
+import re
+import time
+import random
+import hashlib
+
+import items
+import entities
+import locations
+import ai_response
+
+# --- Offline Narration Provider ---
+# A local stand-in for the AI provider, selected with config.AI_PROVIDER = "OFFLINE" (or used automatically
+# when the real provider cannot be initialized and config.AI_FALLBACK_TO_OFFLINE is set, which leaves
+# config.AI_PROVIDER alone and sets config.offline_fallback_active). It answers the same
+# prompts game_session sends with the same function calls, filled from templates and the game data, so the
+# game loop can run without the network. Output is deterministic for a given (seed, prompt).
+
+ITEM_CALL_PATTERN = re.compile(r"call 'player_discovers_item' with item_id='([\w.-]+)'")
+ENEMY_CALL_PATTERN = re.compile(r"call 'player_encounters_enemy' with enemy_id='([\w.-]+)'")
+
+LOCATION_TEMPLATES = [
+    "You arrive at {name}. {poi} Paths lead {exits}.",
+    "{name} stretches out before you. {poi} From here you could head {exits}.",
+    "The air shifts as you reach {name}. {poi} The way onward lies {exits}.",
+]
+ITEM_TEMPLATES = [
+    "Something catches your eye: {name}. {description}",
+    "Half-hidden, you find {article} {name}. {description}",
+    "Your search is rewarded with {article} {name}. {description}",
+]
+ENEMY_TEMPLATES = [
+    "A {name} bars your way! {description}",
+    "Without warning, a {name} lunges from cover. {description}",
+    "You hear it before you see it: a {name}. {description}",
+]
+NARRATIVE_TEMPLATES = [
+    "You take your time and study the scene. {detail}",
+    "Nothing stirs for a long moment. {detail}",
+    "You commit the details to memory. {detail}",
+]
+NARRATIVE_DETAILS = [
+    "The wind carries the faint smell of salt and old stone.",
+    "Somewhere in the distance, a bird calls once and falls silent.",
+    "Whatever happened here happened long ago.",
+    "You cannot shake the feeling that you are being watched.",
+]
+
+def _article(word):
+    return "an" if word[:1].lower() in "aeiou" else "a"
+
+class OfflineNarrationProvider:
+    def __init__(self, latency_seconds=0.0, seed=0):
+        self.latency_seconds = latency_seconds
+        self.seed = seed
+        # Location prompts are fixed strings in locations.LOCATIONS, so map them back to their location once
+        self._location_by_prompt = {}
+        for location_id, location_data in locations.LOCATIONS.items():
+            for prompt_key in ('description_first_visit_prompt', 'description_revisit_prompt'):
+                if location_data.get(prompt_key):
+                    self._location_by_prompt[location_data[prompt_key]] = location_id
+
+    def _rng_for(self, prompt_text):
+        digest = hashlib.sha256(f"{self.seed}:{prompt_text}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    # --- Public API (mirrors what ai_utils needs from a provider) ---
+    def generate(self, prompt_text):
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+        return self._build_result(prompt_text)
+
+    async def generate_async(self, prompt_text):
+        if self.latency_seconds > 0:
+            import asyncio
+            await asyncio.sleep(self.latency_seconds)
+        return self._build_result(prompt_text)
+
+    def stream(self, prompt_text):
+        """Yields the narrative a few words at a time, like a streaming provider would."""
+        result = self.generate(prompt_text)
+        function_call = result.first_call()
+        text = function_call.args.get(self._narrative_argument(function_call.name), "") if function_call else result.text
+        words = text.split(" ")
+        for i in range(0, len(words), 4):
+            yield " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")
+
+    # --- Template filling ---
+    @staticmethod
+    def _narrative_argument(function_name):
+        return {"player_discovers_item": "discovery_narrative", "player_encounters_enemy": "encounter_narrative"}.get(function_name, "narrative_text")
+
+    def _build_result(self, prompt_text):
+        start_time = time.perf_counter()
+        rng = self._rng_for(prompt_text)
+
+        item_match = ITEM_CALL_PATTERN.search(prompt_text)
+        enemy_match = ENEMY_CALL_PATTERN.search(prompt_text)
+        if item_match:
+            function_call = self._item_call(item_match.group(1), rng)
+        elif enemy_match:
+            function_call = self._enemy_call(enemy_match.group(1), rng)
+        elif prompt_text in self._location_by_prompt:
+            function_call = self._location_call(self._location_by_prompt[prompt_text], rng)
+        else:
+            narrative = rng.choice(NARRATIVE_TEMPLATES).format(detail=rng.choice(NARRATIVE_DETAILS))
+            function_call = ai_response.FunctionCall("narrative_outcome", {"narrative_text": narrative})
+
+        prompt_tokens = len(prompt_text.split())
+        completion_tokens = len(next(iter(function_call.args.values()), "").split())
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        return ai_response.AIResult("", [function_call], "stop", usage, time.perf_counter() - start_time + self.latency_seconds, provider="OFFLINE", model="offline-templates")
+
+    def _item_call(self, item_id, rng):
+        item_data = items.ITEM_DB.get(item_id, {})
+        name = item_data.get("name", item_id.replace("_", " "))
+        narrative = rng.choice(ITEM_TEMPLATES).format(name=name, article=_article(name), description=item_data.get("description", ""))
+        return ai_response.FunctionCall("player_discovers_item", {"item_id": item_id, "discovery_narrative": narrative.strip()})
+
+    def _enemy_call(self, enemy_id, rng):
+        enemy_data = entities.ENEMY_TEMPLATES.get(enemy_id, {})
+        narrative = rng.choice(ENEMY_TEMPLATES).format(name=enemy_data.get("name", "creature"), description=enemy_data.get("description", ""))
+        return ai_response.FunctionCall("player_encounters_enemy", {"enemy_id": enemy_id, "encounter_narrative": narrative.strip()})
+
+    def _location_call(self, location_id, rng):
+        location_data = locations.LOCATIONS[location_id]
+        pois = location_data.get('defined_pois', [])
+        poi_text = f"You notice {rng.choice(pois).get('display_text_for_player_choice', '').rstrip('.').lower()}." if pois else ""
+        exit_names = list(location_data.get('exits', {}).keys())
+        exits_text = " or ".join(exit_names) if exit_names else "nowhere obvious"
+        narrative = rng.choice(LOCATION_TEMPLATES).format(name=location_data.get('name', location_id), poi=poi_text, exits=exits_text)
+        return ai_response.FunctionCall("narrative_outcome", {"narrative_text": " ".join(narrative.split())})
@@ -0,0 +1,84 @@
+import threading
+
+import config
+import locations
+import ai_utils
+
+# --- Neighbour Description Prefetching ---
+# A location's exits fully determine where the player can go next, so while they are
+# busy at the current location we ask the AI for every neighbour's first-visit description
+# in the background. A later move then takes the parked result instead of blocking on the network.
+# The neighbours are fetched as one concurrent batch (ai_utils.gather_ai_responses) on the shared
+# async loop, so a session needs no threads of its own for it, however many neighbours there are.
+
+def get_first_visit_prompt(location_id):
+    """Returns the prompt game_session sends when the player moves into location_id."""
+    location_data = locations.LOCATIONS.get(location_id)
+    if not location_data:
+        return None
+    return location_data.get('description_first_visit_prompt', f"You arrive at {location_data.get('name')}.")
+
+class PrefetchScheduler:
+    def __init__(self, submit_fn=None, max_in_flight=4):
+        # submit_fn(prompts) -> concurrent.futures.Future of the responses, in prompt order
+        self.submit_fn = submit_fn or (lambda prompts: ai_utils.submit_ai_model_responses(prompts, call_site="prefetch"))
+        self.max_in_flight = max_in_flight
+        self._pending = {} # location_id -> (batch Future, index of its response in the batch)
+        self._lock = threading.Lock()
+
+    def _in_flight_count(self):
+        # Caller must hold self._lock
+        return sum(1 for batch, _index in self._pending.values() if not batch.done())
+
+    def prefetch_neighbours(self, location_id):
+        """Starts first-visit descriptions for every exit of location_id in one batch, replacing older prefetches."""
+        location_data = locations.LOCATIONS.get(location_id, {})
+        neighbour_ids = [dest for dest in location_data.get('exits', {}).values() if dest in locations.LOCATIONS]
+        with self._lock:
+            # Anything not adjacent to the new location is no longer useful
+            for stale_id in [loc_id for loc_id in self._pending if loc_id not in neighbour_ids]:
+                del self._pending[stale_id]
+            to_fetch = []
+            for neighbour_id in neighbour_ids:
+                if neighbour_id in self._pending or neighbour_id in to_fetch:
+                    continue
+                if self._in_flight_count() + len(to_fetch) >= self.max_in_flight:
+                    if config.DEBUG_MODE: print(f"DEBUG: Prefetch limit reached, skipping '{neighbour_id}'.")
+                    break
+                to_fetch.append(neighbour_id)
+            if not to_fetch:
+                return
+            batch = self.submit_fn([get_first_visit_prompt(neighbour_id) for neighbour_id in to_fetch])
+            for index, neighbour_id in enumerate(to_fetch):
+                self._pending[neighbour_id] = (batch, index)
+
+    def take(self, location_id, timeout=None):
+        """Returns the prefetched response for location_id (waiting for its batch if still running), or None.
+
+        Error responses count as missing, so the caller makes its own request. Taking a result means the
+        player has left, so every other prefetch is dropped.
+        """
+        with self._lock:
+            entry = self._pending.pop(location_id, None)
+            self._pending.clear()
+        if entry is None:
+            return None
+        batch, index = entry
+        try:
+            result = batch.result(timeout=timeout)[index]
+        except Exception as e: # TimeoutError or an error raised inside the batch
+            if config.DEBUG_MODE: print(f"DEBUG: Prefetch for '{location_id}' unusable: {e}")
+            return None
+        if result.is_error:
+            if config.DEBUG_MODE: print(f"DEBUG: Prefetch for '{location_id}' failed: {result.error}")
+            return None
+        return result
+
+    def cancel_all(self):
+        # Batches already started are not interrupted (a cancelled request would count as a provider timeout with
+        # the circuit breaker); they finish on the shared loop and still warm the response cache.
+        with self._lock:
+            self._pending.clear()
+
+    def shutdown(self):
+        self.cancel_all()
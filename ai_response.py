@@ -0,0 +1,149 @@
+import json
+
+# --- Normalized AI Response ---
+# Every provider response is decoded exactly once into an AIResult, so game code reads
+# result.text / result.function_calls instead of walking Gemini candidates or OpenAI choices
+# and re-parsing tool-call JSON at each call site.
+
+class FunctionCall:
+    __slots__ = ("name", "args")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args # Always a plain dict
+
+    def __repr__(self):
+        return f"FunctionCall({self.name!r}, {self.args!r})"
+
+class AIResult:
+    __slots__ = ("text", "function_calls", "finish_reason", "usage", "latency", "error", "provider", "model")
+
+    def __init__(self, text="", function_calls=None, finish_reason=None, usage=None, latency=0.0, error=None, provider=None, model=None):
+        self.text = text
+        self.function_calls = function_calls or []
+        self.finish_reason = finish_reason
+        self.usage = usage or {} # {"prompt_tokens", "completion_tokens", "total_tokens"} when the provider reports them
+        self.latency = latency # Seconds of wall time for the provider call
+        self.error = error # Error message string, or None on success
+        self.provider = provider
+        self.model = model
+
+    @property
+    def is_error(self):
+        return self.error is not None
+
+    def first_call(self, names=None):
+        """Returns the first function call (optionally restricted to the given names), or None."""
+        for call in self.function_calls:
+            if names is None or call.name in names:
+                return call
+        return None
+
+    def to_dict(self):
+        """The result as plain JSON-compatible data (for ai_cache's disk tier)."""
+        return {
+            "text": self.text,
+            "function_calls": [{"name": call.name, "args": call.args} for call in self.function_calls],
+            "finish_reason": self.finish_reason,
+            "usage": self.usage,
+            "latency": self.latency,
+            "error": self.error,
+            "provider": self.provider,
+            "model": self.model,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        function_calls = [FunctionCall(call["name"], call["args"]) for call in data["function_calls"]]
+        return cls(data["text"], function_calls, data["finish_reason"], data["usage"], data["latency"], data["error"], data["provider"], data["model"])
+
+    def __repr__(self):
+        if self.error:
+            return f"AIResult(error={self.error!r})"
+        return f"AIResult(text={self.text[:40]!r}, function_calls={self.function_calls!r}, finish_reason={self.finish_reason!r})"
+
+def make_error_result(error_message, provider=None, model=None, latency=0.0):
+    return AIResult(error=error_message, finish_reason="error", provider=provider, model=model, latency=latency)
+
+def parse_tool_arguments(raw_arguments):
+    if isinstance(raw_arguments, dict):
+        return raw_arguments
+    if not raw_arguments:
+        return {}
+    try:
+        parsed = json.loads(raw_arguments)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+# --- Provider decoders ---
+def gemini_usage(response):
+    usage_metadata = getattr(response, "usage_metadata", None)
+    if not usage_metadata:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage_metadata, "prompt_token_count", None),
+        "completion_tokens": getattr(usage_metadata, "candidates_token_count", None),
+        "total_tokens": getattr(usage_metadata, "total_token_count", None),
+    }
+
+def openai_usage(response):
+    if not getattr(response, "usage", None):
+        return {}
+    return {
+        "prompt_tokens": response.usage.prompt_tokens,
+        "completion_tokens": response.usage.completion_tokens,
+        "total_tokens": response.usage.total_tokens,
+    }
+
+def response_usage(provider, response):
+    """The token usage of a raw provider response, without decoding its content."""
+    if provider == "GEMINI":
+        return gemini_usage(response)
+    if provider == "OPENAI":
+        return openai_usage(response)
+    return {}
+
+def decode_gemini_response(response, latency=0.0, model=None):
+    text_parts = []
+    function_calls = []
+    finish_reason = None
+    candidates = response.candidates or []
+    if candidates:
+        candidate = candidates[0]
+        finish_reason = getattr(candidate.finish_reason, "name", candidate.finish_reason)
+        parts = candidate.content.parts if candidate.content else None
+        for part in parts or []:
+            function_call = getattr(part, "function_call", None)
+            if function_call:
+                function_calls.append(FunctionCall(function_call.name, dict(function_call.args or {})))
+            elif getattr(part, "text", None):
+                text_parts.append(part.text)
+
+    return AIResult("".join(text_parts), function_calls, finish_reason, gemini_usage(response), latency, provider="GEMINI", model=model)
+
+def decode_openai_response(response, latency=0.0, model=None):
+    text = ""
+    function_calls = []
+    finish_reason = None
+    if response.choices:
+        choice = response.choices[0]
+        finish_reason = choice.finish_reason
+        message = choice.message
+        text = message.content or ""
+        for tool_call in message.tool_calls or []:
+            function_calls.append(FunctionCall(tool_call.function.name, parse_tool_arguments(tool_call.function.arguments)))
+
+    return AIResult(text, function_calls, finish_reason, openai_usage(response), latency, provider="OPENAI", model=model or getattr(response, "model", None))
+
+def decode_response(provider, response, latency=0.0, model=None):
+    """Decodes a raw provider response (or one of ai_utils' error dicts) into an AIResult."""
+    if isinstance(response, AIResult):
+        return response
+    if isinstance(response, dict):
+        return make_error_result(response.get("error_message", "[AI Error - Unknown error]"), provider, model, latency)
+    if provider == "GEMINI":
+        return decode_gemini_response(response, latency, model)
+    if provider == "OPENAI":
+        return decode_openai_response(response, latency, model)
+    return make_error_result(f"[AI Error - Cannot decode response for provider {provider}]", provider, model, latency)
@@ -0,0 +1,101 @@
+import json
+import time
+import threading
+from collections import deque
+
+# --- AI Call Telemetry ---
+# One AICallRecord per AI call (including cache hits), kept in a bounded ring buffer with percentile
+# summaries per call site, and optionally appended to a JSONL file for offline analysis.
+
+class AICallRecord:
+    __slots__ = ("timestamp", "provider", "model", "call_site", "attempts", "wall_time", "time_to_first_token",
+                 "prompt_tokens", "completion_tokens", "cache_hit", "error_class")
+
+    def __init__(self, provider, model, call_site, attempts=0, wall_time=0.0, time_to_first_token=None,
+                 prompt_tokens=None, completion_tokens=None, cache_hit=False, error_class=None):
+        self.timestamp = time.time()
+        self.provider = provider
+        self.model = model
+        self.call_site = call_site or "unspecified"
+        self.attempts = attempts
+        self.wall_time = wall_time
+        self.time_to_first_token = time_to_first_token
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cache_hit = cache_hit
+        self.error_class = error_class
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+class TelemetryRecorder:
+    def __init__(self, buffer_size=1000, jsonl_path=None):
+        self.records = deque(maxlen=buffer_size)
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+
+    def record(self, call_record):
+        with self._lock:
+            self.records.append(call_record)
+            if self.jsonl_path:
+                try:
+                    with open(self.jsonl_path, 'a') as f:
+                        f.write(json.dumps(call_record.to_dict()) + "\n")
+                except OSError as e:
+                    print(f"Error writing AI telemetry to {self.jsonl_path}: {e}. JSONL sink disabled.")
+                    self.jsonl_path = None
+
+    def summary(self):
+        """Returns {call_site: stats} over the records currently in the ring buffer."""
+        with self._lock:
+            records = list(self.records)
+        by_site = {}
+        for call_record in records:
+            by_site.setdefault(call_record.call_site, []).append(call_record)
+
+        summaries = {}
+        for call_site, site_records in by_site.items():
+            wall_times = sorted(r.wall_time for r in site_records)
+            first_token_times = sorted(r.time_to_first_token for r in site_records if r.time_to_first_token is not None)
+            errors = {}
+            for r in site_records:
+                if r.error_class:
+                    errors[r.error_class] = errors.get(r.error_class, 0) + 1
+            summaries[call_site] = {
+                "calls": len(site_records),
+                "cache_hit_rate": sum(1 for r in site_records if r.cache_hit) / len(site_records),
+                "attempts": sum(r.attempts for r in site_records),
+                "wall_time_total": sum(wall_times),
+                "wall_time_p50": percentile(wall_times, 0.50),
+                "wall_time_p90": percentile(wall_times, 0.90),
+                "wall_time_p99": percentile(wall_times, 0.99),
+                "ttft_p50": percentile(first_token_times, 0.50),
+                "ttft_p90": percentile(first_token_times, 0.90),
+                "prompt_tokens": sum(r.prompt_tokens or 0 for r in site_records),
+                "completion_tokens": sum(r.completion_tokens or 0 for r in site_records),
+                "errors": errors,
+            }
+        return summaries
+
+    def format_summary(self):
+        lines = ["--- AI Call Telemetry ---"]
+        summaries = self.summary()
+        if not summaries:
+            lines.append("(no AI calls recorded)")
+        # Most expensive call sites first
+        for call_site, stats in sorted(summaries.items(), key=lambda item: item[1]["wall_time_total"], reverse=True):
+            ttft = f"{stats['ttft_p50'] * 1000:.0f}ms" if stats["ttft_p50"] is not None else "n/a"
+            lines.append(
+                f"{call_site}: {stats['calls']} calls, total {stats['wall_time_total']:.2f}s, "
+                f"p50 {stats['wall_time_p50'] * 1000:.0f}ms / p90 {stats['wall_time_p90'] * 1000:.0f}ms, ttft p50 {ttft}, "
+                f"cache hits {stats['cache_hit_rate']:.0%}, tokens {stats['prompt_tokens']}+{stats['completion_tokens']}, "
+                f"errors {stats['errors'] or 0}"
+            )
+        return "\n".join(lines)
@@ -1,99 +1,638 @@
 import config
 import json # For OpenAI function call args
-
-# We need to import the SDKs here too to access their specific types for response construction in error cases,
-# but only if they were successfully imported in config.py
-genai = None
-gemini_types = None
-OpenAI_SDK_Class = None # Renamed for clarity to indicate it's the class
-if config.genai:
-    genai = config.genai
-    gemini_types = config.gemini_types
-if config.OpenAIClient: # Corrected to use the alias OpenAIClient from config.py
-    OpenAI_SDK_Class = config.OpenAIClient 
+import re
+import threading
+import time
+import random
+import ai_cache
+import ai_limits
+import ai_response
+import ai_telemetry
 
 MAX_AI_RETRIES = 1 # Try once more if the first attempt yields no text
 
-# Helper function for AI interaction - Returns FULL RESPONSE OBJECT
-def get_ai_model_response(prompt_text):
-    if not config.global_ai_client:
-        error_msg = f"[AI Fallback - Global AI Client not initialized for provider {config.AI_PROVIDER}. Prompt: '{prompt_text}']"
-        if config.AI_PROVIDER == "GEMINI" and genai and gemini_types:
-            error_part = gemini_types.Part(text=error_msg)
-            error_content = gemini_types.Content(parts=[error_part], role="model")
-            mock_candidate = gemini_types.Candidate(content=error_content, finish_reason=gemini_types.FinishReason.ERROR, safety_ratings=[])
-            return gemini_types.GenerateContentResponse(prompt_feedback=None, candidates=[mock_candidate])
-        else: # OpenAI or if Gemini types are not available
-            # For OpenAI, a simple dict mimicking error is fine, or a more structured one if we define it
-            return {"error_message": error_msg, "choices": []} 
+# --- Response Cache ---
+# Shared by every caller in the process. Created on first use so config values can be changed before then.
+_response_cache = None
+_tools_hash = None
+
+def get_response_cache():
+    global _response_cache
+    if config.get_active_ai_provider() == "OFFLINE":
+        return None # Offline narration is cheaper to regenerate than to look up
+    if _response_cache is None and config.AI_CACHE_ENABLED:
+        _response_cache = ai_cache.ResponseCache(
+            cache_dir=config.AI_CACHE_DIR,
+            max_memory_entries=config.AI_CACHE_MAX_MEMORY_ENTRIES,
+            max_disk_entries=config.AI_CACHE_MAX_DISK_ENTRIES,
+            ttl_seconds=config.AI_CACHE_TTL_SECONDS
+        )
+    return _response_cache
+
+# --- Rate Limiter and Circuit Breaker ---
+# Also process-wide: every caller's requests count against the same budgets and failure streak.
+_rate_limiter = None
+_circuit_breaker = None
+_offline_provider = None # Serves narration while the circuit is open
+_backoff_rng = random.Random()
+
+def get_rate_limiter():
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = ai_limits.RateLimiter(config.AI_RATE_LIMIT_RPM, config.AI_RATE_LIMIT_TPM)
+    return _rate_limiter
+
+def get_circuit_breaker():
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        _circuit_breaker = ai_limits.CircuitBreaker(config.AI_CIRCUIT_FAILURE_THRESHOLD, config.AI_CIRCUIT_RESET_SECONDS)
+    return _circuit_breaker
+
+def get_ai_limits_state():
+    """Snapshot of the shared limiter and breaker, for metrics and debugging."""
+    return {"rate_limiter": get_rate_limiter().get_state(), "circuit_breaker": get_circuit_breaker().get_state()}
+
+def _limits_apply():
+    return config.get_active_ai_provider() != "OFFLINE" # The local provider needs no protection
+
+def _estimate_tokens(prompt_text):
+    return ai_limits.estimate_tokens(prompt_text, config.AI_ESTIMATED_COMPLETION_TOKENS)
+
+def _backoff_seconds(attempt):
+    return ai_limits.backoff_delay(attempt, config.AI_BACKOFF_BASE_SECONDS, config.AI_BACKOFF_MAX_SECONDS, _backoff_rng)
+
+# --- Telemetry ---
+# One AICallRecord per public AI call (cache hits and degraded responses included), tagged with the caller's call_site.
+_telemetry = None
+
+def get_telemetry():
+    global _telemetry
+    if _telemetry is None and config.AI_TELEMETRY_ENABLED:
+        _telemetry = ai_telemetry.TelemetryRecorder(config.AI_TELEMETRY_BUFFER_SIZE, config.AI_TELEMETRY_JSONL_PATH)
+    return _telemetry
+
+def _new_call_stats():
+    # Filled in by the request functions as they go; read back by _record_call
+    return {"attempts": 0, "error_class": None, "cache_hit": False}
+
+def _record_call(call_site, call_stats, wall_time, result=None, time_to_first_token=None):
+    telemetry = get_telemetry()
+    if telemetry is None:
+        return
+    usage = (result.usage if result is not None else None) or {}
+    error_class = call_stats["error_class"]
+    if error_class is None and result is not None and result.is_error:
+        error_class = "ResponseError"
+    telemetry.record(ai_telemetry.AICallRecord(
+        provider=(result.provider if result is not None else None) or config.get_active_ai_provider(),
+        model=(result.model if result is not None else None) or get_model_name(),
+        call_site=call_site,
+        attempts=call_stats["attempts"],
+        wall_time=wall_time,
+        time_to_first_token=time_to_first_token if time_to_first_token is not None else wall_time, # Unstreamed: everything arrives at once
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+        cache_hit=call_stats["cache_hit"],
+        error_class=error_class
+    ))
+
+def _get_offline_provider():
+    global _offline_provider
+    if _offline_provider is None:
+        import ai_offline
+        _offline_provider = ai_offline.OfflineNarrationProvider(seed=config.OFFLINE_AI_SEED)
+    return _offline_provider
+
+def get_degraded_response(prompt_text):
+    """Response used while the circuit is open: offline narration if allowed, otherwise an error result."""
+    if config.AI_FALLBACK_TO_OFFLINE:
+        return _get_offline_provider().generate(prompt_text)
+    return ai_response.make_error_result(f"[AI Error - {config.get_active_ai_provider()} circuit open after repeated failures]", config.get_active_ai_provider(), get_model_name())
+
+def get_model_name():
+    if config.get_active_ai_provider() == "GEMINI": return config.GEMINI_MODEL_NAME
+    if config.get_active_ai_provider() == "OPENAI": return config.OPENAI_MODEL_NAME
+    return config.get_active_ai_provider()
+
+def get_response_cache_key(prompt_text):
+    global _tools_hash
+    if _tools_hash is None:
+        tools = config.openai_tools_list if config.get_active_ai_provider() == "OPENAI" else config.RAW_FUNCTION_DECLARATIONS
+        _tools_hash = ai_cache.hash_tools(tools)
+    return ai_cache.make_cache_key(config.get_active_ai_provider(), get_model_name(), prompt_text, _tools_hash)
+
+def get_cached_response(prompt_text, call_site=None):
+    """Returns the cached response for prompt_text without calling the provider, or None.
+
+    A hit is recorded in telemetry like a cache hit of get_ai_model_response; a miss is not, since the caller
+    goes on to make (and record) the real call.
+    """
+    start_time = time.perf_counter()
+    cache = get_response_cache() if config.get_ai_client() else None
+    cached_result = cache.get(get_response_cache_key(prompt_text)) if cache else None
+    if cached_result is None:
+        return None
+    # Entries written before responses were normalized hold raw SDK objects; decode_response passes AIResults through
+    result = ai_response.decode_response(config.get_active_ai_provider(), cached_result, model=get_model_name())
+    call_stats = _new_call_stats()
+    call_stats["cache_hit"] = True
+    _record_call(call_site, call_stats, time.perf_counter() - start_time, result)
+    return result
+
+def is_error_response(response):
+    if isinstance(response, ai_response.AIResult):
+        return response.is_error
+    return isinstance(response, dict) and bool(response.get("error_message"))
 
+def build_openai_request_params(prompt_text):
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant for a text-based RPG. You will respond by calling provided functions to describe game events like finding items, encountering enemies, or pure narrative outcomes."},
+        {"role": "user", "content": prompt_text}
+    ]
+    api_call_params = {
+        "model": config.OPENAI_MODEL_NAME,
+        "messages": messages,
+        "temperature": 0.7, # Can be in config later
+        "max_tokens": 1024   # Can be in config later
+    }
+    if config.openai_tools_list:
+        api_call_params["tools"] = config.openai_tools_list
+        api_call_params["tool_choice"] = "auto" # or "any" to force, or specific func
+    return api_call_params
+
+# Helper function for AI interaction - Returns a decoded ai_response.AIResult (served from cache when possible)
+def get_ai_model_response(prompt_text, use_cache=True, call_site=None):
+    call_stats = _new_call_stats()
+    start_time = time.perf_counter()
+    result = _get_ai_model_response(prompt_text, use_cache, call_stats)
+    _record_call(call_site, call_stats, time.perf_counter() - start_time, result)
+    return result
+
+def _get_ai_model_response(prompt_text, use_cache, call_stats):
+    cache = get_response_cache() if use_cache and config.get_ai_client() else None
+    if cache:
+        cache_key = get_response_cache_key(prompt_text)
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            if config.DEBUG_MODE: print(f"DEBUG: AI cache hit for prompt: {prompt_text[:80]}...")
+            call_stats["cache_hit"] = True
+            return ai_response.decode_response(config.get_active_ai_provider(), cached_result, model=get_model_name())
+
+    if _limits_apply() and not get_circuit_breaker().allow_request():
+        if config.DEBUG_MODE: print(f"DEBUG: {config.get_active_ai_provider()} circuit open, using degraded narration.")
+        call_stats["error_class"] = "CircuitOpen"
+        return get_degraded_response(prompt_text)
+
+    start_time = time.perf_counter()
+    raw_response = _request_ai_model_response(prompt_text, call_stats)
+    result = ai_response.decode_response(config.get_active_ai_provider(), raw_response, time.perf_counter() - start_time, get_model_name())
+    if cache and not result.is_error:
+        cache.put(cache_key, result)
+    if result.is_error and _limits_apply() and get_circuit_breaker().state == ai_limits.CircuitBreaker.OPEN:
+        return get_degraded_response(prompt_text) # This failure tripped the breaker
+    return result
+
+def _record_provider_success(estimated_tokens, raw_response):
+    get_circuit_breaker().record_success()
+    usage = ai_response.response_usage(config.get_active_ai_provider(), raw_response) # Only the usage; the caller decodes the content once
+    get_rate_limiter().reconcile(estimated_tokens, usage.get("total_tokens"))
+
+def _request_ai_model_response(prompt_text, call_stats=None):
+    if call_stats is None:
+        call_stats = _new_call_stats()
+    limits_apply = _limits_apply()
+    estimated_tokens = _estimate_tokens(prompt_text)
     for attempt in range(MAX_AI_RETRIES + 1):
-        if config.DEBUG_MODE:
-            print(f"DEBUG: AI Provider: {config.AI_PROVIDER}, Prompt (Attempt {attempt + 1}): {prompt_text[:200]}...")
+        if limits_apply and attempt > 0 and not get_circuit_breaker().allow_request():
+            call_stats["error_class"] = "CircuitOpen"
+            return {"error_message": f"[AI Error - {config.get_active_ai_provider()} circuit opened during retries]"}
+        # Every attempt let through the circuit breaker must report back, or a half-open trial would never end.
+        # Provider errors and empty responses are failures; an exit before the provider was reached (no client,
+        # missing SDK, unknown provider, an interrupt) releases the trial without counting against the provider
+        outcome_recorded = False
         try:
-            if config.AI_PROVIDER == "GEMINI":
-                response = config.global_ai_client.generate_content(
+            if not config.get_ai_client():
+                call_stats["error_class"] = "ClientUnavailable"
+                return {"error_message": f"[AI Fallback - Global AI Client not initialized for provider {config.get_active_ai_provider()}. Prompt: '{prompt_text}']"}
+            if limits_apply:
+                wait_seconds = get_rate_limiter().reserve(estimated_tokens)
+                if wait_seconds > 0:
+                    if config.DEBUG_MODE: print(f"DEBUG: Rate limited, waiting {wait_seconds:.2f}s before AI call.")
+                    time.sleep(wait_seconds)
+            call_stats["attempts"] = attempt + 1
+            if config.DEBUG_MODE:
+                print(f"DEBUG: AI Provider: {config.get_active_ai_provider()}, Prompt (Attempt {attempt + 1}): {prompt_text[:200]}...")
+            if config.get_active_ai_provider() == "GEMINI":
+                response = config.get_ai_client().generate_content(
                     contents=prompt_text,
                     generation_config=config.gemini_generation_config # Use Gemini specific config
                 )
                 if config.DEBUG_MODE: print(f"DEBUG: Gemini Response object received.")
                 # Basic validation for Gemini response structure
                 if not response.candidates or not response.candidates[0].content or not response.candidates[0].content.parts:
+                    call_stats["error_class"] = "EmptyResponse"
+                    if limits_apply: get_circuit_breaker().record_failure()
+                    outcome_recorded = True
                     if attempt < MAX_AI_RETRIES: continue
                     return {"error_message": "[AI Error - Gemini response missing content parts]", "candidates": []}
+                _record_provider_success(estimated_tokens, response)
+                outcome_recorded = True
+                call_stats["error_class"] = None
                 return response
             
-            elif config.AI_PROVIDER == "OPENAI":
-                if not OpenAI_SDK_Class: # Check if OpenAI SDK class was actually loaded
+            elif config.get_active_ai_provider() == "OPENAI":
+                if not config.OpenAIClient: # Check if OpenAI SDK class was actually loaded
                     return {"error_message": "[AI Error - OpenAI SDK not available but selected as provider]", "choices": []}
                 
-                messages = [
-                    {"role": "system", "content": "You are a helpful assistant for a text-based RPG. You will respond by calling provided functions to describe game events like finding items, encountering enemies, or pure narrative outcomes."},
-                    {"role": "user", "content": prompt_text}
-                ]
-                api_call_params = {
-                    "model": config.OPENAI_MODEL_NAME,
-                    "messages": messages,
-                    "temperature": 0.7, # Can be in config later
-                    "max_tokens": 1024   # Can be in config later
-                }
-                if config.openai_tools_list:
-                    api_call_params["tools"] = config.openai_tools_list
-                    api_call_params["tool_choice"] = "auto" # or "any" to force, or specific func
-                
-                response = config.global_ai_client.chat.completions.create(**api_call_params)
+                api_call_params = build_openai_request_params(prompt_text)
+                response = config.get_ai_client().chat.completions.create(**api_call_params)
                 if config.DEBUG_MODE: print(f"DEBUG: OpenAI Response object received.")
                 # Basic validation for OpenAI response structure
                 if not response.choices or not response.choices[0].message:
+                    call_stats["error_class"] = "EmptyResponse"
+                    if limits_apply: get_circuit_breaker().record_failure()
+                    outcome_recorded = True
                     if attempt < MAX_AI_RETRIES: continue
                     return {"error_message": "[AI Error - OpenAI response missing choices or message]", "choices": []}
+                _record_provider_success(estimated_tokens, response)
+                outcome_recorded = True
+                call_stats["error_class"] = None
                 return response
             
+            elif config.get_active_ai_provider() == "OFFLINE":
+                return config.get_ai_client().generate(prompt_text) # Already an AIResult
+
             else:
-                return {"error_message": f"[AI Error - Unknown AI_PROVIDER: {config.AI_PROVIDER}]", "candidates": [], "choices": []}
+                return {"error_message": f"[AI Error - Unknown AI_PROVIDER: {config.get_active_ai_provider()}]", "candidates": [], "choices": []}
 
         except Exception as e:
-            print(f"Error during AI model call with {config.AI_PROVIDER}: {e}")
+            print(f"Error during AI model call with {config.get_active_ai_provider()}: {e}")
+            call_stats["error_class"] = type(e).__name__
             if config.DEBUG_MODE: import traceback; traceback.print_exc()
+            if limits_apply: get_circuit_breaker().record_failure()
+            outcome_recorded = True
             if attempt < MAX_AI_RETRIES:
-                if config.DEBUG_MODE: print(f"DEBUG: Retrying AI call...")
+                backoff_seconds = _backoff_seconds(attempt) if limits_apply else 0
+                if config.DEBUG_MODE: print(f"DEBUG: Retrying AI call in {backoff_seconds:.2f}s...")
+                time.sleep(backoff_seconds)
                 continue
             else:
-                return {"error_message": f"[AI Error after {MAX_AI_RETRIES+1} attempts with {config.AI_PROVIDER}: {e}]", "candidates": [], "choices": []}
+                return {"error_message": f"[AI Error after {MAX_AI_RETRIES+1} attempts with {config.get_active_ai_provider()}: {e}]", "candidates": [], "choices": []}
+        finally:
+            if limits_apply and not outcome_recorded:
+                get_circuit_breaker().release()
     
     # Fallback if loop completes unexpectedly
-    return {"error_message": f"[AI Error - Unexpected exit from retry loop for {config.AI_PROVIDER}]", "candidates": [], "choices": []}
+    return {"error_message": f"[AI Error - Unexpected exit from retry loop for {config.get_active_ai_provider()}]", "candidates": [], "choices": []}
+
+# --- Async API ---
+# Same contract as get_ai_model_response (an AIResult), but built on the SDKs' async
+# clients so many prompts can be in flight from one thread. Shares the response cache with the sync path.
+async def get_ai_model_response_async(prompt_text, timeout=None, use_cache=True, call_site=None):
+    call_stats = _new_call_stats()
+    start_time = time.perf_counter()
+    result = await _get_ai_model_response_async(prompt_text, timeout, use_cache, call_stats)
+    _record_call(call_site, call_stats, time.perf_counter() - start_time, result)
+    return result
+
+async def _get_ai_model_response_async(prompt_text, timeout, use_cache, call_stats):
+    import asyncio # Deferred so importing ai_utils does not pay for asyncio
+    cache = get_response_cache() if use_cache and config.get_async_ai_client() else None
+    if cache:
+        cache_key = get_response_cache_key(prompt_text)
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            call_stats["cache_hit"] = True
+            return ai_response.decode_response(config.get_active_ai_provider(), cached_result, model=get_model_name())
+
+    if _limits_apply() and not get_circuit_breaker().allow_request():
+        call_stats["error_class"] = "CircuitOpen"
+        return get_degraded_response(prompt_text)
+
+    start_time = time.perf_counter()
+    try:
+        if timeout is not None:
+            raw_response = await asyncio.wait_for(_request_ai_model_response_async(prompt_text, call_stats), timeout)
+        else:
+            raw_response = await _request_ai_model_response_async(prompt_text, call_stats)
+    except asyncio.TimeoutError: # The cancelled request has already recorded the failure with the circuit breaker
+        call_stats["error_class"] = "Timeout"
+        raw_response = {"error_message": f"[AI Error - {config.get_active_ai_provider()} call timed out after {timeout}s]"}
+    result = ai_response.decode_response(config.get_active_ai_provider(), raw_response, time.perf_counter() - start_time, get_model_name())
+    if cache and not result.is_error:
+        cache.put(cache_key, result)
+    if result.is_error and _limits_apply() and get_circuit_breaker().state == ai_limits.CircuitBreaker.OPEN:
+        return get_degraded_response(prompt_text)
+    return result
+
+async def _request_ai_model_response_async(prompt_text, call_stats=None):
+    import asyncio # Deferred so importing ai_utils does not pay for asyncio
+    if call_stats is None:
+        call_stats = _new_call_stats()
+    limits_apply = _limits_apply()
+    estimated_tokens = _estimate_tokens(prompt_text)
+    for attempt in range(MAX_AI_RETRIES + 1):
+        if limits_apply and attempt > 0 and not get_circuit_breaker().allow_request():
+            call_stats["error_class"] = "CircuitOpen"
+            return {"error_message": f"[AI Error - {config.get_active_ai_provider()} circuit opened during retries]"}
+        # As in _request_ai_model_response; a cancellation (the caller's timeout) counts as a provider failure
+        outcome_recorded = False
+        try:
+            if not config.get_async_ai_client():
+                call_stats["error_class"] = "ClientUnavailable"
+                return {"error_message": f"[AI Fallback - Async AI client not initialized for provider {config.get_active_ai_provider()}. Prompt: '{prompt_text}']", "candidates": [], "choices": []}
+            if limits_apply:
+                wait_seconds = get_rate_limiter().reserve(estimated_tokens)
+                if wait_seconds > 0:
+                    await asyncio.sleep(wait_seconds)
+            call_stats["attempts"] = attempt + 1
+            if config.DEBUG_MODE:
+                print(f"DEBUG: Async AI Provider: {config.get_active_ai_provider()}, Prompt (Attempt {attempt + 1}): {prompt_text[:200]}...")
+            if config.get_active_ai_provider() == "GEMINI":
+                response = await config.get_async_ai_client().models.generate_content(
+                    model=config.GEMINI_MODEL_NAME,
+                    contents=prompt_text,
+                    config=config.gemini_async_generation_config
+                )
+                if not response.candidates or not response.candidates[0].content or not response.candidates[0].content.parts:
+                    call_stats["error_class"] = "EmptyResponse"
+                    if limits_apply: get_circuit_breaker().record_failure()
+                    outcome_recorded = True
+                    if attempt < MAX_AI_RETRIES: continue
+                    return {"error_message": "[AI Error - Gemini response missing content parts]", "candidates": []}
+                _record_provider_success(estimated_tokens, response)
+                outcome_recorded = True
+                call_stats["error_class"] = None
+                return response
+
+            elif config.get_active_ai_provider() == "OPENAI":
+                response = await config.get_async_ai_client().chat.completions.create(**build_openai_request_params(prompt_text))
+                if not response.choices or not response.choices[0].message:
+                    call_stats["error_class"] = "EmptyResponse"
+                    if limits_apply: get_circuit_breaker().record_failure()
+                    outcome_recorded = True
+                    if attempt < MAX_AI_RETRIES: continue
+                    return {"error_message": "[AI Error - OpenAI response missing choices or message]", "choices": []}
+                _record_provider_success(estimated_tokens, response)
+                outcome_recorded = True
+                call_stats["error_class"] = None
+                return response
+
+            elif config.get_active_ai_provider() == "OFFLINE":
+                return await config.get_async_ai_client().generate_async(prompt_text)
+
+            else:
+                return {"error_message": f"[AI Error - Unknown AI_PROVIDER: {config.get_active_ai_provider()}]", "candidates": [], "choices": []}
+
+        except asyncio.CancelledError:
+            if limits_apply: get_circuit_breaker().record_failure()
+            outcome_recorded = True
+            raise # Let timeouts and cancellation propagate to the caller
+        except Exception as e:
+            print(f"Error during async AI model call with {config.get_active_ai_provider()}: {e}")
+            call_stats["error_class"] = type(e).__name__
+            if limits_apply: get_circuit_breaker().record_failure()
+            outcome_recorded = True
+            if attempt < MAX_AI_RETRIES:
+                if limits_apply: await asyncio.sleep(_backoff_seconds(attempt))
+                continue
+            return {"error_message": f"[AI Error after {MAX_AI_RETRIES+1} attempts with {config.get_active_ai_provider()}: {e}]", "candidates": [], "choices": []}
+        finally:
+            if limits_apply and not outcome_recorded:
+                get_circuit_breaker().release()
+
+    return {"error_message": f"[AI Error - Unexpected exit from retry loop for {config.get_active_ai_provider()}]", "candidates": [], "choices": []}
+
+async def gather_ai_responses(prompts, timeout=None, call_site=None):
+    """Issues every prompt concurrently and returns the responses in the same order.
+
+    A prompt that times out or fails yields an error AIResult in its slot instead of failing the batch.
+    """
+    import asyncio
+    if timeout is None:
+        timeout = config.AI_REQUEST_TIMEOUT_SECONDS
+    return await asyncio.gather(*(get_ai_model_response_async(prompt, timeout=timeout, call_site=call_site) for prompt in prompts))
+
+# The async clients are created once, but their connection pools belong to the event loop they first ran on; a
+# fresh asyncio.run() per batch would leave them bound to a closed loop. Blocking callers (which may be several
+# threads, e.g. game_server sessions) therefore share one long-lived loop, started on first use.
+_background_loop = None
+_background_loop_lock = threading.Lock()
+
+def _get_background_loop():
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            import asyncio
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="ai-async-loop", daemon=True).start()
+            _background_loop = loop
+    return _background_loop
+
+def submit_ai_model_responses(prompts, timeout=None, call_site=None):
+    """Starts gather_ai_responses on the shared loop and returns a concurrent.futures.Future of the responses.
+
+    Lets a thread that is not running an event loop fan several prompts out and collect them later.
+    """
+    import asyncio
+    return asyncio.run_coroutine_threadsafe(gather_ai_responses(prompts, timeout=timeout, call_site=call_site), _get_background_loop())
+
+def get_ai_model_responses(prompts, timeout=None, call_site=None):
+    """Blocking wrapper around gather_ai_responses for callers that are not running an event loop."""
+    return submit_ai_model_responses(prompts, timeout, call_site).result()
+
+# --- Streaming API ---
+# Narrative argument names of our tool declarations, in the order we prefer to stream them.
+NARRATIVE_ARGUMENT_NAMES = ("narrative_text", "discovery_narrative", "encounter_narrative")
+_JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+class NarrativeArgumentStreamer:
+    """Incrementally decodes a narrative string value out of partial JSON tool-call arguments.
+
+    OpenAI streams `function.arguments` as arbitrary JSON fragments; feed() takes each fragment and
+    returns whatever new narrative text can be decoded so far, so it can be printed immediately.
+    """
+    def __init__(self, argument_names=NARRATIVE_ARGUMENT_NAMES):
+        self._key_pattern = re.compile(r'"(?:%s)"\s*:\s*"' % "|".join(re.escape(name) for name in argument_names))
+        self._buffer = ""
+        self._value_pos = None # Index in _buffer where the undecoded part of the value starts
+        self.finished = False
+
+    def feed(self, fragment):
+        if self.finished or not fragment:
+            return ""
+        self._buffer += fragment
+        if self._value_pos is None:
+            match = self._key_pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._value_pos = match.end()
+
+        decoded = []
+        pos = self._value_pos
+        while pos < len(self._buffer):
+            char = self._buffer[pos]
+            if char == '"':
+                self.finished = True
+                pos += 1
+                break
+            if char == '\\':
+                if pos + 1 >= len(self._buffer):
+                    break # Escape sequence split across fragments; wait for more
+                escape_char = self._buffer[pos + 1]
+                if escape_char == 'u':
+                    hex_digits = self._buffer[pos + 2:pos + 6]
+                    if len(hex_digits) < 4:
+                        break
+                    try: decoded.append(chr(int(hex_digits, 16)))
+                    except ValueError: pass
+                    pos += 6
+                else:
+                    decoded.append(_JSON_ESCAPES.get(escape_char, escape_char))
+                    pos += 2
+                continue
+            decoded.append(char)
+            pos += 1
+        self._value_pos = pos
+        return "".join(decoded)
+
+def stream_ai_model_response(prompt_text, call_site=None):
+    """Yields narration text chunks as the provider generates them.
+
+    Plain text content is yielded as-is; narrative tool calls have their narrative argument decoded
+    incrementally. Errors end the stream quietly, so callers should fall back to get_ai_model_response
+    if nothing was yielded.
+    """
+    if not config.get_ai_client():
+        return
+    call_stats = _new_call_stats()
+    start_time = time.perf_counter()
+    time_to_first_token = None
+    try:
+        for chunk in _stream_ai_model_response(prompt_text, call_stats):
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start_time
+            yield chunk
+    finally: # Also runs if the caller abandons the stream early
+        if time_to_first_token is None and call_stats["error_class"] is None:
+            call_stats["error_class"] = "EmptyStream"
+        _record_call(call_site, call_stats, time.perf_counter() - start_time, call_stats.get("result"), time_to_first_token)
+
+def _stream_ai_model_response(prompt_text, call_stats):
+    if config.DEBUG_MODE:
+        print(f"DEBUG: AI Provider: {config.get_active_ai_provider()}, Streaming prompt: {prompt_text[:200]}...")
+    start_time = time.perf_counter()
+    text_chunks = []
+    function_calls = [] # Gemini: complete FunctionCall objects
+    tool_call_parts = {} # OpenAI: tool call index -> [name, argument fragments]
+    finish_reason = None
+    usage = {} # Reported with the last chunk, when the provider reports it
+    limits_apply = _limits_apply()
+    estimated_tokens = _estimate_tokens(prompt_text)
+    if limits_apply and not get_circuit_breaker().allow_request():
+        call_stats["error_class"] = "CircuitOpen"
+        if config.AI_FALLBACK_TO_OFFLINE:
+            yield from _get_offline_provider().stream(prompt_text)
+        return
+    # Provider errors are failures and a finished stream is a success. A stream its consumer stopped reading
+    # (GeneratorExit, e.g. narration skipped) or one that never reached the provider says nothing about the
+    # provider's health, so it only releases the half-open trial
+    outcome_recorded = False
+    try:
+        if limits_apply:
+            wait_seconds = get_rate_limiter().reserve(estimated_tokens)
+            if wait_seconds > 0:
+                time.sleep(wait_seconds)
+        call_stats["attempts"] = 1
+        if config.get_active_ai_provider() == "OFFLINE":
+            yield from config.get_ai_client().stream(prompt_text)
+            return
+
+        if config.get_active_ai_provider() == "GEMINI":
+            response_stream = config.get_ai_client().generate_content(
+                contents=prompt_text,
+                generation_config=config.gemini_generation_config,
+                stream=True
+            )
+            for chunk in response_stream:
+                usage = ai_response.gemini_usage(chunk) or usage # Running totals; the last chunk has the final counts
+                if not chunk.candidates or not chunk.candidates[0].content:
+                    continue
+                finish_reason = getattr(chunk.candidates[0].finish_reason, "name", chunk.candidates[0].finish_reason) or finish_reason
+                for part in chunk.candidates[0].content.parts or []:
+                    function_call = getattr(part, 'function_call', None)
+                    if function_call:
+                        # Gemini delivers function call arguments whole, never split across chunks
+                        function_calls.append(ai_response.FunctionCall(function_call.name, dict(function_call.args or {})))
+                        for argument_name in NARRATIVE_ARGUMENT_NAMES:
+                            if function_call.args and function_call.args.get(argument_name):
+                                yield function_call.args[argument_name]
+                                break
+                    elif getattr(part, 'text', None):
+                        text_chunks.append(part.text)
+                        yield part.text
+
+        elif config.get_active_ai_provider() == "OPENAI":
+            api_call_params = build_openai_request_params(prompt_text)
+            api_call_params["stream"] = True
+            api_call_params["stream_options"] = {"include_usage": True} # Adds a final chunk with usage and no choices
+            argument_streamers = {} # tool call index -> NarrativeArgumentStreamer
+            for chunk in config.get_ai_client().chat.completions.create(**api_call_params):
+                usage = ai_response.openai_usage(chunk) or usage
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    text_chunks.append(delta.content)
+                    yield delta.content
+                for tool_call_delta in delta.tool_calls or []:
+                    streamer = argument_streamers.setdefault(tool_call_delta.index, NarrativeArgumentStreamer())
+                    call_parts = tool_call_parts.setdefault(tool_call_delta.index, [None, []])
+                    if tool_call_delta.function and tool_call_delta.function.name:
+                        call_parts[0] = tool_call_delta.function.name
+                    if tool_call_delta.function and tool_call_delta.function.arguments:
+                        call_parts[1].append(tool_call_delta.function.arguments)
+                        text = streamer.feed(tool_call_delta.function.arguments)
+                        if text:
+                            yield text
+            for index in sorted(tool_call_parts):
+                name, argument_fragments = tool_call_parts[index]
+                function_calls.append(ai_response.FunctionCall(name, ai_response.parse_tool_arguments("".join(argument_fragments))))
+    except Exception as e:
+        print(f"Error during streamed AI call with {config.get_active_ai_provider()}: {e}")
+        call_stats["error_class"] = type(e).__name__
+        if config.DEBUG_MODE: import traceback; traceback.print_exc()
+        if limits_apply: get_circuit_breaker().record_failure()
+        outcome_recorded = True
+        return
+    else:
+        if limits_apply: get_circuit_breaker().record_success()
+        outcome_recorded = True
+    finally:
+        if limits_apply:
+            if not outcome_recorded:
+                get_circuit_breaker().release()
+            # Correct the reserved estimate with the real usage; without it (an interrupted stream) the estimate stands
+            get_rate_limiter().reconcile(estimated_tokens, usage.get("total_tokens"))
+
+    # Cache the assembled result so a revisit is served without another round trip
+    result = ai_response.AIResult("".join(text_chunks), function_calls, finish_reason, usage, time.perf_counter() - start_time, provider=config.get_active_ai_provider(), model=get_model_name())
+    call_stats["result"] = result
+    cache = get_response_cache()
+    if cache and (text_chunks or function_calls):
+        cache.put(get_response_cache_key(prompt_text), result)
 
 # Helper function for AI interaction ---
 def get_ai_description(prompt_text):
-    if not config.global_ai_client or not config.global_generation_config:
+    if not config.get_ai_client() or not config.global_generation_config:
         return f"[AI Fallback - Client or GenConfig not initialized. Original prompt: '{prompt_text}'] ... A generic description unfolds."
     
     for attempt in range(MAX_AI_RETRIES + 1):
         if config.DEBUG_MODE:
             print(f"DEBUG: AI Prompt (Attempt {attempt + 1}/{MAX_AI_RETRIES + 1}): {prompt_text[:100]}...")
         try:
-            response = config.global_ai_client.models.generate_content(
+            response = config.get_ai_client().models.generate_content(
                 model=config.AI_MODEL_NAME,
                 contents=prompt_text,
                 config=config.global_generation_config
@@ -0,0 +1,82 @@
+import copy
+import time
+import threading
+
+import config
+import saveload
+
+# --- Background Autosave ---
+# The game loop calls tick() once per turn. Every AUTOSAVE_EVERY_TURNS turns or AUTOSAVE_EVERY_SECONDS seconds
+# it snapshots the player's save data (saveload.to_save_data, then a deepcopy of that plain dict, on the game thread;
+# the Inventory's memoized views and the derived-stats cache are never copied) and hands it to a worker thread
+# that serializes and writes it, so the loop never waits on disk. Requests made while a write is in
+# progress are coalesced: only the newest snapshot is written next.
+
+class AutosaveWorker:
+    def __init__(self, save_name, every_turns=None, every_seconds=None, save_fn=None):
+        self.save_name = save_name
+        self.every_turns = every_turns
+        self.every_seconds = every_seconds
+        self.save_fn = save_fn or (lambda player_data, name: saveload.save_game_state(player_data, name, announce=False))
+        self.saves_written = 0
+        self.requests_coalesced = 0
+        self._turns_since_save = 0
+        self._last_request_time = time.monotonic()
+        self._pending = None # Newest snapshot not yet handed to save_fn
+        self._writing = False
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def tick(self, player):
+        """Counts one game turn and requests an autosave when the turn or time interval is due."""
+        self._turns_since_save += 1
+        turns_due = self.every_turns and self._turns_since_save >= self.every_turns
+        time_due = self.every_seconds and time.monotonic() - self._last_request_time >= self.every_seconds
+        if turns_due or time_due:
+            self.request(player)
+
+    def request(self, player):
+        # Taken on the game thread so the worker never sees a half-updated player
+        snapshot = copy.deepcopy(saveload.to_save_data(player))
+        self._turns_since_save = 0
+        self._last_request_time = time.monotonic()
+        with self._condition:
+            if self._pending is not None:
+                self.requests_coalesced += 1
+            self._pending = snapshot
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopping:
+                    self._condition.wait()
+                if self._pending is None: # Stopping with nothing left to write
+                    return
+                snapshot, self._pending = self._pending, None
+                self._writing = True
+            try:
+                if self.save_fn(snapshot, self.save_name):
+                    self.saves_written += 1
+            except Exception as e: # Never let a failed autosave kill the worker
+                print(f"Autosave failed: {e}")
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Blocks until every requested snapshot has been written. Returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending is None and not self._writing, timeout)
+
+    def stop(self, final_player=None, timeout=None):
+        """Optionally requests one last save of final_player, writes everything pending and stops the worker."""
+        if final_player is not None:
+            self.request(final_player)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
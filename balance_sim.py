@@ -0,0 +1,157 @@
+import sys
+import time
+import argparse
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import entities
+import item_registry
+import samplers
+import combat_engine
+
+# --- Monte Carlo Balance Simulator ---
+# Plays many fights per enemy at once with NumPy, using the same rules as combat_engine (the player always
+# attacks, never flees). Each round is one vectorized step over every fight still running: draw the player's
+# d6 + damage_bonus and the enemy's attack for all of them, apply damage, and drop the fights that just ended.
+# Work scales with fights x the rounds they actually last, not with the longest possible fight.
+# Example (from the repo root):
+#     python balance_sim.py --fights 1000000 --weapon rusty_dagger --armor leather_scraps
+
+CHUNK_SIZE = 1_000_000 # Fights simulated together; bounds memory to a few tens of MB
+
+def make_loadout(health=30, weapon=None, armor=None, shield=None):
+    """A combat_engine player snapshot for a fresh character wearing the given ITEM_DB items."""
+    player = {'health': health, 'max_health': health, 'equipped_weapon': weapon, 'equipped_armor': armor, 'equipped_shield': shield}
+    for item_id in (weapon, armor, shield):
+        if item_id and item_id not in item_registry.REGISTRY:
+            raise ValueError(f"Unknown item id '{item_id}'")
+    return combat_engine.snapshot_player(player)
+
+def _simulate_chunk(player_health, enemy_data, damage_bonus, defense, size, np_rng):
+    """Returns (won, rounds, damage_taken) arrays for `size` fights."""
+    won = numpy.zeros(size, dtype=bool)
+    rounds = numpy.zeros(size, dtype=numpy.int32)
+    damage_taken = numpy.zeros(size, dtype=numpy.int32)
+    active = numpy.arange(size) # Indices of fights still running
+    enemy_hp = numpy.full(size, enemy_data['health'], dtype=numpy.int32)
+    player_hp = numpy.full(size, player_health, dtype=numpy.int32)
+    attack_min, attack_max = enemy_data['attack_min'], enemy_data['attack_max']
+    round_number = 0
+    while len(active):
+        round_number += 1
+        count = len(active)
+        enemy_hp -= np_rng.integers(1, 7, size=count, dtype=numpy.int32) + damage_bonus
+        killed = enemy_hp <= 0
+        if killed.any():
+            finished = active[killed]
+            won[finished] = True
+            rounds[finished] = round_number
+            damage_taken[finished] = player_health - player_hp[killed]
+            survivors = ~killed
+            active, enemy_hp, player_hp = active[survivors], enemy_hp[survivors], player_hp[survivors]
+            count = len(active)
+        if not count:
+            break
+        # The enemy strikes back only in fights where it survived the player's attack
+        player_hp -= numpy.maximum(0, np_rng.integers(attack_min, attack_max + 1, size=count, dtype=numpy.int32) - defense)
+        dead = player_hp <= 0
+        if dead.any():
+            finished = active[dead]
+            rounds[finished] = round_number
+            damage_taken[finished] = player_health
+            survivors = ~dead
+            active, enemy_hp, player_hp = active[survivors], enemy_hp[survivors], player_hp[survivors]
+    return won, rounds, damage_taken
+
+def simulate_enemy(snapshot, enemy_data, fights, np_rng):
+    """Simulates `fights` fights against one enemy template. Returns per-fight arrays and expected drops per kill."""
+    if numpy is None:
+        raise RuntimeError("balance_sim needs NumPy (pip install numpy)")
+    defense = snapshot['total_defense']
+    parts = []
+    remaining = fights
+    while remaining > 0:
+        size = min(CHUNK_SIZE, remaining)
+        remaining -= size
+        parts.append(_simulate_chunk(snapshot['health'], enemy_data, snapshot['damage_bonus'], defense, size, np_rng))
+    won, rounds, damage_taken = (numpy.concatenate(arrays) for arrays in zip(*parts))
+
+    wins = int(won.sum())
+    drops = {}
+    loot_table = samplers.ENEMY_LOOT.get(enemy_data.get('id')) or samplers.compile_enemy_loot(enemy_data)
+    if wins and len(loot_table):
+        quantities = loot_table.roll_batch(wins, np_rng).mean(axis=0)
+        for item_id, quantity in zip(loot_table.item_ids, quantities):
+            drops[item_id] = drops.get(item_id, 0.0) + float(quantity) # An item can appear in several loot sources
+    return {"won": won, "rounds": rounds, "damage_taken": damage_taken, "drops_per_kill": drops}
+
+def summarize(enemy_id, enemy_data, simulation):
+    won = simulation["won"]
+    rounds_in_wins = simulation["rounds"][won]
+    taken = simulation["damage_taken"]
+    def pct(values, q):
+        return float(numpy.percentile(values, q)) if len(values) else None
+    return {
+        "enemy_id": enemy_id,
+        "name": enemy_data.get('name', enemy_id),
+        "fights": len(won),
+        "win_rate": float(won.mean()),
+        "turns_to_kill_mean": float(rounds_in_wins.mean()) if len(rounds_in_wins) else None,
+        "turns_to_kill_p90": pct(rounds_in_wins, 90),
+        "damage_taken_mean": float(taken.mean()),
+        "damage_taken_p50": pct(taken, 50),
+        "damage_taken_p90": pct(taken, 90),
+        "xp_per_fight": float(won.mean()) * enemy_data.get('xp_value', 0),
+        "drops_per_kill": simulation["drops_per_kill"],
+    }
+
+def simulate_bestiary(snapshot, fights, enemy_ids=None, seed=None):
+    np_rng = numpy.random.default_rng(seed)
+    enemy_ids = enemy_ids or list(entities.ENEMY_TEMPLATES)
+    return [summarize(enemy_id, entities.ENEMY_TEMPLATES[enemy_id], simulate_enemy(snapshot, entities.ENEMY_TEMPLATES[enemy_id], fights, np_rng))
+            for enemy_id in enemy_ids]
+
+def format_report(summaries, top_drops=3):
+    lines = [f"{'Enemy':<28} {'Win%':>6} {'Turns':>6} {'p90':>4} {'Dmg':>6} {'p50':>4} {'p90':>4} {'XP/fight':>8}  Top drops per kill"]
+    for s in sorted(summaries, key=lambda s: s["win_rate"]):
+        turns = f"{s['turns_to_kill_mean']:6.2f}" if s["turns_to_kill_mean"] is not None else f"{'-':>6}"
+        turns_p90 = f"{s['turns_to_kill_p90']:4.0f}" if s["turns_to_kill_p90"] is not None else f"{'-':>4}"
+        drops = sorted(s["drops_per_kill"].items(), key=lambda item: item[1], reverse=True)[:top_drops]
+        drops_text = ", ".join(f"{item_registry.REGISTRY.name_of(item_id, item_id)} {quantity:.2f}" for item_id, quantity in drops)
+        lines.append(f"{s['name'][:28]:<28} {s['win_rate'] * 100:6.1f} {turns} {turns_p90} {s['damage_taken_mean']:6.2f} "
+                     f"{s['damage_taken_p50']:4.0f} {s['damage_taken_p90']:4.0f} {s['xp_per_fight']:8.2f}  {drops_text}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo win rates, fight length, damage taken and drops for every enemy.")
+    parser.add_argument("enemies", nargs="*", help="Enemy template ids (default: the whole bestiary)")
+    parser.add_argument("--fights", type=int, default=100_000, help="Fights per enemy")
+    parser.add_argument("--health", type=int, default=30, help="Player health (a new character has 30)")
+    parser.add_argument("--weapon", help="Equipped weapon item id")
+    parser.add_argument("--armor", help="Equipped armor item id")
+    parser.add_argument("--shield", help="Equipped shield item id")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if numpy is None:
+        print("balance_sim needs NumPy (pip install numpy).")
+        sys.exit(1)
+
+    unknown = [enemy_id for enemy_id in args.enemies if enemy_id not in entities.ENEMY_TEMPLATES]
+    if unknown:
+        parser.error(f"Unknown enemy id(s): {', '.join(unknown)}")
+    try:
+        snapshot = make_loadout(args.health, args.weapon, args.armor, args.shield)
+    except ValueError as e:
+        parser.error(str(e))
+
+    start_time = time.perf_counter()
+    summaries = simulate_bestiary(snapshot, args.fights, args.enemies, args.seed)
+    elapsed = time.perf_counter() - start_time
+    print(format_report(summaries))
+    print(f"\n{len(summaries)} enemies x {args.fights} fights in {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 import random
 import game_data
 import ui
+import inventory
+import item_registry
+import derived_stats
 
 # --- Leveling Configuration ---
 BASE_XP_TO_NEXT_LEVEL = 50
@@ -8,7 +11,7 @@ XP_LEVEL_MULTIPLIER = 1.5 # How much more XP is needed for each subsequent level
 LEVEL_UP_HEALTH_BONUS = 10
 
 # --- Character Helper Functions ---
-def check_for_level_up(player_character):
+def check_for_level_up(player_character, output=print):
     leveled_up = False
     while player_character['xp'] >= player_character['xp_to_next_level']:
         leveled_up = True
@@ -17,50 +20,88 @@ def check_for_level_up(player_character):
         player_character['xp'] -= player_character['xp_to_next_level'] 
         
         # Update xp_to_next_level (example: simple scaling)
-        player_character['xp_to_next_level'] = int(BASE_XP_TO_NEXT_LEVEL * (XP_LEVEL_MULTIPLIER ** (player_character['level' -1] )))
+        player_character['xp_to_next_level'] = int(BASE_XP_TO_NEXT_LEVEL * (XP_LEVEL_MULTIPLIER ** (player_character['level'] - 1)))
         
         old_max_health = player_character['max_health']
         player_character['max_health'] += LEVEL_UP_HEALTH_BONUS
         # Heal player by the amount max_health increased, up to new max_health
         player_character['health'] = min(player_character['max_health'], player_character['health'] + LEVEL_UP_HEALTH_BONUS)
         
-        print(f"\n*** LEVEL UP! ***")
-        print(f"You are now Level {player_character['level']}!")
-        print(f"Max Health increased from {old_max_health} to {player_character['max_health']}.")
-        print(f"Health restored. Current Health: {player_character['health']}/{player_character['max_health']}.")
-        print(f"XP to next level: {player_character['xp_to_next_level']}.")
+        output(f"\n*** LEVEL UP! ***")
+        output(f"You are now Level {player_character['level']}!")
+        output(f"Max Health increased from {old_max_health} to {player_character['max_health']}.")
+        output(f"Health restored. Current Health: {player_character['health']}/{player_character['max_health']}.")
+        output(f"XP to next level: {player_character['xp_to_next_level']}.")
         # Future: Add attribute points, skill unlocks, etc.
     return leveled_up
 
-def gain_xp(player_character, amount):
+def gain_xp(player_character, amount, output=print):
+    """Adds XP and applies any level ups. output(text) receives the messages (print for the terminal)."""
     if amount <= 0:
         return
-    print(f"\nYou gained {amount} XP.")
+    output(f"\nYou gained {amount} XP.")
     player_character['xp'] += amount
-    check_for_level_up(player_character)
+    check_for_level_up(player_character, output)
 
-# Character Creation Function with Validation
-def character_creation():
-    print("Welcome to The Silent Symphony!")
-    player_character = {}
+# --- Inventory Actions (shared by the curses inventory and game_session) ---
+def use_item(player_character, item_id):
+    """Uses one consumable or scroll. Returns the message to show."""
+    item_data = item_registry.REGISTRY.get(item_id)
+    item_type = item_data.get('type') if item_data else None
+    if item_type != 'consumable' and item_type != 'scroll':
+        return "Cannot use this item type."
+    # Basic use logic for consumables and scrolls
+    # For scrolls, actual spell casting logic would be more complex
+    # For now, just acknowledge use and remove if it's a one-time use item
+    message = f"Used {item_data['name']}."
+    if item_data.get('effect',{}).get('heal'): # Example: simple heal effect
+        player_character['health'] = min(player_character['max_health'], player_character['health'] + item_data['effect']['heal'])
+        message += f" Healed {item_data['effect']['heal']} HP."
+    # Assume scrolls are consumed on use for now
+    player_character['inventory'].remove(item_id)
+    return message
 
-    quick_start_input = input("Quick Start character creation? (y/n): ").strip().lower()
+def toggle_equipped(player_character, item_id):
+    """Equips item_id in its slot, or unequips it if it is already worn. Returns the message to show."""
+    registry = item_registry.REGISTRY
+    item_data = registry.get(item_id)
+    item_type = item_data.get('type') if item_data else None
+    equip_message_parts = []
+    slot_key = {'weapon': 'equipped_weapon', 'armor': 'equipped_armor', 'shield': 'equipped_shield'}.get(item_type)
+    if slot_key:
+        if player_character[slot_key] == item_id:
+            player_character[slot_key] = None; equip_message_parts.append(f"Unequipped {item_data['name']}.")
+        else:
+            if player_character[slot_key]: equip_message_parts.append(f"Unequipped {registry.name_of(player_character[slot_key])}.")
+            player_character[slot_key] = item_id; equip_message_parts.append(f"Equipped {item_data['name']}.")
+    elif item_type == 'trinket':
+        equipped_trinkets = player_character.setdefault('equipped_trinkets', [])
+        if item_id in equipped_trinkets:
+            equipped_trinkets.remove(item_id); equip_message_parts.append(f"Unequipped {item_data['name']}.")
+        elif len(equipped_trinkets) >= derived_stats.MAX_EQUIPPED_TRINKETS:
+            equip_message_parts.append(f"You can only wear {derived_stats.MAX_EQUIPPED_TRINKETS} trinkets at once.")
+        else:
+            equipped_trinkets.append(item_id); equip_message_parts.append(f"Equipped {item_data['name']}.")
+    else: equip_message_parts.append("Cannot equip this item type.")
+    derived_stats.refresh_derived_stats(player_character) # Gear may have changed; combat and the stats screen read the cache
+    return " ".join(equip_message_parts)
 
-    if quick_start_input == 'y':
-        player_character['name'] = "Rynn"
-        player_character['race'] = random.choice(game_data.valid_races)
-        player_character['origin'] = random.choice(game_data.valid_origins)
-        player_character['star_sign'] = random.choice(game_data.valid_star_signs)
-        print(f"\nQuick Start selected! Your character is {player_character['name']}, a {player_character['race']} {player_character['origin']} born under the sign of {player_character['star_sign']}.")
-    else:
-        player_character['race'] = ui.get_numbered_choice("\nChoose your race:", game_data.valid_races)
-        player_character['origin'] = ui.get_numbered_choice("\nChoose your origin:", game_data.valid_origins)
-        player_character['star_sign'] = ui.get_numbered_choice("\nChoose your star sign:", game_data.valid_star_signs)
-        player_character['name'] = input("\nWhat is your character's name?: ").strip()
-        while not player_character['name']:
-            print("Name cannot be empty.")
-            player_character['name'] = input("What is your character's name?: ").strip()
+# --- Character Creation ---
+QUICK_START_NAME = "Rynn"
 
+def quick_start_identity(rng=random):
+    return {
+        'name': QUICK_START_NAME,
+        'race': rng.choice(game_data.valid_races),
+        'origin': rng.choice(game_data.valid_origins),
+        'star_sign': rng.choice(game_data.valid_star_signs),
+    }
+
+def quick_start_message(player_character):
+    return f"\nQuick Start selected! Your character is {player_character['name']}, a {player_character['race']} {player_character['origin']} born under the sign of {player_character['star_sign']}."
+
+def story_intro_lines(player_character):
+    """The text shown once a character has been created, one entry per printed line."""
     backstory_template = f"""
     You awaken to the gentle lapping of waves, the caress of seafoam at your feet, a stark contrast to the tempest that raged just hours before. Your body lies heavy upon the wet sand, each breath a testament to your survival against the capricious wrath of the sea. As your eyes flutter open, the blurred edges of reality sharpen, revealing the sun-drenched shores of some land unknown to you, {player_character['name']}.
 
@@ -74,21 +115,49 @@ With the salt on your lips and the horizon calling, you rise. The path before yo
 
 As you take your first steps into the unknown, you can't shake the feeling that your arrival was no mere accident. The threads of destiny are woven tight around your fate, and only time will reveal the role you are to play in this new world. 
     """
-    print("\n--- Your Story Begins ---")
-    print(backstory_template)
-    
-    print(f"\nWelcome, {player_character['name']} the {player_character['race']} {player_character['origin']}, born under the sign of {player_character['star_sign']}. Your journey begins now...")
-    
+    return [
+        "\n--- Your Story Begins ---",
+        backstory_template,
+        f"\nWelcome, {player_character['name']} the {player_character['race']} {player_character['origin']}, born under the sign of {player_character['star_sign']}. Your journey begins now...",
+    ]
+
+def init_new_character(player_character):
+    """Gives a freshly created character (name, race, origin, star_sign set) the starting stats and gear slots."""
     player_character['health'] = 30 
     player_character['max_health'] = 30
-    player_character['inventory'] = []
+    player_character['inventory'] = inventory.Inventory()
     player_character['location'] = "beach_starting"
     player_character['last_described_location'] = None
     player_character['equipped_weapon'] = None
     player_character['equipped_armor'] = None
     player_character['equipped_shield'] = None
+    player_character['equipped_trinkets'] = [] # Up to derived_stats.MAX_EQUIPPED_TRINKETS rings/charms
     player_character['level'] = 1
     player_character['xp'] = 0
     player_character['xp_to_next_level'] = int(BASE_XP_TO_NEXT_LEVEL * (XP_LEVEL_MULTIPLIER ** 0)) # Initial XP for level 1 to 2
+    player_character['playtime_seconds'] = 0
+
+    return player_character
+
+# Character Creation Function with Validation
+def character_creation():
+    print("Welcome to The Silent Symphony!")
+    player_character = {}
+
+    quick_start_input = input("Quick Start character creation? (y/n): ").strip().lower()
+
+    if quick_start_input == 'y':
+        player_character.update(quick_start_identity())
+        print(quick_start_message(player_character))
+    else:
+        player_character['race'] = ui.get_numbered_choice("\nChoose your race:", game_data.valid_races)
+        player_character['origin'] = ui.get_numbered_choice("\nChoose your origin:", game_data.valid_origins)
+        player_character['star_sign'] = ui.get_numbered_choice("\nChoose your star sign:", game_data.valid_star_signs)
+        player_character['name'] = input("\nWhat is your character's name?: ").strip()
+        while not player_character['name']:
+            print("Name cannot be empty.")
+            player_character['name'] = input("What is your character's name?: ").strip()
 
-    return player_character 
\ No newline at end of file
+    for line in story_intro_lines(player_character):
+        print(line)
+    return init_new_character(player_character)
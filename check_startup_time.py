@@ -0,0 +1,61 @@
+import os
+import sys
+import subprocess
+import argparse
+
+# --- Startup Budget Check ---
+# Imports a module in a fresh interpreter under `python -X importtime` and fails if the cumulative
+# import time exceeds the budget, or if any provider SDK was imported eagerly. tests/test_startup_time.py runs the
+# default check under pytest; run it by hand for other modules or budgets:
+#     python check_startup_time.py --budget-ms 150 main saveload
+
+DEFAULT_MODULES = ["main", "saveload", "combat"]
+DEFAULT_BUDGET_MS = 150
+# Modules that must only be imported on first AI use (see config.init_ai)
+LAZY_ONLY_MODULES = ["openai", "google.genai", "dotenv"]
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def measure_import(module_name):
+    """Returns {module: cumulative_us} for importing module_name in a fresh interpreter started in the repo root."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True, text=True, cwd=REPO_DIR
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing '{module_name}' failed:\n{completed.stderr}")
+    timings = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        _self_us, cumulative_us, imported = fields
+        timings[imported.strip()] = int(cumulative_us)
+    return timings
+
+def check_module(module_name, budget_ms):
+    timings = measure_import(module_name)
+    total_ms = timings.get(module_name, 0) / 1000
+    eager_sdks = [name for name in LAZY_ONLY_MODULES if name in timings]
+    slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[1:6]
+
+    status = "OK" if total_ms <= budget_ms and not eager_sdks else "FAIL"
+    print(f"[{status}] import {module_name}: {total_ms:.1f} ms (budget {budget_ms} ms)")
+    for name, cumulative_us in slowest:
+        print(f"    {name}: {cumulative_us / 1000:.1f} ms")
+    if eager_sdks:
+        print(f"    Provider modules imported at startup: {', '.join(eager_sdks)}")
+    return status == "OK"
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if importing game modules exceeds a startup time budget.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+    results = [check_module(module_name, args.budget_ms) for module_name in args.modules]
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == "__main__":
+    main()
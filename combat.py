@@ -1,152 +1,80 @@
-import random
+from collections import Counter
+
 import ui
-import items # Import items to access ITEM_DB for weapon stats
 import character # Import character module to use gain_xp
 import config # Make sure config is imported if DEBUG_MODE is used here
-import entities # Import entities to access SHARED_LOOT_GROUPS
-
-# Simple Combat Function
-def combat(player_character, enemy_instance):
-    player_health = player_character['health']
-    # Enemy stats from enemy_instance
-    enemy_health = enemy_instance['health'] 
-    enemy_name = enemy_instance['name']
-    enemy_attack_min = enemy_instance['attack_min']
-    enemy_attack_max = enemy_instance['attack_max']
-
-    print(f"\n--- Combat Initiated! ---")
-    # Description is now printed before calling combat in main.py
-    # print(f"You've encountered a {enemy_name}! {enemy_instance['description']}") 
+import item_registry # Item names for the loot listing
+import combat_engine # The rules; this module only renders them and asks for input
 
-    combat_actions = ["Attack", "Flee"]
+# --- Text rendering of combat_engine events (shared with game_session) ---
+def defense_display(player_snapshot):
+    """The " (defended by ...)" suffix of enemy attack lines. The gear can't change mid-fight, so build it once per fight."""
+    armor_name_display = f" (defended by {player_snapshot['armor_name']})" if player_snapshot['armor_name'] else ""
+    shield_name_display = ""
+    if player_snapshot['shield_name']:
+        shield_name_display = f" and {player_snapshot['shield_name']}" if armor_name_display else f" (defended by {player_snapshot['shield_name']})"
+    return f"{armor_name_display}{shield_name_display}"
 
-    while player_health > 0 and enemy_health > 0:
-        print(f"\nYour Health: {player_health}/{player_character['max_health']} | {enemy_name} Health: {enemy_health}")
-        
-        action = ui.get_numbered_choice("Choose your action:", combat_actions)
-        
-        if action == 'Attack':
-            base_damage = random.randint(1, 6)
-            weapon_bonus = 0
-            equipped_weapon_id = player_character.get('equipped_weapon')
-            
-            if equipped_weapon_id and equipped_weapon_id in items.ITEM_DB:
-                weapon_data = items.ITEM_DB[equipped_weapon_id]
-                if weapon_data.get('type') == 'weapon':
-                    weapon_bonus = weapon_data.get('damage_bonus', 0)
-                    print(f"You attack with your {weapon_data['name']}!")
-                else: 
-                    print("You attack with your bare hands.") 
-            else:
-                print("You attack with your bare hands.")
-                
-            total_damage = base_damage + weapon_bonus
-            enemy_health -= total_damage
-            print(f"You dealt {total_damage} damage to the {enemy_name}! Enemy health is now {enemy_health}.")
-            
-            if enemy_health > 0:
-                enemy_raw_attack = random.randint(enemy_attack_min, enemy_attack_max)
-                
-                player_armor_defense = 0
-                equipped_armor_id = player_character.get('equipped_armor')
-                armor_name_display = ""
-                if equipped_armor_id and equipped_armor_id in items.ITEM_DB:
-                    armor_data = items.ITEM_DB[equipped_armor_id]
-                    if armor_data.get('type') == 'armor':
-                        player_armor_defense = armor_data.get('defense_bonus', 0)
-                        armor_name_display = f" (defended by {armor_data['name']})"
-                
-                player_shield_defense = 0
-                equipped_shield_id = player_character.get('equipped_shield')
-                shield_name_display = ""
-                if equipped_shield_id and equipped_shield_id in items.ITEM_DB:
-                    shield_data = items.ITEM_DB[equipped_shield_id]
-                    if shield_data.get('type') == 'shield':
-                        player_shield_defense = shield_data.get('defense_bonus', 0)
-                        shield_name_display = f" and {shield_data['name']}" if armor_name_display else f" (defended by {shield_data['name']})"
+def format_event(event, enemy_instance, defense_text):
+    """The lines shown for one combat event (possibly none)."""
+    enemy_name = enemy_instance['name']
+    event_type = event["type"]
+    if event_type == "combat_started":
+        return [f"\n--- Combat Initiated! ---"] # Description is now printed before combat starts
+    if event_type == "round_started":
+        return [f"\nYour Health: {event['player_health']}/{event['player_max_health']} | {enemy_name} Health: {event['enemy_health']}"]
+    if event_type == "player_attack":
+        return [f"You attack with your {event['weapon_name']}!" if event['weapon_name'] else "You attack with your bare hands.",
+                f"You dealt {event['damage']} damage to the {enemy_name}! Enemy health is now {event['enemy_health']}."]
+    if event_type == "enemy_attack":
+        return [f"The {enemy_name} attacks you for {event['raw_damage']} damage!{defense_text} You take {event['damage_taken']} damage. Your health is now {event['player_health']}."]
+    if event_type == "fled":
+        return ["You managed to flee!"]
+    if event_type == "enemy_defeated":
+        return [f"\nYou defeated the {enemy_name}!"]
+    if event_type == "loot_dropped":
+        lines = []
+        if config.DEBUG_MODE:
+            old_format_loot_table = enemy_instance.get('loot_table', [])
+            if old_format_loot_table and isinstance(old_format_loot_table[0], str):
+                lines.append(f"DEBUG: Enemy '{enemy_name}' is using old loot_table string format. Please update.")
+            for item_id in event['unknown_item_ids']:
+                lines.append(f"DEBUG: Loot item ID '{item_id}' for '{enemy_name}' not found in the item registry.")
+        return lines
+    if event_type == "player_defeated":
+        return ["You have been defeated!"]
+    return []
 
-                total_player_defense = player_armor_defense + player_shield_defense
-                defense_display = f"{armor_name_display}{shield_name_display}"
+def apply_result(player_character, result, enemy_instance, output=print):
+    """Applies a finished fight to the player: health, and XP and loot for a win. output(text) receives the messages."""
+    enemy_name = enemy_instance['name']
+    player_character['health'] = result.player_health
+    if result.outcome == "won":
+        # Award XP
+        if result.xp_reward > 0:
+            character.gain_xp(player_character, result.xp_reward, output)
+        player_character['inventory'].add_many(result.loot)
+        # Display dropped items, one line per item with its quantity
+        if result.loot:
+            output(f"The {enemy_name} dropped:")
+            for item_id, quantity in Counter(result.loot).items():
+                output(f"- {item_registry.REGISTRY.name_of(item_id)}" + (f" x{quantity}" if quantity > 1 else ""))
+            output("Added to your inventory.")
+        else:
+            output(f"The {enemy_name} dropped nothing of interest this time.")
 
-                actual_damage_taken = max(0, enemy_raw_attack - total_player_defense)
-                player_health -= actual_damage_taken
-                print(f"The {enemy_name} attacks you for {enemy_raw_attack} damage!{defense_display} You take {actual_damage_taken} damage. Your health is now {player_health}.")
-        elif action == 'Flee':
-            print("You managed to flee!")
-            player_character['health'] = player_health
-            return "fled"
-        
-        if enemy_health <= 0:
-            print(f"\nYou defeated the {enemy_name}!")
-            player_character['health'] = player_health
-            # Award XP
-            xp_reward = enemy_instance.get('xp_value', 0)
-            if xp_reward > 0:
-                character.gain_xp(player_character, xp_reward)
-            
-            # --- New Loot Handling Logic ---
-            dropped_items_this_combat = [] # To collect all item names dropped
+# Simple Combat Function
+def combat(player_character, enemy_instance):
+    player_snapshot = combat_engine.snapshot_player(player_character)
+    defense_text = defense_display(player_snapshot)
 
-            # 1. Process loot_groups
-            for group_name in enemy_instance.get('loot_groups', []):
-                group_table = entities.SHARED_LOOT_GROUPS.get(group_name, [])
-                for loot_entry in group_table:
-                    item_id = loot_entry.get("item_id")
-                    chance = loot_entry.get("chance", 0)
-                    if item_id and random.random() <= chance:
-                        if item_id in items.ITEM_DB:
-                            player_character['inventory'].append(item_id)
-                            dropped_items_this_combat.append(items.ITEM_DB[item_id]['name'])
-                        elif config.DEBUG_MODE:
-                            print(f"DEBUG: Loot item ID '{item_id}' from group '{group_name}' not found in ITEM_DB.")
-            
-            # 2. Process unique_loot
-            unique_loot_table = enemy_instance.get('unique_loot', [])
-            for loot_entry in unique_loot_table:
-                item_id = loot_entry.get("item_id")
-                chance = loot_entry.get("chance", 0)
-                if item_id and random.random() <= chance:
-                    if item_id in items.ITEM_DB:
-                        player_character['inventory'].append(item_id)
-                        dropped_items_this_combat.append(items.ITEM_DB[item_id]['name'])
-                    elif config.DEBUG_MODE:
-                        print(f"DEBUG: Unique loot item ID '{item_id}' not found in ITEM_DB.")
-            
-            # 3. Process old loot_table (for backward compatibility during transition)
-            # This part should eventually be removed once all enemies are updated.
-            old_format_loot_table = enemy_instance.get('loot_table', [])
-            if old_format_loot_table and isinstance(old_format_loot_table[0], str): # Check if it's the old list-of-strings format
-                if config.DEBUG_MODE:
-                    print(f"DEBUG: Enemy '{enemy_name}' is using old loot_table string format. Please update.")
-                for item_id in old_format_loot_table: # Assuming 100% drop for old format as a fallback
-                    if item_id in items.ITEM_DB:
-                        player_character['inventory'].append(item_id)
-                        dropped_items_this_combat.append(items.ITEM_DB[item_id]['name'])
-                    elif config.DEBUG_MODE:
-                         print(f"DEBUG: Old format loot item ID '{item_id}' not found in ITEM_DB.")
-            elif old_format_loot_table and isinstance(old_format_loot_table[0], dict): # It might be already new format from a previous step
-                 for loot_entry in old_format_loot_table:
-                    item_id = loot_entry.get("item_id")
-                    chance = loot_entry.get("chance", 0) 
-                    if item_id and random.random() <= chance: 
-                        if item_id in items.ITEM_DB: 
-                            player_character['inventory'].append(item_id)
-                            dropped_items_this_combat.append(items.ITEM_DB[item_id]['name'])
-                        elif config.DEBUG_MODE:
-                            print(f"DEBUG: Loot item ID '{item_id}' from loot table not found in ITEM_DB.")
+    def render(event):
+        for line in format_event(event, enemy_instance, defense_text):
+            print(line)
 
-            # Display dropped items
-            if dropped_items_this_combat:
-                print(f"The {enemy_name} dropped:")
-                for item_name_dropped in dropped_items_this_combat:
-                    print(f"- {item_name_dropped}")
-                print("Added to your inventory.")
-            else:
-                print(f"The {enemy_name} dropped nothing of interest this time.")
+    def ask_player(encounter):
+        return ui.get_numbered_choice("Choose your action:", combat_engine.ACTIONS)
 
-            return "won"
-        elif player_health <= 0:
-            print("You have been defeated!")
-            player_character['health'] = 0
-            return "lost"
-    return "error" # Should ideally not be reached if logic is correct 
\ No newline at end of file
+    result = combat_engine.run_combat(player_snapshot, enemy_instance, ask_player, on_event=render)
+    apply_result(player_character, result, enemy_instance)
+    return result.outcome
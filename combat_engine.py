@@ -0,0 +1,139 @@
+import item_registry
+import samplers
+import derived_stats
+
+# --- Headless Combat Engine ---
+# The rules of combat.combat without any input() or print(): a CombatEncounter is advanced one action at
+# a time and returns plain-dict events describing what happened, so it can be driven by the terminal UI,
+# a network session, a replay or a simulation. The player is passed in as a snapshot (snapshot_player) and
+# is never modified; callers apply the result (health, XP, loot) themselves.
+#
+# Events, in the order they can occur:
+#   {"type": "combat_started", "enemy_name"}
+#   {"type": "round_started", "round", "player_health", "player_max_health", "enemy_health"}
+#   {"type": "player_attack", "weapon_name" (None for bare hands), "damage", "enemy_health"}
+#   {"type": "enemy_attack", "raw_damage", "damage_taken", "armor_name", "shield_name", "player_health"}
+#   {"type": "fled"}
+#   {"type": "enemy_defeated", "xp_reward"}
+#   {"type": "loot_dropped", "item_ids", "unknown_item_ids"}
+#   {"type": "player_defeated"}
+
+ATTACK = "Attack"
+FLEE = "Flee"
+ACTIONS = [ATTACK, FLEE]
+
+def snapshot_player(player_character):
+    """The combat-relevant stats of a player dict, read from its cached derived stats."""
+    stats = derived_stats.get_derived_stats(player_character)
+    return {
+        "health": player_character['health'],
+        "max_health": player_character['max_health'],
+        "weapon_name": stats.weapon_name,
+        "damage_bonus": stats.damage_bonus,
+        "armor_name": stats.armor_name,
+        "armor_defense": stats.armor_defense,
+        "shield_name": stats.shield_name,
+        "shield_defense": stats.shield_defense,
+        "total_defense": stats.total_defense,
+        "resistances": dict(stats.resistances),
+    }
+
+class CombatResult:
+    __slots__ = ("outcome", "events", "player_health", "enemy_health", "rounds", "xp_reward", "loot")
+
+    def __init__(self, outcome, events, player_health, enemy_health, rounds, xp_reward=0, loot=None):
+        self.outcome = outcome # "won", "lost" or "fled"
+        self.events = events
+        self.player_health = player_health
+        self.enemy_health = enemy_health
+        self.rounds = rounds
+        self.xp_reward = xp_reward
+        self.loot = loot or [] # Item ids dropped (known to the item registry)
+
+class CombatEncounter:
+    def __init__(self, player_snapshot, enemy_instance, rng=None):
+        self.player = player_snapshot
+        self.enemy = enemy_instance
+        self.rng = rng or samplers.get_rng()
+        self.player_health = player_snapshot['health']
+        self.enemy_health = enemy_instance['health']
+        self.round = 0
+        self.outcome = None
+        self.xp_reward = 0
+        self.loot = []
+        self.events = [] # Every event of the fight so far, for result()
+
+    @property
+    def is_over(self):
+        return self.outcome is not None
+
+    def start(self):
+        return self._record([{"type": "combat_started", "enemy_name": self.enemy['name']}] + self._next_round())
+
+    def _next_round(self):
+        self.round += 1
+        return [{"type": "round_started", "round": self.round, "player_health": self.player_health,
+                 "player_max_health": self.player['max_health'], "enemy_health": self.enemy_health}]
+
+    def step(self, action):
+        """Resolves one player action and returns the resulting events."""
+        if self.is_over:
+            raise ValueError("Combat is already over")
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown combat action '{action}'")
+        return self._record(self._resolve(action))
+
+    def _record(self, events):
+        self.events.extend(events)
+        return events
+
+    def _resolve(self, action):
+        if action == FLEE:
+            self.outcome = "fled"
+            return [{"type": "fled"}]
+
+        events = []
+        damage = self.rng.randint(1, 6) + self.player['damage_bonus']
+        self.enemy_health -= damage
+        events.append({"type": "player_attack", "weapon_name": self.player['weapon_name'], "damage": damage, "enemy_health": self.enemy_health})
+        if self.enemy_health <= 0:
+            return events + self._enemy_defeated()
+
+        raw_damage = self.rng.randint(self.enemy['attack_min'], self.enemy['attack_max'])
+        damage_taken = max(0, raw_damage - self.player['total_defense'])
+        self.player_health -= damage_taken
+        events.append({"type": "enemy_attack", "raw_damage": raw_damage, "damage_taken": damage_taken,
+                       "armor_name": self.player['armor_name'], "shield_name": self.player['shield_name'], "player_health": self.player_health})
+        if self.player_health <= 0:
+            self.player_health = 0
+            self.outcome = "lost"
+            return events + [{"type": "player_defeated"}]
+        return events + self._next_round()
+
+    def _enemy_defeated(self):
+        self.outcome = "won"
+        self.xp_reward = self.enemy.get('xp_value', 0)
+        dropped = samplers.roll_enemy_loot(self.enemy, self.rng)
+        self.loot = [item_id for item_id in dropped if item_id in item_registry.REGISTRY]
+        unknown_item_ids = [item_id for item_id in dropped if item_id not in item_registry.REGISTRY]
+        return [{"type": "enemy_defeated", "xp_reward": self.xp_reward},
+                {"type": "loot_dropped", "item_ids": list(self.loot), "unknown_item_ids": unknown_item_ids}]
+
+    def result(self):
+        return CombatResult(self.outcome, list(self.events), self.player_health, self.enemy_health, self.round, self.xp_reward, self.loot)
+
+def always_attack(encounter):
+    """Policy that never flees; the default for simulations."""
+    return ATTACK
+
+def run_combat(player_snapshot, enemy_instance, policy=always_attack, rng=None, on_event=None):
+    """Runs a whole fight. policy(encounter) picks each action; on_event(event) sees every event as it happens."""
+    encounter = CombatEncounter(player_snapshot, enemy_instance, rng)
+    def emit(new_events):
+        if on_event:
+            for event in new_events:
+                on_event(event)
+    emit(encounter.start())
+    while not encounter.is_over:
+        emit(encounter.step(policy(encounter)))
+    return encounter.result()
@@ -0,0 +1,98 @@
+from fractions import Fraction
+from functools import lru_cache
+
+import entities
+
+# --- Exact Combat Odds ---
+# combat_engine's rules are a small Markov chain over (player_hp, enemy_hp): each round the player deals
+# d6 + damage_bonus, and if the enemy survives it hits back for uniform(attack_min, attack_max) minus armor and
+# shield defense (never below 0). Enemy hp strictly drops every round, so pushing probability mass through the
+# states in order of falling enemy hp visits each state once and gives the exact distribution of the outcome:
+# win (with the player's remaining hp), or loss. Results are memoized per (loadout, enemy stats), which makes
+# repeated queries free. Use them for instant difficulty ratings, or as an oracle for balance_sim and combat_engine.
+#
+#     odds = combat_odds.odds_for(combat_engine.snapshot_player(player), entities.ENEMY_TEMPLATES["goblin_scout"])
+#     odds.win_probability, odds.remaining_hp, odds.rating
+
+# (minimum win probability, label), checked in order
+DIFFICULTY_RATINGS = [(0.99, "Trivial"), (0.9, "Easy"), (0.7, "Fair"), (0.4, "Risky"), (0.0, "Deadly")]
+
+class CombatOdds:
+    __slots__ = ("player_health", "win_probability", "loss_probability", "remaining_hp", "expected_turns_to_kill", "expected_damage_taken")
+
+    def __init__(self, player_health, win_probability, loss_probability, remaining_hp, expected_turns_to_kill, expected_damage_taken):
+        self.player_health = player_health
+        self.win_probability = win_probability
+        self.loss_probability = loss_probability
+        self.remaining_hp = remaining_hp # {hp left after a win: probability}, sums to win_probability
+        self.expected_turns_to_kill = expected_turns_to_kill # Mean rounds in won fights, None if winning is impossible
+        self.expected_damage_taken = expected_damage_taken # A loss counts as all of player_health
+
+    @property
+    def rating(self):
+        for minimum, label in DIFFICULTY_RATINGS:
+            if self.win_probability >= minimum:
+                return label
+        return DIFFICULTY_RATINGS[-1][1]
+
+    def describe(self):
+        return f"{self.rating} (win {float(self.win_probability) * 100:.1f}%, ~{float(self.expected_damage_taken):.1f} damage taken)"
+
+def _damage_taken_distribution(attack_min, attack_max, defense, one):
+    """{damage taken: probability} for one enemy attack."""
+    distribution = {}
+    share = one / (attack_max - attack_min + 1)
+    for raw_damage in range(attack_min, attack_max + 1):
+        taken = max(0, raw_damage - defense)
+        distribution[taken] = distribution.get(taken, 0) + share
+    return distribution
+
+@lru_cache(maxsize=4096)
+def solve(player_health, damage_bonus, defense, enemy_health, attack_min, attack_max, exact=False):
+    """Exact outcome distribution for one fight. exact=True uses Fractions instead of floats."""
+    if 1 + damage_bonus <= 0:
+        raise ValueError("damage_bonus must let the player deal damage, or the fight never ends")
+    one = Fraction(1) if exact else 1.0
+    player_rolls = [(roll + damage_bonus, one / 6) for roll in range(1, 7)]
+    enemy_hits = sorted(_damage_taken_distribution(attack_min, attack_max, defense, one).items())
+
+    # mass[enemy_hp][player_hp]: probability that a round starts in this state; turns[...]: that mass times rounds played so far
+    mass = {enemy_health: {player_health: one}}
+    turns = {enemy_health: {player_health: 0 * one}}
+    remaining_hp, win_turns = {}, 0 * one
+    loss_probability = 0 * one
+    for enemy_hp in range(enemy_health, 0, -1):
+        states = mass.pop(enemy_hp, None)
+        if not states:
+            continue
+        state_turns = turns.pop(enemy_hp)
+        for player_hp, probability in states.items():
+            played = state_turns[player_hp] + probability # Mass-weighted rounds including this one
+            for damage, roll_share in player_rolls:
+                if damage >= enemy_hp:
+                    remaining_hp[player_hp] = remaining_hp.get(player_hp, 0 * one) + probability * roll_share
+                    win_turns += played * roll_share
+                    continue
+                next_mass = mass.setdefault(enemy_hp - damage, {})
+                next_turns = turns.setdefault(enemy_hp - damage, {})
+                for taken, hit_share in enemy_hits:
+                    share = roll_share * hit_share
+                    if taken >= player_hp:
+                        loss_probability += probability * share
+                    else:
+                        next_mass[player_hp - taken] = next_mass.get(player_hp - taken, 0 * one) + probability * share
+                        next_turns[player_hp - taken] = next_turns.get(player_hp - taken, 0 * one) + played * share
+
+    win_probability = sum(remaining_hp.values(), 0 * one)
+    expected_turns = win_turns / win_probability if win_probability else None
+    expected_damage = sum(((player_health - hp) * p for hp, p in remaining_hp.items()), 0 * one) + loss_probability * player_health
+    return CombatOdds(player_health, win_probability, loss_probability, dict(sorted(remaining_hp.items())), expected_turns, expected_damage)
+
+def odds_for(player_snapshot, enemy_data, exact=False):
+    """Odds of a combat_engine.snapshot_player snapshot against an enemy template or instance."""
+    return solve(player_snapshot['health'], player_snapshot['damage_bonus'], player_snapshot['total_defense'],
+                 enemy_data['health'], enemy_data['attack_min'], enemy_data['attack_max'], exact)
+
+def odds_for_enemy_id(player_snapshot, enemy_id, exact=False):
+    enemy_data = entities.ENEMY_TEMPLATES.get(enemy_id)
+    return odds_for(player_snapshot, enemy_data, exact) if enemy_data else None
@@ -1,87 +1,75 @@
 import os             # For accessing environment variables
-from dotenv import load_dotenv # For loading .env file
 import copy # For deep copying schemas before modification
-
-load_dotenv() # Load variables from .env file into environment
+import threading
 
 # --- AI Provider Configuration ---
-# Set this to "GEMINI" or "OPENAI" to choose the AI provider
+# Set this to "GEMINI", "OPENAI" or "OFFLINE" (local template narration, see ai_offline.py) to choose the AI provider
 AI_PROVIDER = "OPENAI" # For testing OpenAI path now
 # Or load from .env: AI_PROVIDER = os.getenv("AI_PROVIDER", "GEMINI").upper()
 
-# --- Gemini Configuration (if used) ---
-try:
-    import google.genai as genai # This is the primary import
-    from google.genai import types as gemini_types
-    print(f"SDK Version (config.py): {genai.__version__}")
-except ImportError:
-    print("Google GenAI SDK (google-genai) not installed. AI features may be limited or unavailable.")
-    genai = None
-    gemini_types = None
+# --- Configuration ---
+DEBUG_MODE = True # Set to True to enable debug prints for AI calls
 
-# --- OpenAI Configuration (if used) ---
-try:
-    from openai import OpenAI as OpenAIClient
-    print(f"OpenAI SDK imported successfully.")
-except ImportError:
-    print("OpenAI SDK not installed. OpenAI provider will be unavailable.")
-    OpenAIClient = None # So we can check for its existence
+# --- Offline Narration ---
+# Opt-in: serve offline narration when the configured provider cannot be initialized (see offline_fallback_active)
+# or while its circuit is open. Off, a missing key or SDK leaves the client unavailable and AI calls return errors.
+AI_FALLBACK_TO_OFFLINE = False
+OFFLINE_AI_LATENCY_SECONDS = 0.0 # Synthetic per-call latency, for load tests that want network-like timing
+OFFLINE_AI_SEED = 0
 
-# Import our function declarations
-GAME_EVENT_TOOLS = None
-TOOL_CONFIG = None
-if genai and gemini_types: # Check if SDK and types loaded
-    try:
-        from ai_function_declarations import (
-            LIST_POINTS_OF_INTEREST_DECLARATION,
-            PLAYER_DISCOVERS_ITEM_DECLARATION,
-            PLAYER_ENCOUNTERS_ENEMY_DECLARATION,
-            NARRATIVE_OUTCOME_DECLARATION
-        )
-        GAME_EVENT_TOOLS = gemini_types.Tool(function_declarations=[
-            LIST_POINTS_OF_INTEREST_DECLARATION,
-            PLAYER_DISCOVERS_ITEM_DECLARATION,
-            PLAYER_ENCOUNTERS_ENEMY_DECLARATION,
-            NARRATIVE_OUTCOME_DECLARATION
-        ])
-        TOOL_CONFIG = gemini_types.ToolConfig(function_calling_config=gemini_types.FunctionCallingConfig(mode="ANY"))
-    except ImportError as e:
-        print(f"Could not import AI function declarations: {e}. Function calling will be disabled.")
-    except AttributeError as e:
-        print(f"AttributeError while setting up tools (likely SDK version issue with types.Tool or ToolConfig): {e}. Function calling may be affected.")
-        GAME_EVENT_TOOLS = None
-        TOOL_CONFIG = None
+# --- AI Response Cache ---
+AI_CACHE_ENABLED = True
+AI_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ai_cache") # On-disk tier next to this file, survives restarts. None for memory-only caching.
+AI_CACHE_MAX_MEMORY_ENTRIES = 256
+AI_CACHE_MAX_DISK_ENTRIES = 4096
+AI_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60 # One week; None disables expiry
 
-# --- Configuration ---
-DEBUG_MODE = True # Set to True to enable debug prints for AI calls
+# --- Rate Limiting, Backoff and Circuit Breaker --- (shared by every AI call in the process)
+AI_RATE_LIMIT_RPM = 500 # Requests per minute; None disables
+AI_RATE_LIMIT_TPM = 200000 # Estimated prompt + completion tokens per minute; None disables
+AI_ESTIMATED_COMPLETION_TOKENS = 300 # Added to the prompt estimate when reserving token budget
+AI_BACKOFF_BASE_SECONDS = 0.5
+AI_BACKOFF_MAX_SECONDS = 8.0
+AI_CIRCUIT_FAILURE_THRESHOLD = 5 # Consecutive failures before AI calls switch to cached/offline narration
+AI_CIRCUIT_RESET_SECONDS = 30.0 # How long the circuit stays open before a trial request
+
+# --- Async Requests ---
+AI_REQUEST_TIMEOUT_SECONDS = 30 # Per-call timeout used by the async API (ai_utils.gather_ai_responses)
+
+# --- Streaming ---
+AI_STREAMING_ENABLED = True # Print location descriptions progressively as the provider generates them
+
+# --- Neighbour Prefetching ---
+AI_PREFETCH_ENABLED = True # Fetch adjacent locations' descriptions in the background on arrival, as one concurrent batch
+AI_PREFETCH_MAX_IN_FLIGHT = 4 # Most neighbour descriptions a session has outstanding at once
 
-# API_KEY is now loaded from .env
-GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY") 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# --- Telemetry ---
+AI_TELEMETRY_ENABLED = True # Record latency/tokens/retries per AI call (summary printed on quit in DEBUG_MODE)
+AI_TELEMETRY_BUFFER_SIZE = 1000 # Most recent calls kept in memory for the summary
+AI_TELEMETRY_JSONL_PATH = None # e.g. "ai_calls.jsonl" to also append every call record to a file
+
+# --- Randomness ---
+RANDOM_SEED = None # Set to an int to make encounter and loot rolls reproducible (see samplers.py)
+
+# --- Save Games ---
+SAVE_JOURNAL_ENABLED = True # Repeat saves append only the changes to <name>.journal (see save_journal.py)
+SAVE_JOURNAL_COMPACT_AFTER = 50 # Deltas before the next save rewrites the full snapshot and clears the journal
+AUTOSAVE_ENABLED = True # Save in the background while playing (see autosave.py) and once more on quit
+AUTOSAVE_NAME = "autosave" # Save slot the autosaves go to
+AUTOSAVE_EVERY_TURNS = 5 # Autosave after this many actions... (None to disable)
+AUTOSAVE_EVERY_SECONDS = 120 # ...or when this much time has passed since the last autosave (None to disable)
+
+# --- Game Server --- (see game_server.py)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 7777
+SERVER_MAX_SESSIONS = 1000 # Connections beyond this are turned away
+SERVER_WORKER_THREADS = 16 # Session steps run here, so one waiting on the AI never blocks the others
+SERVER_IDLE_TIMEOUT_SECONDS = 600 # Sessions without a command for this long are closed; 0 or None never closes them
 
 # --- Model Names --- (Provider-specific)
 GEMINI_MODEL_NAME = "gemini-1.5-flash-latest" # Changed to 1.5 for better function calling
 OPENAI_MODEL_NAME = "gpt-4.1" # Target model, can be changed to gpt-4o or gpt-4-turbo if needed
 
-# --- Load Raw Function Declarations ---
-RAW_FUNCTION_DECLARATIONS = []
-if genai or OpenAIClient: # Check if any SDK is available to justify loading declarations
-    try:
-        from ai_function_declarations import (
-            LIST_POINTS_OF_INTEREST_DECLARATION,
-            PLAYER_DISCOVERS_ITEM_DECLARATION,
-            PLAYER_ENCOUNTERS_ENEMY_DECLARATION,
-            NARRATIVE_OUTCOME_DECLARATION
-        )
-        RAW_FUNCTION_DECLARATIONS = [
-            LIST_POINTS_OF_INTEREST_DECLARATION,
-            PLAYER_DISCOVERS_ITEM_DECLARATION,
-            PLAYER_ENCOUNTERS_ENEMY_DECLARATION,
-            NARRATIVE_OUTCOME_DECLARATION
-        ]
-    except ImportError as e:
-        print(f"Could not import AI function declarations: {e}. Function calling will be disabled.")
-
 # --- Helper to convert schema types for OpenAI ---
 def _convert_schema_types_to_lowercase(schema_part):
     if isinstance(schema_part, dict):
@@ -104,74 +92,239 @@ def _convert_schema_types_to_lowercase(schema_part):
     else:
         return schema_part
 
-# --- Global AI Client and Provider-Specific Tool/Config Variables ---
-DEBUG_MODE = True 
-global_ai_client = None
-# For Gemini
-gemini_generation_config = None 
-# For OpenAI
-openai_tools_list = None # This will be the list of formatted tool dicts for OpenAI
-
-# --- Initialize based on AI_PROVIDER ---
-if AI_PROVIDER == "GEMINI":
-    if genai and gemini_types and GEMINI_API_KEY and GEMINI_API_KEY != 'YOUR_API_KEY':
+# --- Lazily Initialized AI State ---
+# Importing the provider SDKs, converting the tool schemas and building clients is the slowest part of
+# startup, and many importers of config (combat, saveload tools) never make an AI call. None of it happens
+# at import time: it runs once, on the first get_ai_client() / get_async_ai_client() call or the first
+# read of one of the module attributes below (handled by the module-level __getattr__).
+_LAZY_AI_ATTRIBUTES = (
+    "genai", "gemini_types", "OpenAIClient", "AsyncOpenAIClient",
+    "GAME_EVENT_TOOLS", "TOOL_CONFIG", "GEMINI_API_KEY", "OPENAI_API_KEY", "RAW_FUNCTION_DECLARATIONS",
+    "global_ai_client", "global_async_ai_client", "offline_fallback_active",
+    "gemini_generation_config", "gemini_async_generation_config", "openai_tools_list",
+)
+_ai_init_lock = threading.Lock()
+_ai_initialized = False
+
+def __getattr__(name):
+    if name in _LAZY_AI_ATTRIBUTES:
+        init_ai()
+        return globals()[name]
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+def get_ai_client():
+    """Returns the provider client, importing the SDK and building it on first use (None if unavailable)."""
+    init_ai()
+    return global_ai_client
+
+def get_async_ai_client():
+    init_ai()
+    return global_async_ai_client
+
+def get_active_ai_provider():
+    """The provider actually serving AI calls: AI_PROVIDER, or "OFFLINE" while offline_fallback_active.
+
+    Does not initialize the AI state: until that happens no fallback can be active.
+    """
+    return "OFFLINE" if globals().get("offline_fallback_active") else AI_PROVIDER
+
+def init_ai():
+    """Imports the provider SDKs and initializes the clients for AI_PROVIDER. Safe to call repeatedly."""
+    global _ai_initialized
+    if _ai_initialized:
+        return
+    with _ai_init_lock:
+        if _ai_initialized:
+            return
+        _load_api_keys()
+        _load_sdks()
+        _load_function_declarations()
+        _init_clients()
+        _ai_initialized = True
+
+def _load_api_keys():
+    global GEMINI_API_KEY, OPENAI_API_KEY
+    try:
+        from dotenv import load_dotenv # For loading .env file
+        load_dotenv() # Load variables from .env file into environment
+    except ImportError:
+        print("python-dotenv not installed. Reading API keys from the environment only.")
+    # API_KEY is now loaded from .env
+    GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY") 
+    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+def _load_sdks():
+    """Imports the SDK of the configured AI_PROVIDER only; the other provider's stays None, and OFFLINE needs neither."""
+    global genai, gemini_types, OpenAIClient, AsyncOpenAIClient, GAME_EVENT_TOOLS, TOOL_CONFIG
+    genai = None
+    gemini_types = None
+    OpenAIClient = None # So we can check for its existence
+    AsyncOpenAIClient = None
+
+    # --- Gemini Configuration (if used) ---
+    if AI_PROVIDER == "GEMINI":
+        try:
+            import google.genai as genai # This is the primary import
+            from google.genai import types as gemini_types
+            print(f"SDK Version (config.py): {genai.__version__}")
+        except ImportError:
+            print("Google GenAI SDK (google-genai) not installed. AI features may be limited or unavailable.")
+            genai = None
+            gemini_types = None
+
+    # --- OpenAI Configuration (if used) ---
+    elif AI_PROVIDER == "OPENAI":
         try:
-            global_ai_client = genai.GenerativeModel(model_name=GEMINI_MODEL_NAME)
+            from openai import OpenAI as OpenAIClient
+            from openai import AsyncOpenAI as AsyncOpenAIClient
+            print(f"OpenAI SDK imported successfully.")
+        except ImportError:
+            print("OpenAI SDK not installed. OpenAI provider will be unavailable.")
+            OpenAIClient = None
+            AsyncOpenAIClient = None
+
+    # Import our function declarations
+    GAME_EVENT_TOOLS = None
+    TOOL_CONFIG = None
+    if genai and gemini_types: # Check if SDK and types loaded
+        try:
+            from ai_function_declarations import (
+                LIST_POINTS_OF_INTEREST_DECLARATION,
+                PLAYER_DISCOVERS_ITEM_DECLARATION,
+                PLAYER_ENCOUNTERS_ENEMY_DECLARATION,
+                NARRATIVE_OUTCOME_DECLARATION
+            )
+            GAME_EVENT_TOOLS = gemini_types.Tool(function_declarations=[
+                LIST_POINTS_OF_INTEREST_DECLARATION,
+                PLAYER_DISCOVERS_ITEM_DECLARATION,
+                PLAYER_ENCOUNTERS_ENEMY_DECLARATION,
+                NARRATIVE_OUTCOME_DECLARATION
+            ])
+            TOOL_CONFIG = gemini_types.ToolConfig(function_calling_config=gemini_types.FunctionCallingConfig(mode="ANY"))
+        except ImportError as e:
+            print(f"Could not import AI function declarations: {e}. Function calling will be disabled.")
+        except AttributeError as e:
+            print(f"AttributeError while setting up tools (likely SDK version issue with types.Tool or ToolConfig): {e}. Function calling may be affected.")
+            GAME_EVENT_TOOLS = None
+            TOOL_CONFIG = None
+
+def _load_function_declarations():
+    global RAW_FUNCTION_DECLARATIONS
+    # --- Load Raw Function Declarations ---
+    RAW_FUNCTION_DECLARATIONS = []
+    if genai or OpenAIClient: # Check if any SDK is available to justify loading declarations
+        try:
+            from ai_function_declarations import (
+                LIST_POINTS_OF_INTEREST_DECLARATION,
+                PLAYER_DISCOVERS_ITEM_DECLARATION,
+                PLAYER_ENCOUNTERS_ENEMY_DECLARATION,
+                NARRATIVE_OUTCOME_DECLARATION
+            )
+            RAW_FUNCTION_DECLARATIONS = [
+                LIST_POINTS_OF_INTEREST_DECLARATION,
+                PLAYER_DISCOVERS_ITEM_DECLARATION,
+                PLAYER_ENCOUNTERS_ENEMY_DECLARATION,
+                NARRATIVE_OUTCOME_DECLARATION
+            ]
+        except ImportError as e:
+            print(f"Could not import AI function declarations: {e}. Function calling will be disabled.")
+
+def _init_clients():
+    global global_ai_client, global_async_ai_client, gemini_generation_config, gemini_async_generation_config, openai_tools_list
+    global offline_fallback_active
+    # --- Global AI Client and Provider-Specific Tool/Config Variables ---
+    global_ai_client = None
+    global_async_ai_client = None # Async counterpart used by ai_utils' *_async functions
+    offline_fallback_active = False # True when AI_FALLBACK_TO_OFFLINE replaced an unavailable provider; AI_PROVIDER is left as configured
+    # For Gemini
+    gemini_generation_config = None 
+    gemini_async_generation_config = None # google-genai GenerateContentConfig for the async client
+    # For OpenAI
+    openai_tools_list = None # This will be the list of formatted tool dicts for OpenAI
+
+    # --- Initialize based on AI_PROVIDER ---
+    if AI_PROVIDER == "GEMINI":
+        if genai and gemini_types and GEMINI_API_KEY and GEMINI_API_KEY != 'YOUR_API_KEY':
+            try:
+                global_ai_client = genai.GenerativeModel(model_name=GEMINI_MODEL_NAME)
             
-            gemini_sdk_tools = None
-            gemini_tool_config = None
-            if RAW_FUNCTION_DECLARATIONS:
-                # RAW_FUNCTION_DECLARATIONS are already Python dicts, suitable for function_declarations arg
-                gemini_sdk_tools = [gemini_types.Tool(function_declarations=RAW_FUNCTION_DECLARATIONS)]
-                gemini_tool_config = gemini_types.ToolConfig(function_calling_config=gemini_types.FunctionCallingConfig(mode="ANY"))
-
-            config_dict = {
-                "temperature": 0.7,
-                "max_output_tokens": 2048
-            }
-            if gemini_sdk_tools:
-                config_dict["tools"] = gemini_sdk_tools
-            if gemini_tool_config:
-                config_dict["tool_config"] = gemini_tool_config
+                gemini_sdk_tools = None
+                gemini_tool_config = None
+                if RAW_FUNCTION_DECLARATIONS:
+                    # RAW_FUNCTION_DECLARATIONS are already Python dicts, suitable for function_declarations arg
+                    gemini_sdk_tools = [gemini_types.Tool(function_declarations=RAW_FUNCTION_DECLARATIONS)]
+                    gemini_tool_config = gemini_types.ToolConfig(function_calling_config=gemini_types.FunctionCallingConfig(mode="ANY"))
+
+                config_dict = {
+                    "temperature": 0.7,
+                    "max_output_tokens": 2048
+                }
+                if gemini_sdk_tools:
+                    config_dict["tools"] = gemini_sdk_tools
+                if gemini_tool_config:
+                    config_dict["tool_config"] = gemini_tool_config
             
-            gemini_generation_config = gemini_types.GenerationConfig(**config_dict)
-            print(f"Successfully initialized Gemini AI Model: {GEMINI_MODEL_NAME}.")
-            if gemini_tool_config and gemini_sdk_tools: print(f"Gemini Function calling mode: {gemini_tool_config.function_calling_config.mode}")
-
-        except Exception as e:
-            print(f"Error initializing Gemini AI Client/Model: {e}")
-            if DEBUG_MODE: import traceback; traceback.print_exc()
-            global_ai_client = None
-    elif not GEMINI_API_KEY or GEMINI_API_KEY == 'YOUR_API_KEY': 
-        print("Skipping Gemini AI initialization. GOOGLE_API_KEY not found or is placeholder.")
-    else:
-        print("Skipping Gemini AI initialization as google-genai SDK is not available.")
+                gemini_generation_config = gemini_types.GenerationConfig(**config_dict)
 
-elif AI_PROVIDER == "OPENAI":
-    if OpenAIClient and OPENAI_API_KEY:
-        try:
-            global_ai_client = OpenAIClient(api_key=OPENAI_API_KEY)
+                try:
+                    # The google-genai async surface lives on Client.aio
+                    global_async_ai_client = genai.Client(api_key=GEMINI_API_KEY).aio
+                    gemini_async_generation_config = gemini_types.GenerateContentConfig(**config_dict)
+                except Exception as e:
+                    print(f"Could not initialize async Gemini client: {e}. Async AI calls will be unavailable.")
+                    global_async_ai_client = None
+                print(f"Successfully initialized Gemini AI Model: {GEMINI_MODEL_NAME}.")
+                if gemini_tool_config and gemini_sdk_tools: print(f"Gemini Function calling mode: {gemini_tool_config.function_calling_config.mode}")
+
+            except Exception as e:
+                print(f"Error initializing Gemini AI Client/Model: {e}")
+                if DEBUG_MODE: import traceback; traceback.print_exc()
+                global_ai_client = None
+        elif not GEMINI_API_KEY or GEMINI_API_KEY == 'YOUR_API_KEY': 
+            print("Skipping Gemini AI initialization. GOOGLE_API_KEY not found or is placeholder.")
+        else:
+            print("Skipping Gemini AI initialization as google-genai SDK is not available.")
+
+    elif AI_PROVIDER == "OPENAI":
+        if OpenAIClient and OPENAI_API_KEY:
+            try:
+                global_ai_client = OpenAIClient(api_key=OPENAI_API_KEY)
+                if AsyncOpenAIClient:
+                    global_async_ai_client = AsyncOpenAIClient(api_key=OPENAI_API_KEY)
             
-            if RAW_FUNCTION_DECLARATIONS:
-                openai_tools_list = []
-                for raw_decl_dict in RAW_FUNCTION_DECLARATIONS:
-                    # Deep copy before modifying to keep RAW_FUNCTION_DECLARATIONS pristine for Gemini
-                    decl_for_openai = _convert_schema_types_to_lowercase(copy.deepcopy(raw_decl_dict))
-                    openai_tools_list.append({"type": "function", "function": decl_for_openai})
+                if RAW_FUNCTION_DECLARATIONS:
+                    openai_tools_list = []
+                    for raw_decl_dict in RAW_FUNCTION_DECLARATIONS:
+                        # Deep copy before modifying to keep RAW_FUNCTION_DECLARATIONS pristine for Gemini
+                        decl_for_openai = _convert_schema_types_to_lowercase(copy.deepcopy(raw_decl_dict))
+                        openai_tools_list.append({"type": "function", "function": decl_for_openai})
             
-            print(f"Successfully initialized OpenAI Client. Target model: {OPENAI_MODEL_NAME}.")
-            if openai_tools_list: print("OpenAI function tools prepared with lowercase types.")
-
-        except Exception as e:
-            print(f"Error initializing OpenAI Client: {e}")
-            if DEBUG_MODE: import traceback; traceback.print_exc()
-            global_ai_client = None
-    elif not OPENAI_API_KEY:
-        print("Skipping OpenAI AI initialization. OPENAI_API_KEY not found in .env.")
+                print(f"Successfully initialized OpenAI Client. Target model: {OPENAI_MODEL_NAME}.")
+                if openai_tools_list: print("OpenAI function tools prepared with lowercase types.")
+
+            except Exception as e:
+                print(f"Error initializing OpenAI Client: {e}")
+                if DEBUG_MODE: import traceback; traceback.print_exc()
+                global_ai_client = None
+        elif not OPENAI_API_KEY:
+            print("Skipping OpenAI AI initialization. OPENAI_API_KEY not found in .env.")
+        else:
+            print("Skipping OpenAI AI initialization as OpenAI SDK is not available.")
+    elif AI_PROVIDER == "OFFLINE":
+        _init_offline_client()
     else:
-        print("Skipping OpenAI AI initialization as OpenAI SDK is not available.")
-else:
-    print(f"Invalid AI_PROVIDER: {AI_PROVIDER}. Please choose 'GEMINI' or 'OPENAI'.")
+        print(f"Invalid AI_PROVIDER: {AI_PROVIDER}. Please choose 'GEMINI', 'OPENAI' or 'OFFLINE'.")
+
+    if global_ai_client is None and AI_FALLBACK_TO_OFFLINE and AI_PROVIDER != "OFFLINE":
+        print(f"WARNING: AI provider {AI_PROVIDER} unavailable. Falling back to offline narration (AI_FALLBACK_TO_OFFLINE).")
+        _init_offline_client()
+        offline_fallback_active = True
+
+def _init_offline_client():
+    global global_ai_client, global_async_ai_client
+    import ai_offline # Imported here: it pulls in the game data modules
+    global_ai_client = ai_offline.OfflineNarrationProvider(latency_seconds=OFFLINE_AI_LATENCY_SECONDS, seed=OFFLINE_AI_SEED)
+    global_async_ai_client = global_ai_client # The offline provider serves both the sync and async paths
 
 # For ai_utils.py to access the correct config based on provider
 # We can pass the specific config object or have ai_utils check AI_PROVIDER too.
@@ -0,0 +1,76 @@
+from dataclasses import dataclass, field
+
+import item_registry
+
+# --- Derived Player Stats ---
+# Everything combat and the stats screen need from the player's equipment, computed once per equipment
+# change instead of on every attack: weapon damage bonus, armor + shield defense, display names, and the
+# summed effects of equipped trinkets (rings, charms), with "<kind>_resistance" effects collected as resistances.
+# The result is cached on the player as player['derived_stats'] (never saved; see saveload.to_save_data).
+# The inventory screen refreshes it when gear changes, and get_derived_stats() also rebuilds it if the cached
+# one was built for different gear (e.g. a freshly loaded save).
+
+MAX_EQUIPPED_TRINKETS = 2
+RESISTANCE_SUFFIX = "_resistance"
+
+@dataclass(slots=True)
+class DerivedStats:
+    equipment: tuple # (weapon id, armor id, shield id, trinket ids) these stats were computed for
+    weapon_name: str | None = None
+    damage_bonus: int = 0
+    armor_name: str | None = None
+    armor_defense: int = 0
+    shield_name: str | None = None
+    shield_defense: int = 0
+    total_defense: int = 0
+    trinket_names: list = field(default_factory=list)
+    resistances: dict = field(default_factory=dict) # e.g. {"magic": 1}
+    trinket_effects: dict = field(default_factory=dict) # Other summed trinket effects, e.g. {"luck_bonus": 1, "provides_dim_light": True}
+
+def _equipment_key(player_character):
+    return (player_character.get('equipped_weapon'), player_character.get('equipped_armor'),
+            player_character.get('equipped_shield'), tuple(player_character.get('equipped_trinkets') or ()))
+
+def compute_derived_stats(player_character):
+    registry = item_registry.REGISTRY
+    equipment = _equipment_key(player_character)
+    weapon_id, armor_id, shield_id, trinket_ids = equipment
+    weapon = registry.equipped_record(weapon_id, 'weapon')
+    armor = registry.equipped_record(armor_id, 'armor')
+    shield = registry.equipped_record(shield_id, 'shield')
+    stats = DerivedStats(
+        equipment=equipment,
+        weapon_name=weapon.name if weapon else None,
+        damage_bonus=weapon.damage_bonus if weapon else 0,
+        armor_name=armor.name if armor else None,
+        armor_defense=armor.defense_bonus if armor else 0,
+        shield_name=shield.name if shield else None,
+        shield_defense=shield.defense_bonus if shield else 0,
+    )
+    stats.total_defense = stats.armor_defense + stats.shield_defense
+    for trinket_id in trinket_ids:
+        trinket = registry.equipped_record(trinket_id, 'trinket')
+        if not trinket:
+            continue
+        stats.trinket_names.append(trinket.name)
+        for effect_key, amount in trinket.effect.items():
+            if effect_key.endswith(RESISTANCE_SUFFIX):
+                kind = effect_key[:-len(RESISTANCE_SUFFIX)]
+                stats.resistances[kind] = stats.resistances.get(kind, 0) + amount
+            elif isinstance(amount, bool) or not isinstance(amount, (int, float)):
+                stats.trinket_effects[effect_key] = amount # Flags and other non-numeric effects don't stack
+            else:
+                stats.trinket_effects[effect_key] = stats.trinket_effects.get(effect_key, 0) + amount
+    return stats
+
+def refresh_derived_stats(player_character):
+    """Recomputes and caches the player's derived stats. Call after changing equipment."""
+    stats = player_character['derived_stats'] = compute_derived_stats(player_character)
+    return stats
+
+def get_derived_stats(player_character):
+    """The cached derived stats, rebuilt only if the equipment changed since they were computed."""
+    stats = player_character.get('derived_stats')
+    if stats is None or stats.equipment != _equipment_key(player_character):
+        stats = refresh_derived_stats(player_character)
+    return stats
@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import config
+
+# --- Line Protocol Client ---
+# Plays on a game_server (see its protocol notes), or load-tests it with --bench: N bots connect at once and each
+# plays random games, answering every prompt with a random valid command. The bench reports throughput, response
+# latency and the server's CPU time per command, and from that how many sessions one core can host.
+#
+#     python game_client.py                                        # play on config.SERVER_HOST:SERVER_PORT
+#     python game_client.py --bench 500 --games 2                  # 500 concurrent bots, 2 games each
+#     python game_server.py --offline & python game_client.py --bench 200 --think-time 10
+
+BOT_ACTION_KEYS = "1111222334" # Main menu actions bots pick from: mostly exploring and moving, never quitting early
+BOT_READ_TIMEOUT_SECONDS = 60 # A bot that hears nothing for this long counts an error and gives up the game
+
+async def read_event(reader, timeout=None):
+    """The next event from the server, or None once the connection is closed."""
+    line = await asyncio.wait_for(reader.readline(), timeout)
+    return json.loads(line) if line else None
+
+async def send_command(writer, command):
+    writer.write((command + "\n").encode())
+    await writer.drain()
+
+# --- Interactive play ---
+def render_event(event, show_debug=False):
+    event_type = event["type"]
+    if event_type == "text" or event_type == "error":
+        print(event["text"])
+    elif event_type == "debug" and show_debug:
+        print(event["text"])
+    elif event_type == "narration_chunk":
+        print(event["text"], end="", flush=True)
+    elif event_type == "narration_end":
+        print()
+    elif event_type == "inventory":
+        print("\n--- Inventory ---")
+        if not event["items"]:
+            print("Your inventory is empty.")
+        for item in event["items"]:
+            print(f"- {item['name']}" + (f" x{item['count']}" if item['count'] > 1 else "") + (" (equipped)" if item['equipped'] else "") + f" [{item['item_id']}]")
+    elif event_type == "prompt" and event["kind"] == "choice":
+        print(event["prompt"])
+        for i, option in enumerate(event["options"]):
+            print(f"  {i+1}. {option}")
+    elif event_type == "server_stats":
+        print(json.dumps(event, indent=2))
+
+def input_prompt(prompt):
+    if prompt["kind"] == "choice":
+        return f"Enter your choice (1-{len(prompt['options'])}): "
+    return prompt["prompt"]
+
+async def play(host, port, show_debug=False):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while (event := await read_event(reader)) is not None:
+            render_event(event, show_debug)
+            if event["type"] == "prompt":
+                try:
+                    command = await asyncio.to_thread(input, input_prompt(event))
+                except EOFError:
+                    command = "/quit"
+                await send_command(writer, command)
+    finally:
+        writer.close()
+
+# --- Load test ---
+def choose_bot_command(prompt, rng):
+    """A random valid answer to a prompt event."""
+    if prompt["kind"] == "choice":
+        return str(rng.randint(1, len(prompt["options"])))
+    if prompt["kind"] == "inventory":
+        if prompt["options"] and rng.random() < 0.5:
+            return f"{rng.choice(['use', 'equip'])} {rng.choice(prompt['options'])}"
+        return "back"
+    if prompt["prompt"] == "> ":
+        return rng.choice(BOT_ACTION_KEYS)
+    if "(y/n)" in prompt["prompt"]:
+        return "y" # Quick start
+    return "Bot"
+
+async def run_bot(host, port, games, max_commands, rng, latencies, totals):
+    """Plays `games` games one after another, each until it ends or max_commands have been sent."""
+    for _ in range(games):
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            totals["errors"] += 1
+            continue
+        commands = 0
+        try:
+            event = await read_event(reader, BOT_READ_TIMEOUT_SECONDS)
+            while True:
+                if event is None: # The server closes the connection when the game ends
+                    totals["games_finished"] += 1
+                    break
+                if event["type"] == "error":
+                    totals["errors"] += 1
+                    break
+                if event["type"] != "prompt":
+                    event = await read_event(reader, BOT_READ_TIMEOUT_SECONDS)
+                    continue
+                if commands >= max_commands:
+                    await send_command(writer, "/quit")
+                    totals["games_abandoned"] += 1
+                    break
+                sent_at = time.perf_counter()
+                await send_command(writer, choose_bot_command(event, rng))
+                commands += 1
+                event = await read_event(reader, BOT_READ_TIMEOUT_SECONDS) # Latency: until the first event of the answer arrives
+                latencies.append(time.perf_counter() - sent_at)
+        except (ConnectionError, asyncio.TimeoutError):
+            totals["errors"] += 1
+        finally:
+            totals["commands"] += commands
+            writer.close()
+
+async def fetch_server_stats(host, port):
+    """The server's counters, read over a short-lived connection (which counts as one started session)."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        await send_command(writer, "/stats")
+        while (event := await read_event(reader)) is not None:
+            if event["type"] == "server_stats":
+                await send_command(writer, "/quit")
+                return event
+        return None
+    finally:
+        writer.close()
+
+async def bench(host, port, bots, games, max_commands, think_time, seed=None):
+    seed_rng = random.Random(seed)
+    latencies = []
+    totals = {"commands": 0, "games_finished": 0, "games_abandoned": 0, "errors": 0}
+    stats_before = await fetch_server_stats(host, port)
+    start_time = time.perf_counter()
+    await asyncio.gather(*(run_bot(host, port, games, max_commands, random.Random(seed_rng.getrandbits(64)), latencies, totals) for _ in range(bots)))
+    elapsed = time.perf_counter() - start_time
+    stats_after = await fetch_server_stats(host, port)
+    return format_bench_report(bots, games, totals, latencies, elapsed, stats_before, stats_after, think_time)
+
+def format_bench_report(bots, games, totals, latencies, elapsed, stats_before, stats_after, think_time):
+    games_played = totals["games_finished"] + totals["games_abandoned"]
+    lines = [
+        f"--- Bench: {bots} concurrent bot(s) x {games} game(s) ---",
+        f"{games_played} game(s) in {elapsed:.2f}s ({totals['games_finished']} played to the end, {totals['games_abandoned']} stopped at the command limit, {totals['errors']} error(s))",
+        f"{totals['commands']} command(s): {totals['commands'] / elapsed:.0f}/s, {games_played / elapsed:.1f} game(s)/s",
+    ]
+    if latencies:
+        latencies.sort()
+        lines.append(f"Latency: median {statistics.median(latencies) * 1000:.2f} ms, p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    if stats_before and stats_after:
+        cpu_seconds = stats_after["cpu_seconds"] - stats_before["cpu_seconds"]
+        commands = stats_after["commands_handled"] - stats_before["commands_handled"]
+        if cpu_seconds > 0 and commands:
+            commands_per_core = commands / cpu_seconds
+            lines.append(f"Server: {cpu_seconds:.2f}s CPU, {cpu_seconds * 1000 / commands:.3f} ms CPU per command, {commands_per_core:.0f} command(s) per core-second")
+            # A player sending one command every think_time seconds costs 1 / think_time commands per second
+            lines.append(f"Sessions per core at one command every {think_time:g}s: ~{commands_per_core * think_time:.0f}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Play on a game_server, or load-test it with --bench.")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--debug", action="store_true", help="Show the server's debug events")
+    parser.add_argument("--bench", type=int, metavar="BOTS", help="Run this many concurrent bots instead of playing")
+    parser.add_argument("--games", type=int, default=1, help="Games each bot plays, one after another")
+    parser.add_argument("--max-commands", type=int, default=200, help="Commands a bot sends before leaving a game")
+    parser.add_argument("--think-time", type=float, default=5.0, help="Seconds a human takes per command, for the sessions-per-core estimate")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the bots' choices")
+    args = parser.parse_args()
+    try:
+        if args.bench:
+            print(asyncio.run(bench(args.host, args.port, args.bench, args.games, args.max_commands, args.think_time, args.seed)))
+        else:
+            asyncio.run(play(args.host, args.port, args.debug))
+    except ConnectionRefusedError:
+        print(f"Could not connect to {args.host}:{args.port}. Is game_server.py running?")
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
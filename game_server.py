@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import ai_prefetch
+import ai_utils
+import game_session
+
+# --- Multi-Session Game Server ---
+# Hosts many GameSessions in one process over a line-based TCP protocol:
+#   client -> server: one command per line, answering the last prompt; "/stats" asks for server_stats, "/quit" disconnects
+#   server -> client: one JSON object per line: the game_session events, plus {"type": "error", "text"} and
+#                     {"type": "server_stats", ...}. The connection closes when the game ends.
+# Each connection gets its own GameSession with its own player dict and random.Random. The location, item and enemy
+# tables are the shared module data, which sessions only read, and AI calls go through ai_utils' process-wide
+# response cache, rate limiter and circuit breaker. Steps run on a thread pool so a session blocked on an AI call never
+# stalls the event loop; events are written out as they happen, so streamed narration reaches the client live.
+# The prompts a session fans out (neighbour prefetches) go through ai_utils.gather_ai_responses on the shared async
+# loop instead, so they hold no worker thread while in flight.
+# Hosted sessions cannot load or save (the save slots are shared by the whole process).
+#
+#     python game_server.py --port 7777
+#     python game_client.py --port 7777               # play
+#     python game_client.py --port 7777 --bench 200   # load test (see game_client.py)
+
+class GameServer:
+    def __init__(self, host=None, port=None, max_sessions=None, worker_threads=None, idle_timeout=None, seed=None):
+        self.host = host or config.SERVER_HOST
+        self.port = config.SERVER_PORT if port is None else port # 0 picks a free port (see start())
+        self.max_sessions = config.SERVER_MAX_SESSIONS if max_sessions is None else max_sessions
+        self.idle_timeout = config.SERVER_IDLE_TIMEOUT_SECONDS if idle_timeout is None else idle_timeout # 0 disables it
+        worker_threads = config.SERVER_WORKER_THREADS if worker_threads is None else worker_threads
+        self._executor = ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix="session")
+        # Session RNGs are seeded from this one, so a seeded server replays the same sessions in connection order
+        self._seed_rng = random.Random(config.RANDOM_SEED if seed is None else seed)
+        self._server = None
+        self.active_sessions = 0
+        self.sessions_started = 0
+        self.sessions_finished = 0 # Games played to the end (quit or death), not dropped connections
+        self.commands_handled = 0
+        self.step_seconds = 0.0 # Wall time spent inside session steps
+        self._start_time = None
+        self._start_cpu = None
+
+    async def start(self):
+        """Starts listening and returns the bound port."""
+        # Create the shared AI state up front, so concurrent first calls from session threads find it ready
+        config.get_ai_client()
+        ai_utils.get_response_cache(); ai_utils.get_rate_limiter(); ai_utils.get_circuit_breaker(); ai_utils.get_telemetry()
+        # A backlog as deep as the session limit, so a burst of connections waits to be accepted instead of being dropped
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port, backlog=self.max_sessions)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._start_time = time.monotonic()
+        self._start_cpu = time.process_time()
+        return self.port
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "type": "server_stats",
+            "active_sessions": self.active_sessions,
+            "sessions_started": self.sessions_started,
+            "sessions_finished": self.sessions_finished,
+            "commands_handled": self.commands_handled,
+            "step_seconds": round(self.step_seconds, 6),
+            "uptime_seconds": round(time.monotonic() - self._start_time, 3),
+            "cpu_seconds": round(time.process_time() - self._start_cpu, 3), # The whole process, all threads
+        }
+
+    def format_stats(self):
+        stats = self.stats()
+        per_command = stats["step_seconds"] * 1000 / stats["commands_handled"] if stats["commands_handled"] else 0.0
+        return (f"{stats['sessions_started']} session(s) started, {stats['sessions_finished']} finished, {stats['active_sessions']} active; "
+                f"{stats['commands_handled']} command(s), {per_command:.3f} ms per step; {stats['cpu_seconds']:.2f}s CPU in {stats['uptime_seconds']:.1f}s")
+
+    async def _handle_client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+
+        def write(event):
+            writer.write((json.dumps(event) + "\n").encode())
+
+        def send(event):
+            # Called from session threads as events happen; the loop thread does the actual write, in order
+            loop.call_soon_threadsafe(write, event)
+
+        if self.active_sessions >= self.max_sessions:
+            write({"type": "error", "text": "The server is full. Please try again later."})
+            await self._close_writer(writer)
+            return
+
+        self.active_sessions += 1
+        self.sessions_started += 1
+        prefetcher = None
+        if config.AI_PREFETCH_ENABLED and config.get_active_ai_provider() != "OFFLINE":
+            # Offline narration is generated locally, so there is no latency to hide
+            prefetcher = ai_prefetch.PrefetchScheduler(max_in_flight=config.AI_PREFETCH_MAX_IN_FLIGHT)
+        session = game_session.GameSession(rng=random.Random(self._seed_rng.getrandbits(64)), on_event=send, prefetcher=prefetcher,
+                                           stream_narration=config.AI_STREAMING_ENABLED, allow_saves=False)
+        try:
+            await loop.run_in_executor(self._executor, session.start)
+            await writer.drain()
+            while not session.is_over:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout or None)
+                except asyncio.TimeoutError:
+                    write({"type": "error", "text": "Idle for too long. Goodbye."})
+                    break
+                if not line:
+                    break # Client disconnected
+                command = line.decode("utf-8", errors="replace").rstrip("\r\n")
+                if command == "/quit":
+                    break
+                if command == "/stats":
+                    write(self.stats())
+                else:
+                    start_time = time.perf_counter()
+                    await loop.run_in_executor(self._executor, session.step, command)
+                    self.step_seconds += time.perf_counter() - start_time
+                    self.commands_handled += 1
+                await writer.drain()
+            if session.is_over:
+                self.sessions_finished += 1
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e: # ValueError: an overlong line
+            if config.DEBUG_MODE: print(f"DEBUG: Session ended by connection error: {e!r}")
+        finally:
+            self.active_sessions -= 1
+            session.close()
+            await self._close_writer(writer)
+
+    async def _close_writer(self, writer):
+        try:
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+async def serve(host=None, port=None, seed=None):
+    server = GameServer(host, port, seed=seed)
+    bound_port = await server.start()
+    fallback_note = " (unavailable, serving offline narration)" if config.offline_fallback_active else ""
+    print(f"Silent Symphony server listening on {server.host}:{bound_port} (AI provider: {config.AI_PROVIDER}{fallback_note})")
+    try:
+        await server.serve_forever()
+    finally:
+        print(server.format_stats())
+        await server.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many concurrent game sessions over a line-based TCP protocol.")
+    parser.add_argument("--host", default=None, help=f"Interface to listen on (default: {config.SERVER_HOST})")
+    parser.add_argument("--port", type=int, default=None, help=f"Port to listen on (default: {config.SERVER_PORT})")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the per-session RNGs")
+    parser.add_argument("--offline", action="store_true", help="Use the offline narration provider instead of the configured AI")
+    args = parser.parse_args()
+    if args.offline:
+        config.AI_PROVIDER = "OFFLINE"
+    try:
+        asyncio.run(serve(args.host, args.port, args.seed))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import item_registry
+
+# --- Counted Inventory ---
+# player['inventory'] holds one count per distinct item id instead of one list entry per unit, so memory and
+# every scan (the inventory screen, category filters) scale with distinct items, not total units.
+# Items keep the order they were first picked up in; an id whose count drops to zero leaves, and comes back
+# at the end. Ids are also indexed by item type, and `version` goes up on every change so views built
+# from the inventory can tell when they are stale. The per-category id lists the inventory screen browses are
+# memoized that way: built on first use and reused until the next add/remove, so switching categories and
+# moving the cursor never rescan the inventory.
+# Saves store the plain {item_id: count} dict from to_save_data(); older saves stored a flat list of ids
+# and are converted by the schema 1 -> 2 migration in save_format.
+
+class Inventory:
+    __slots__ = ("_counts", "_order", "_by_type", "_total", "_next_order", "version", "_category_views", "_category_views_version")
+
+    def __init__(self, counts=None):
+        self._counts = {} # item_id -> count (> 0), in pickup order
+        self._order = {} # item_id -> pickup sequence number, for merging the per-type lists back into pickup order
+        self._by_type = {} # item type (None for ids unknown to the registry) -> {item_id: None}, in pickup order
+        self._total = 0
+        self._next_order = 0
+        self.version = 0
+        self._category_views = {} # category -> tuple of ids, valid while _category_views_version == version
+        self._category_views_version = 0
+        for item_id, count in (counts or {}).items():
+            self.add(item_id, count)
+
+    @classmethod
+    def from_save_data(cls, data):
+        """Builds an inventory from its saved form: a {item_id: count} dict, or the legacy list of ids."""
+        inventory = cls()
+        if isinstance(data, dict):
+            for item_id, count in data.items():
+                inventory.add(item_id, count)
+        else:
+            for item_id in data or []:
+                inventory.add(item_id)
+        return inventory
+
+    def to_save_data(self):
+        return dict(self._counts)
+
+    # --- Changes ---
+    def add(self, item_id, quantity=1):
+        if quantity <= 0:
+            return
+        count = self._counts.get(item_id)
+        if count is None:
+            self._counts[item_id] = quantity
+            self._order[item_id] = self._next_order
+            self._next_order += 1
+            self._by_type.setdefault(item_registry.REGISTRY.type_of(item_id), {})[item_id] = None
+        else:
+            self._counts[item_id] = count + quantity
+        self._total += quantity
+        self.version += 1
+
+    def add_many(self, item_ids):
+        """Adds one unit per id in item_ids (e.g. a loot roll with repeated ids)."""
+        for item_id in item_ids:
+            self.add(item_id)
+
+    def remove(self, item_id, quantity=1):
+        """Removes `quantity` units of item_id. Raises ValueError if there are fewer than that."""
+        count = self._counts.get(item_id, 0)
+        if count < quantity:
+            raise ValueError(f"Inventory has {count} of '{item_id}', cannot remove {quantity}")
+        if count == quantity:
+            del self._counts[item_id]
+            del self._order[item_id]
+            item_type = item_registry.REGISTRY.type_of(item_id)
+            type_ids = self._by_type[item_type]
+            del type_ids[item_id]
+            if not type_ids:
+                del self._by_type[item_type]
+        else:
+            self._counts[item_id] = count - quantity
+        self._total -= quantity
+        self.version += 1
+
+    # --- Queries ---
+    def count(self, item_id):
+        return self._counts.get(item_id, 0)
+
+    def __contains__(self, item_id):
+        return item_id in self._counts
+
+    def __len__(self):
+        """Total units, like the length of the old list."""
+        return self._total
+
+    def __iter__(self):
+        """Distinct item ids in pickup order."""
+        return iter(self._counts)
+
+    def __eq__(self, other):
+        return isinstance(other, Inventory) and self._counts == other._counts
+
+    def __repr__(self):
+        return f"Inventory({self._counts!r})"
+
+    @property
+    def distinct_count(self):
+        return len(self._counts)
+
+    def items(self):
+        """(item_id, count) pairs in pickup order."""
+        return self._counts.items()
+
+    def ids_of_type(self, item_type):
+        return list(self._by_type.get(item_type, ()))
+
+    def ids_in_category(self, category):
+        """Distinct ids browsed under an inventory category ("All Items" is everything), in pickup order.
+
+        Returns a tuple that is memoized until the inventory next changes.
+        """
+        if self._category_views_version != self.version:
+            self._category_views.clear()
+            self._category_views_version = self.version
+        view = self._category_views.get(category)
+        if view is None:
+            view = self._category_views[category] = self._build_category_view(category)
+        return view
+
+    def _build_category_view(self, category):
+        if category == "All Items":
+            return tuple(self._counts)
+        ids = [item_id for item_type in item_registry.CATEGORY_TO_TYPES.get(category, ()) for item_id in self._by_type.get(item_type, ())]
+        ids.sort(key=self._order.__getitem__)
+        return tuple(ids)
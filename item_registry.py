@@ -0,0 +1,145 @@
+from dataclasses import dataclass, field
+
+import items
+
+# --- Compiled Item Registry ---
+# items.ITEM_DB stays the hand-edited source of truth. At import it is compiled once into typed, slotted
+# ItemRecords with integer handles and indexes by type, inventory category and effect key. Hot paths use
+# the attribute API (REGISTRY.get(item_id).damage_bonus, REGISTRY.in_category(item_id, "Weapons")).
+# Records and the registry also behave like the old dicts (record['name'], REGISTRY.get(item_id, {}).get('type')),
+# so code written against ITEM_DB keeps working.
+
+# Inventory screen categories. "All Items" is special: it shows everything.
+INVENTORY_CATEGORIES = ["All Items", "Weapons", "Armor", "Shields", "Consumables", "Scrolls", "Junk"]
+CATEGORY_TO_TYPES = {
+    "Weapons": ["weapon"],
+    "Armor": ["armor"], # Body armor, helmets, gloves, boots etc.
+    "Shields": ["shield"],
+    "Consumables": ["consumable"], # Potions, food etc.
+    "Scrolls": ["scroll"], # Magical scrolls
+    # Other specific types are grouped into Junk for browsing
+    "Junk": ["junk", "valuable", "trade_good", "crafting_material", "alchemy_ingredient", "reagent", "tool", "quest_item", "book", "trinket"]
+}
+TYPE_TO_CATEGORY = {item_type: category for category, item_types in CATEGORY_TO_TYPES.items() for item_type in item_types}
+
+@dataclass(slots=True)
+class ItemRecord:
+    handle: int
+    id: str
+    name: str
+    description: str
+    type: str
+    value: int
+    category: str | None # Inventory category, None for types only listed under "All Items"
+    damage_bonus: int = 0
+    defense_bonus: int = 0
+    slot: str | None = None
+    effect: dict = field(default_factory=dict)
+    data: dict = field(default_factory=dict, repr=False) # The source ITEM_DB entry
+
+    # --- dict-compatible view over the source entry ---
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def keys(self):
+        return self.data.keys()
+
+class ItemRegistry:
+    def __init__(self, item_db):
+        self.records = [] # handle -> ItemRecord
+        self._by_id = {}
+        self.by_type = {} # type -> tuple of ItemRecords
+        self.by_category = {category: () for category in CATEGORY_TO_TYPES} # category -> tuple of ItemRecords
+        self.by_effect = {} # effect key -> tuple of ItemRecords
+        by_type, by_category, by_effect = {}, {}, {}
+        for item_id, item_data in item_db.items():
+            record = ItemRecord(
+                handle=len(self.records),
+                id=item_id,
+                name=item_data.get('name', item_id),
+                description=item_data.get('description', ""),
+                type=item_data.get('type', ""),
+                value=item_data.get('value', 0),
+                category=TYPE_TO_CATEGORY.get(item_data.get('type')),
+                damage_bonus=item_data.get('damage_bonus', 0),
+                defense_bonus=item_data.get('defense_bonus', 0),
+                slot=item_data.get('slot'),
+                effect=item_data.get('effect') or {},
+                data=item_data,
+            )
+            self.records.append(record)
+            self._by_id[item_id] = record
+            by_type.setdefault(record.type, []).append(record)
+            if record.category:
+                by_category.setdefault(record.category, []).append(record)
+            for effect_key in record.effect:
+                by_effect.setdefault(effect_key, []).append(record)
+        self.by_type.update((key, tuple(value)) for key, value in by_type.items())
+        self.by_category.update((key, tuple(value)) for key, value in by_category.items())
+        self.by_effect.update((key, tuple(value)) for key, value in by_effect.items())
+
+    # --- Fast API ---
+    def handle(self, item_id):
+        """Integer handle for item_id (stable for the life of the process), or None if unknown."""
+        record = self._by_id.get(item_id)
+        return record.handle if record else None
+
+    def by_handle(self, handle):
+        return self.records[handle]
+
+    def type_of(self, item_id):
+        record = self._by_id.get(item_id)
+        return record.type if record else None
+
+    def category_of(self, item_id):
+        record = self._by_id.get(item_id)
+        return record.category if record else None
+
+    def name_of(self, item_id, default="Unknown"):
+        record = self._by_id.get(item_id)
+        return record.name if record else default
+
+    def equipped_record(self, item_id, expected_type):
+        """The record for an equipped item id if it exists and has the type its slot expects, else None."""
+        record = self._by_id.get(item_id) if item_id else None
+        return record if record and record.type == expected_type else None
+
+    def in_category(self, item_id, category):
+        """True if item_id is browsed under `category` ("All Items" matches everything)."""
+        if category == "All Items":
+            return True
+        record = self._by_id.get(item_id)
+        return record is not None and record.category == category
+
+    # --- Mapping API (drop-in for items.ITEM_DB, values are ItemRecords) ---
+    def get(self, item_id, default=None):
+        return self._by_id.get(item_id, default)
+
+    def __getitem__(self, item_id):
+        return self._by_id[item_id]
+
+    def __contains__(self, item_id):
+        return item_id in self._by_id
+
+    def __iter__(self):
+        return iter(self._by_id)
+
+    def __len__(self):
+        return len(self.records)
+
+    def keys(self):
+        return self._by_id.keys()
+
+    def values(self):
+        return self._by_id.values()
+
+    def items(self):
+        return self._by_id.items()
+
+REGISTRY = ItemRegistry(items.ITEM_DB)
@@ -0,0 +1,154 @@
+import random
+
+import config
+import entities
+import locations
+
+# --- Precompiled Encounter and Loot Samplers ---
+# The weighted tables in locations.ENCOUNTER_GROUPS, locations.POI_LOOT_TABLES and entities.SHARED_LOOT_GROUPS
+# (plus each enemy's own loot) are compiled once at import:
+#   - weighted choices become AliasSamplers (Vose's alias method): one random draw and two list lookups per sample;
+#   - independent-chance loot tables become LootTables: parallel lists rolled without per-entry dict lookups, and
+#     rolled as one (rolls x entries) matrix with NumPy for simulations.
+# All game rolls go through one module RNG so a run can be reproduced with config.RANDOM_SEED or seed_rng().
+
+_rng = random.Random(config.RANDOM_SEED)
+_numpy = None
+
+def get_rng():
+    return _rng
+
+def seed_rng(seed):
+    _rng.seed(seed)
+
+def _load_numpy():
+    """NumPy is optional and only needed for the batch APIs; imported on first use to keep startup fast."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+class AliasSampler:
+    """O(1) weighted choice among `outcomes` (Vose's alias method). All-zero weights sample uniformly."""
+    __slots__ = ("outcomes", "_probability", "_alias", "_count", "_np_tables")
+
+    def __init__(self, outcomes, weights):
+        if not outcomes:
+            raise ValueError("AliasSampler needs at least one outcome")
+        count = len(outcomes)
+        total = float(sum(weights))
+        if total <= 0:
+            weights, total = [1] * count, float(count)
+        scaled = [weight * count / total for weight in weights]
+        probability = [1.0] * count
+        alias = list(range(count))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            probability[less] = scaled[less]
+            alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left is 1.0 up to rounding error
+        self.outcomes = list(outcomes)
+        self._probability = probability
+        self._alias = alias
+        self._count = count
+        self._np_tables = None
+
+    def sample(self, rng=None):
+        # One draw picks the column (integer part) and the coin within it (fractional part)
+        u = (rng or _rng).random() * self._count
+        column = int(u)
+        return self.outcomes[column] if u - column < self._probability[column] else self.outcomes[self._alias[column]]
+
+    def sample_indices(self, count, np_rng):
+        """`count` sampled outcome indices as a NumPy array, drawn from a numpy.random.Generator."""
+        numpy = _load_numpy()
+        if numpy is None:
+            raise RuntimeError("NumPy is required for AliasSampler.sample_indices")
+        if self._np_tables is None:
+            self._np_tables = (numpy.array(self._probability), numpy.array(self._alias, dtype=numpy.intp))
+        probability, alias = self._np_tables
+        u = np_rng.random(count) * self._count
+        columns = u.astype(numpy.intp)
+        return numpy.where(u - columns < probability[columns], columns, alias[columns])
+
+class LootTable:
+    """Independent per-entry drop chances ({"item_id", "chance", "min_qty", "max_qty"} entries)."""
+    __slots__ = ("item_ids", "chances", "min_qty", "max_qty", "_rows")
+
+    def __init__(self, entries):
+        entries = [entry for entry in entries if entry.get("item_id")]
+        self.item_ids = [entry["item_id"] for entry in entries]
+        self.chances = [entry.get("chance", 0) for entry in entries]
+        self.min_qty = [entry.get("min_qty", 1) for entry in entries]
+        self.max_qty = [entry.get("max_qty", 1) for entry in entries]
+        self._rows = list(zip(self.item_ids, self.chances, self.min_qty, self.max_qty))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def roll(self, rng=None):
+        """Returns the dropped item ids (repeated per quantity), in table order."""
+        rng = rng or _rng
+        draw = rng.random
+        dropped = []
+        for item_id, chance, min_qty, max_qty in self._rows:
+            if draw() <= chance:
+                dropped.extend([item_id] * (min_qty if min_qty == max_qty else rng.randint(min_qty, max_qty)))
+        return dropped
+
+    def roll_batch(self, count, np_rng):
+        """Rolls the table `count` times at once. Returns a (count, len(self)) NumPy array of quantities dropped."""
+        numpy = _load_numpy()
+        if numpy is None:
+            raise RuntimeError("NumPy is required for LootTable.roll_batch")
+        hits = np_rng.random((count, len(self._rows))) <= numpy.array(self.chances)
+        quantities = np_rng.integers(numpy.array(self.min_qty), numpy.array(self.max_qty) + 1, size=(count, len(self._rows)))
+        return hits * quantities
+
+def compile_enemy_loot(enemy_data):
+    """One LootTable for everything an enemy can drop: its loot_groups, unique_loot and loot_table, in that order."""
+    entries = []
+    for group_name in enemy_data.get('loot_groups', []):
+        entries.extend(entities.SHARED_LOOT_GROUPS.get(group_name, []))
+    entries.extend(enemy_data.get('unique_loot', []))
+    for entry in enemy_data.get('loot_table', []):
+        # Old list-of-strings format always drops; see the DEBUG note in combat.combat
+        entries.append({"item_id": entry, "chance": 1.0} if isinstance(entry, str) else entry)
+    return LootTable(entries)
+
+# --- Compiled tables ---
+ENCOUNTER_SAMPLERS = {
+    group_name: AliasSampler([entry.get("enemy_id") for entry in entries], [entry.get("weight", 0) for entry in entries])
+    for group_name, entries in locations.ENCOUNTER_GROUPS.items() if entries
+}
+POI_LOOT = {table_id: LootTable(entries) for table_id, entries in locations.POI_LOOT_TABLES.items()}
+SHARED_LOOT = {group_name: LootTable(entries) for group_name, entries in entities.SHARED_LOOT_GROUPS.items()}
+ENEMY_LOOT = {enemy_id: compile_enemy_loot(enemy_data) for enemy_id, enemy_data in entities.ENEMY_TEMPLATES.items()}
+
+# --- Game-facing helpers ---
+def sample_encounter(group_name, rng=None):
+    """Weighted random enemy id from an encounter group, or None if the group is unknown or empty."""
+    sampler = ENCOUNTER_SAMPLERS.get(group_name)
+    return sampler.sample(rng) if sampler else None
+
+def roll_poi_loot(table_ids, rng=None):
+    found_items = []
+    for table_id in table_ids or []:
+        table = POI_LOOT.get(table_id)
+        if table:
+            found_items.extend(table.roll(rng))
+    return found_items
+
+def roll_enemy_loot(enemy_instance, rng=None):
+    table = ENEMY_LOOT.get(enemy_instance.get('id'))
+    if table is None: # Not built from a template; compile it for this roll
+        table = compile_enemy_loot(enemy_instance)
+    return table.roll(rng)
@@ -0,0 +1,28 @@
+# --- Save Schema Versions ---
+# Saves are compact JSON (see saveload.serialize_save) tagged with the schema version they were written in
+# ("save_schema_version"; saves without it predate versioning and are schema 1). Loading upgrades older saves
+# one version at a time through SCHEMA_MIGRATIONS, so changing the shape of the player data only needs a new
+# migration here, never a second loader.
+
+SCHEMA_VERSION = 2 # 2: inventory is an {item_id: count} dict instead of a list with one entry per unit
+
+# Migrations from one schema version to the next: {from_version: fn(player_data) -> player_data}
+SCHEMA_MIGRATIONS = {}
+
+def migrate(player_data, from_version):
+    """Upgrades player_data saved under schema from_version to SCHEMA_VERSION."""
+    for version in range(from_version, SCHEMA_VERSION):
+        migration = SCHEMA_MIGRATIONS.get(version)
+        if migration:
+            player_data = migration(player_data)
+    return player_data
+
+# --- Migrations ---
+def _inventory_list_to_counts(player_data):
+    counts = {}
+    for item_id in player_data.get('inventory') or []:
+        counts[item_id] = counts.get(item_id, 0) + 1
+    player_data['inventory'] = counts
+    return player_data
+
+SCHEMA_MIGRATIONS[1] = _inventory_list_to_counts
@@ -0,0 +1,127 @@
+import os
+import json
+import hashlib
+
+# --- Incremental Save Journal ---
+# A save is a full snapshot (<name>.json) plus an append-only journal (<name>.journal) of the
+# changes made since that snapshot. Each journal line is one save's worth of JSON-patch-style ops:
+#     {"op": "replace", "path": ["health"], "value": 12}
+#     {"op": "replace", "path": ["inventory", "rusty_sword"], "value": 2}
+# The first line is a header holding a digest of the snapshot the journal applies to, so a journal left
+# behind by a crash during compaction is never replayed onto a different snapshot.
+
+JOURNAL_EXTENSION = ".journal"
+JOURNAL_FORMAT_VERSION = 1
+
+def snapshot_digest(snapshot_bytes):
+    return hashlib.sha256(snapshot_bytes).hexdigest()[:32]
+
+# --- Diffing ---
+def diff_state(old, new, path=()):
+    """Returns the list of ops that turns `old` into `new` (both JSON-compatible values)."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": list(path) + [key]})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "replace", "path": list(path) + [key], "value": value})
+            elif old[key] != value:
+                ops.extend(diff_state(old[key], value, path + (key,)))
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        return _diff_list(old, new, path)
+    if old == new:
+        return []
+    return [{"op": "replace", "path": list(path), "value": new}]
+
+def _diff_list(old, new, path):
+    if len(new) >= len(old) and new[:len(old)] == old:
+        return [{"op": "extend", "path": list(path), "value": new[len(old):]}] if len(new) > len(old) else []
+    if len(new) < len(old) and old[:len(new)] == new:
+        return [{"op": "truncate", "path": list(path), "length": len(new)}]
+    if len(new) == len(old) - 1: # One element removed from the middle
+        index = next((i for i in range(len(new)) if old[i] != new[i]), len(new))
+        if old[index + 1:] == new[index:]:
+            return [{"op": "delete", "path": list(path) + [index]}]
+    if len(new) == len(old):
+        changed = [i for i, (a, b) in enumerate(zip(old, new)) if a != b]
+        if len(changed) <= len(new) // 2:
+            ops = []
+            for i in changed:
+                ops.extend(diff_state(old[i], new[i], path + (i,)))
+            return ops
+    return [{"op": "replace", "path": list(path), "value": new}]
+
+# --- Replaying ---
+def _resolve(state, path):
+    for key in path:
+        state = state[key]
+    return state
+
+def apply_delta(state, ops):
+    """Applies ops (from diff_state) to `state` in place and returns the (possibly replaced) root."""
+    for op in ops:
+        kind = op["op"]
+        path = op["path"]
+        if kind == "extend":
+            _resolve(state, path).extend(op["value"])
+        elif kind == "truncate":
+            del _resolve(state, path)[op["length"]:]
+        elif not path: # Only "replace" can target the root
+            state = op["value"]
+        elif kind == "replace":
+            _resolve(state, path[:-1])[path[-1]] = op["value"]
+        elif kind == "remove":
+            _resolve(state, path[:-1]).pop(path[-1], None)
+        elif kind == "delete":
+            del _resolve(state, path[:-1])[path[-1]]
+        else:
+            raise ValueError(f"Unknown journal op '{kind}'")
+    return state
+
+# --- Journal file ---
+def append_delta(journal_path, base_digest, ops):
+    """Appends one delta record, writing the header first if the journal is new. Returns bytes written."""
+    lines = []
+    if not os.path.exists(journal_path):
+        lines.append(json.dumps({"journal": JOURNAL_FORMAT_VERSION, "base": base_digest}))
+    lines.append(json.dumps(ops, separators=(",", ":")))
+    data = ("\n".join(lines) + "\n").encode("utf-8")
+    with open(journal_path, 'ab') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(data)
+
+def read_journal(journal_path, base_digest):
+    """Returns (delta records that apply to the snapshot with base_digest, torn).
+
+    A torn final line (crash mid-append) is dropped and reported via `torn`; the caller should write a
+    fresh snapshot before appending again, since new lines after the torn one could not be replayed.
+    A journal for a different snapshot yields no deltas.
+    """
+    if not os.path.exists(journal_path):
+        return [], False
+    with open(journal_path, 'rb') as f:
+        lines = f.read().decode("utf-8", errors="replace").splitlines()
+    try:
+        header = json.loads(lines[0]) if lines else None
+    except json.JSONDecodeError:
+        return [], True
+    if not isinstance(header, dict) or header.get("base") != base_digest:
+        return [], False # Journal belongs to an older snapshot
+    deltas = []
+    for line in lines[1:]:
+        try:
+            deltas.append(json.loads(line))
+        except json.JSONDecodeError:
+            return deltas, True
+    return deltas, False
+
+def remove_journal(journal_path):
+    try:
+        os.remove(journal_path)
+    except FileNotFoundError:
+        pass
@@ -1,7 +1,26 @@
 import os
+import copy
 import json
+import threading
+import config
+import save_format
+import save_journal
+import inventory
 
 SAVEGAME_DIR = "savegames"
+SAVE_EXTENSION = ".json"
+JSON_SCHEMA_KEY = "save_schema_version" # JSON saves written without it predate versioning (schema 1)
+# Metadata index for the load menu. It lives in a subdirectory so rewriting it does not change SAVEGAME_DIR's mtime,
+# which the index records to tell whether any save was added or removed since it was last brought up to date. Each
+# entry also records its files' signature, checked on every listing, for saves rewritten or journaled in place.
+INDEX_DIR = os.path.join(SAVEGAME_DIR, ".index")
+INDEX_FILENAME = "index.json"
+INDEX_VERSION = 1
+
+# save name -> {"state": copy of the player data as last saved/loaded, "digest": snapshot digest, "deltas": journal length}
+# Incremental saves diff against "state"; without an entry (e.g. a name not saved or loaded this session) a full snapshot is written.
+_saved_states = {}
+_save_lock = threading.RLock() # Manual saves on the game thread and autosave.AutosaveWorker share _saved_states and the files
 
 # --- Save/Load Utility Functions ---
 def ensure_save_directory():
@@ -15,62 +34,282 @@ def ensure_save_directory():
             return False
     return True
 
-def save_game_state(player_data, filename):
-    """Saves the player_data to a JSON file."""
+def _strip_save_extension(filename):
+    return filename[:-len(SAVE_EXTENSION)] if filename.endswith(SAVE_EXTENSION) else filename
+
+def serialize_save(player_data):
+    """Returns the bytes of a save file for player_data: compact JSON tagged with the current schema version."""
+    data = dict(player_data)
+    data[JSON_SCHEMA_KEY] = save_format.SCHEMA_VERSION
+    return json.dumps(data, separators=(",", ":")).encode("utf-8") # Compact: no indentation or padding to write and parse
+
+def _deserialize_unmigrated(data):
+    """Decodes save file bytes as written. Returns (player_data, schema_version)."""
+    player_data = json.loads(data.decode("utf-8"))
+    if not isinstance(player_data, dict):
+        raise ValueError("Save file does not contain a player record")
+    return player_data, player_data.pop(JSON_SCHEMA_KEY, 1)
+
+def deserialize_save(data):
+    """Decodes save file bytes and migrates them to the current schema. Raises ValueError if invalid."""
+    return save_format.migrate(*_deserialize_unmigrated(data))
+
+def to_save_data(player_data):
+    """The player dict as stored in saves: plain JSON-compatible values (the Inventory becomes a count dict,
+    and the derived-stats cache is left out)."""
+    if isinstance(player_data.get('inventory'), inventory.Inventory) or 'derived_stats' in player_data:
+        player_data = dict(player_data)
+        player_data.pop('derived_stats', None)
+        if isinstance(player_data.get('inventory'), inventory.Inventory):
+            player_data['inventory'] = player_data['inventory'].to_save_data()
+    return player_data
+
+def from_save_data(player_data):
+    """The inverse of to_save_data, applied to a freshly loaded (and migrated) save. Returns a new dict."""
+    player_data = dict(player_data)
+    player_data['inventory'] = inventory.Inventory.from_save_data(player_data.get('inventory'))
+    return player_data
+
+def _journal_path(save_name):
+    return os.path.join(SAVEGAME_DIR, f"{save_name}{save_journal.JOURNAL_EXTENSION}")
+
+def _remember_saved_state(save_name, player_data, snapshot_digest, delta_count):
+    _saved_states[save_name] = {"state": copy.deepcopy(player_data), "digest": snapshot_digest, "deltas": delta_count}
+
+def atomic_write(filepath, data):
+    """Writes data to filepath via a temp file, fsync and rename, so a crash leaves either the old or the new file."""
+    temp_path = f"{filepath}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, filepath)
+    except BaseException:
+        try: os.remove(temp_path)
+        except OSError: pass
+        raise
+    try: # Persist the rename itself; not supported on every platform
+        directory_fd = os.open(os.path.dirname(filepath) or ".", os.O_RDONLY)
+        try: os.fsync(directory_fd)
+        finally: os.close(directory_fd)
+    except OSError:
+        pass
+
+def _write_snapshot(save_name, player_data):
+    """Writes a full snapshot and clears the journal. Returns the snapshot's filename."""
+    filepath = os.path.join(SAVEGAME_DIR, f"{save_name}{SAVE_EXTENSION}")
+    data = serialize_save(player_data)
+    atomic_write(filepath, data)
+    save_journal.remove_journal(_journal_path(save_name))
+    _remember_saved_state(save_name, player_data, save_journal.snapshot_digest(data), 0)
+    return os.path.basename(filepath)
+
+def _append_to_journal(save_name, player_data):
+    """Appends the changes since the last save to the journal. Returns False if a full snapshot is needed instead."""
+    saved = _saved_states.get(save_name)
+    if saved is None or saved["deltas"] >= config.SAVE_JOURNAL_COMPACT_AFTER or not _find_save_file(save_name):
+        return False
+    ops = save_journal.diff_state(saved["state"], player_data)
+    if ops:
+        written = save_journal.append_delta(_journal_path(save_name), saved["digest"], ops)
+        if config.DEBUG_MODE: print(f"DEBUG: Appended {len(ops)} change(s) ({written} bytes) to the journal of '{save_name}'.")
+        _remember_saved_state(save_name, player_data, saved["digest"], saved["deltas"] + 1)
+    return True
+
+def save_game_state(player_data, filename, incremental=None, announce=True, output=print):
+    """Saves the player_data. Safe to call from the autosave thread.
+
+    With incremental saves (default: config.SAVE_JOURNAL_ENABLED) only the changes since this save was last
+    written or loaded are appended to its journal; every SAVE_JOURNAL_COMPACT_AFTER deltas the full snapshot is rewritten.
+    announce=False suppresses the success message (errors are always reported). output(text) receives the messages.
+    """
     if not ensure_save_directory():
         return False
     if not filename.strip():
-        print("Save filename cannot be empty.")
+        output("Save filename cannot be empty.")
         return False
-    
+
     # Sanitize filename a bit (basic example, can be more robust)
-    safe_filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    safe_filename = "".join(c for c in _strip_save_extension(filename) if c.isalnum() or c in (' ', '-', '_')).rstrip()
     if not safe_filename:
-        print("Invalid characters in filename, or filename became empty after sanitization.")
+        output("Invalid characters in filename, or filename became empty after sanitization.")
         return False
 
-    filepath = os.path.join(SAVEGAME_DIR, f"{safe_filename}.json")
+    if incremental is None:
+        incremental = config.SAVE_JOURNAL_ENABLED
+    player_data = to_save_data(player_data)
     try:
-        with open(filepath, 'w') as f:
-            json.dump(player_data, f, indent=4)
-        print(f"Game saved as '{safe_filename}.json' in '{SAVEGAME_DIR}' directory.")
+        with _save_lock:
+            directory_mtime_before = _directory_mtime_ns()
+            if incremental and _append_to_journal(safe_filename, player_data):
+                saved_filename = safe_filename
+            else:
+                saved_filename = _write_snapshot(safe_filename, player_data)
+            _update_index_entry(safe_filename, player_data, directory_mtime_before)
+        if announce: output(f"Game saved as '{saved_filename}' in '{SAVEGAME_DIR}' directory.")
         return True
-    except IOError as e:
-        print(f"Error saving game to {filepath}: {e}")
+    except (IOError, OSError) as e:
+        output(f"Error saving game '{safe_filename}': {e}")
     except TypeError as e:
-        print(f"Error serializing game data (TypeError): {e}")
+        output(f"Error serializing game data (TypeError): {e}")
     return False
 
-def load_game_state(filename):
-    """Loads player_data from a JSON file."""
-    # Ensure filename does not already contain .json for consistency with list_save_files
-    if filename.endswith(".json"):
-        actual_filename = filename
-    else:
-        actual_filename = f"{filename}.json"
-        
-    filepath = os.path.join(SAVEGAME_DIR, actual_filename)
-    if not os.path.exists(filepath):
-        print(f"Save file not found: {filepath}")
+def _find_save_file(save_name):
+    """Returns the path of the save called save_name, or None if there is no such save."""
+    filepath = os.path.join(SAVEGAME_DIR, f"{save_name}{SAVE_EXTENSION}")
+    return filepath if os.path.exists(filepath) else None
+
+def _read_save(save_name, filepath):
+    """Reads a snapshot and replays its journal, then migrates the result.
+
+    Returns (player_data, snapshot bytes, snapshot digest, delta count, torn, schema version of the snapshot).
+    The journal is replayed before migrating because its deltas were diffed in the snapshot's schema.
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    player_data, schema_version = _deserialize_unmigrated(data)
+    digest = save_journal.snapshot_digest(data)
+    deltas, torn = save_journal.read_journal(_journal_path(save_name), digest)
+    for ops in deltas:
+        player_data = save_journal.apply_delta(player_data, ops)
+    player_data = save_format.migrate(player_data, schema_version)
+    return player_data, data, digest, len(deltas), torn, schema_version
+
+def load_game_state(filename, output=print):
+    """Loads player_data from a save file, replaying its journal of incremental saves.
+
+    output(text) receives the messages (print for the terminal).
+    """
+    save_name = _strip_save_extension(filename)
+    filepath = _find_save_file(save_name)
+    if not filepath:
+        output(f"Save file not found: {os.path.join(SAVEGAME_DIR, save_name)}")
         return None
     try:
-        with open(filepath, 'r') as f:
-            player_data = json.load(f)
-        print(f"Game loaded from '{actual_filename}'.") # Use actual_filename for user message
-        return player_data
+        with _save_lock:
+            player_data, data, digest, delta_count, torn, schema_version = _read_save(save_name, filepath)
+            if torn:
+                output(f"Warning: The last incremental save of '{save_name}' was incomplete and has been skipped.")
+            if config.DEBUG_MODE and delta_count: print(f"DEBUG: Replayed {delta_count} journaled save(s) onto {filepath}.")
+
+            # A torn journal cannot be appended to, and deltas in the current schema cannot follow a snapshot in an
+            # older one, so in both cases force the next save to write a fresh snapshot
+            needs_snapshot = torn or schema_version < save_format.SCHEMA_VERSION
+            _remember_saved_state(save_name, player_data, digest, config.SAVE_JOURNAL_COMPACT_AFTER if needs_snapshot else delta_count)
+        output(f"Game loaded from '{os.path.basename(filepath)}'.")
+        return from_save_data(player_data)
     except IOError as e:
-        print(f"Error loading game from {filepath}: {e}")
-    except json.JSONDecodeError as e:
-        print(f"Error decoding save file (corrupted?) {filepath}: {e}")
+        output(f"Error loading game from {filepath}: {e}")
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e: # ValueError includes json.JSONDecodeError
+        output(f"Error decoding save file (corrupted?) {filepath}: {e}")
     return None
 
-def list_save_files():
-    """Returns a list of available save game filenames (without .json extension)."""
-    if not ensure_save_directory(): # Ensure directory exists before listing
+# --- Save Slot Index ---
+def _directory_mtime_ns():
+    try:
+        return os.stat(SAVEGAME_DIR).st_mtime_ns
+    except OSError:
+        return None
+
+def _file_signature(save_name):
+    """[snapshot filename, mtime, size, journal mtime, journal size] of a save, or None if it has no snapshot."""
+    filepath = _find_save_file(save_name)
+    if not filepath:
+        return None
+    snapshot_stat = os.stat(filepath)
+    try:
+        journal_stat = os.stat(_journal_path(save_name))
+        journal_signature = [journal_stat.st_mtime_ns, journal_stat.st_size]
+    except FileNotFoundError:
+        journal_signature = [None, None]
+    return [os.path.basename(filepath), snapshot_stat.st_mtime_ns, snapshot_stat.st_size] + journal_signature
+
+def _slot_metadata(save_name, player_data):
+    return {
+        "save_name": save_name,
+        "name": player_data.get('name', "Unknown"),
+        "level": player_data.get('level', 1),
+        "location": player_data.get('location'),
+        "playtime_seconds": player_data.get('playtime_seconds', 0),
+    }
+
+def _read_index():
+    try:
+        with open(os.path.join(INDEX_DIR, INDEX_FILENAME), 'r') as f:
+            index = json.load(f)
+        if isinstance(index, dict) and index.get("version") == INDEX_VERSION:
+            return index
+    except (IOError, OSError, ValueError):
+        pass
+    return {"version": INDEX_VERSION, "directory_mtime_ns": None, "saves": {}}
+
+def _write_index(index):
+    try:
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        atomic_write(os.path.join(INDEX_DIR, INDEX_FILENAME), json.dumps(index, separators=(",", ":")).encode("utf-8"))
+    except OSError as e:
+        if config.DEBUG_MODE: print(f"DEBUG: Could not write save index: {e}")
+
+def _update_index_entry(save_name, player_data, directory_mtime_before):
+    """Records a save that was just written. The index stays marked up to date only if it was before the write."""
+    index = _read_index()
+    signature = _file_signature(save_name)
+    if signature is None:
+        return
+    index["saves"][save_name] = dict(_slot_metadata(save_name, player_data), signature=signature)
+    if index["directory_mtime_ns"] == directory_mtime_before:
+        index["directory_mtime_ns"] = _directory_mtime_ns()
+    _write_index(index)
+
+def _refresh_index(index):
+    """Brings the index in line with the directory, re-reading only saves whose files changed."""
+    save_names = {_strip_save_extension(f) for f in os.listdir(SAVEGAME_DIR) if f.endswith(SAVE_EXTENSION)}
+    entries = index["saves"]
+    for save_name in list(entries):
+        if save_name not in save_names:
+            del entries[save_name]
+    for save_name in save_names:
+        signature = _file_signature(save_name)
+        entry = entries.get(save_name)
+        if entry and entry.get("signature") == signature:
+            continue
+        try:
+            player_data = _read_save(save_name, _find_save_file(save_name))[0]
+            entries[save_name] = dict(_slot_metadata(save_name, player_data), signature=signature)
+        except (IOError, OSError, ValueError, KeyError, IndexError, TypeError, AttributeError):
+            entries[save_name] = dict(_slot_metadata(save_name, {}), signature=signature, unreadable=True)
+
+def _index_signatures_current(index):
+    """True if every indexed save's files still match the signature recorded for them."""
+    for save_name, entry in index["saves"].items():
+        if _file_signature(save_name) != entry.get("signature"):
+            return False
+    return True
+
+def list_save_slots():
+    """Returns [{save_name, name, level, location, playtime_seconds}, ...] sorted by save name.
+
+    Served from the index without opening any save file, unless saves were added, removed or changed
+    since the index was last updated; then only the changed saves are re-read. The directory mtime catches
+    added and removed saves; a journal append or an in-place rewrite leaves it alone, so each indexed save's
+    file signature (a couple of os.stat calls) is checked too.
+    """
+    if not ensure_save_directory():
         return []
     try:
-        files = [f[:-5] for f in os.listdir(SAVEGAME_DIR) if f.endswith(".json")]
-        return sorted(files)
+        with _save_lock:
+            index = _read_index()
+            directory_mtime = _directory_mtime_ns()
+            if index["directory_mtime_ns"] != directory_mtime or not _index_signatures_current(index):
+                _refresh_index(index)
+                index["directory_mtime_ns"] = directory_mtime
+                _write_index(index)
+        return [index["saves"][save_name] for save_name in sorted(index["saves"])]
     except OSError as e:
         print(f"Error listing save files: {e}")
-        return [] 
\ No newline at end of file
+        return []
+
+def list_save_files():
+    """Returns a list of available save game names (without extension)."""
+    return [slot["save_name"] for slot in list_save_slots()]
@@ -0,0 +1,58 @@
+import os
+import time
+
+import ai_cache
+import ai_response
+
+def make_result(text):
+    return ai_response.AIResult(text=text, provider="TEST", model="test-model")
+
+def test_put_then_get_hits_memory():
+    cache = ai_cache.ResponseCache()
+    cache.put("k", make_result("hello"))
+    assert cache.get("k").text == "hello"
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["disk_hits"]) == (1, 1, 0)
+
+def test_entries_expire_after_ttl(tmp_path):
+    cache = ai_cache.ResponseCache(cache_dir=str(tmp_path), ttl_seconds=0.05)
+    cache.put("k", make_result("hello"))
+    assert cache.get("k") is not None
+    time.sleep(0.1)
+    assert cache.get("k") is None
+    assert os.listdir(tmp_path) == [] # The expired disk entry is removed too
+
+def test_no_ttl_never_expires():
+    cache = ai_cache.ResponseCache(ttl_seconds=None)
+    cache.put("k", make_result("hello"))
+    time.sleep(0.01)
+    assert cache.get("k") is not None
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ai_cache.ResponseCache(max_memory_entries=2)
+    cache.put("a", make_result("a"))
+    cache.put("b", make_result("b"))
+    cache.get("a") # "b" is now the least recently used
+    cache.put("c", make_result("c"))
+    assert cache.get("b") is None
+    assert cache.get("a").text == "a"
+    assert cache.get("c").text == "c"
+    assert cache.stats()["evictions"] == 1
+
+def test_evicted_memory_entries_are_served_from_disk(tmp_path):
+    cache = ai_cache.ResponseCache(cache_dir=str(tmp_path), max_memory_entries=1)
+    cache.put("a", make_result("a"))
+    cache.put("b", make_result("b"))
+    assert cache.get("a").text == "a"
+    assert cache.stats()["disk_hits"] == 1
+
+def test_disk_tier_is_capped(tmp_path):
+    cache = ai_cache.ResponseCache(cache_dir=str(tmp_path), max_memory_entries=1, max_disk_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, make_result(key))
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(ai_cache.CACHE_FILE_SUFFIX)]) == 2
+
+def test_disk_entries_survive_a_new_cache(tmp_path):
+    ai_cache.ResponseCache(cache_dir=str(tmp_path)).put("k", make_result("hello"))
+    assert ai_cache.ResponseCache(cache_dir=str(tmp_path)).get("k").text == "hello"
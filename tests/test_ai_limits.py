@@ -0,0 +1,80 @@
+import time
+
+import ai_limits
+
+CircuitBreaker = ai_limits.CircuitBreaker
+RESET_TIMEOUT = 0.05
+
+def wait_for_reset():
+    time.sleep(RESET_TIMEOUT * 1.5)
+
+def open_breaker(reset_timeout):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    return breaker
+
+def test_opens_after_threshold_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_success() # Resets the streak
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.get_state()["times_opened"] == 1
+
+def test_open_rejects_until_reset_timeout():
+    breaker = open_breaker(reset_timeout=60)
+    assert not breaker.allow_request()
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_half_open_allows_one_trial():
+    breaker = open_breaker(RESET_TIMEOUT)
+    wait_for_reset()
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request() # The trial is still in flight
+
+def test_unreported_trial_expires():
+    breaker = open_breaker(RESET_TIMEOUT)
+    wait_for_reset()
+    assert breaker.allow_request()
+    wait_for_reset() # The trial never reports back
+    assert breaker.allow_request()
+
+def test_successful_trial_closes():
+    breaker = open_breaker(RESET_TIMEOUT)
+    wait_for_reset()
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request() and breaker.allow_request()
+
+def test_failed_trial_reopens():
+    breaker = open_breaker(RESET_TIMEOUT)
+    wait_for_reset()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.get_state()["times_opened"] == 2
+
+def test_release_frees_the_trial_without_changing_state():
+    breaker = open_breaker(RESET_TIMEOUT)
+    wait_for_reset()
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.get_state()["consecutive_failures"] == 2
+    assert breaker.allow_request() # Another trial may go
+
+def test_release_while_closed_does_not_count():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    for _ in range(5):
+        assert breaker.allow_request()
+        breaker.release()
+    assert breaker.get_state() == {"state": CircuitBreaker.CLOSED, "consecutive_failures": 0, "times_opened": 0}
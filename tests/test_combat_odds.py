@@ -0,0 +1,57 @@
+import random
+from fractions import Fraction
+
+import pytest
+
+import combat_engine
+import combat_odds
+
+FIGHTS = 6000
+
+def make_player(health, damage_bonus, defense):
+    return {"health": health, "max_health": health, "weapon_name": None, "damage_bonus": damage_bonus,
+            "armor_name": None, "shield_name": None, "total_defense": defense}
+
+def make_enemy(health, attack_min, attack_max):
+    return {"name": "Training Dummy", "health": health, "attack_min": attack_min, "attack_max": attack_max, "xp_value": 0}
+
+@pytest.mark.parametrize("player_health, damage_bonus, defense, enemy_health, attack_min, attack_max", [
+    (20, 0, 0, 12, 1, 4), # Comfortable
+    (10, 1, 1, 18, 2, 6), # Close to even
+    (8, 0, 0, 30, 3, 5), # Hopeless
+])
+def test_solve_matches_simulated_fights(player_health, damage_bonus, defense, enemy_health, attack_min, attack_max):
+    odds = combat_odds.solve(player_health, damage_bonus, defense, enemy_health, attack_min, attack_max)
+    rng = random.Random(1234)
+    player = make_player(player_health, damage_bonus, defense)
+    enemy = make_enemy(enemy_health, attack_min, attack_max)
+    wins, remaining = 0, 0
+    for _ in range(FIGHTS):
+        result = combat_engine.run_combat(player, dict(enemy), rng=rng)
+        if result.outcome == "won":
+            wins += 1
+            remaining += result.player_health
+    assert wins / FIGHTS == pytest.approx(odds.win_probability, abs=0.025)
+    expected_remaining = sum(hp * p for hp, p in odds.remaining_hp.items())
+    assert remaining / FIGHTS == pytest.approx(expected_remaining, abs=0.04 * player_health)
+
+def test_exact_probabilities_sum_to_one():
+    odds = combat_odds.solve(10, 1, 1, 18, 2, 6, exact=True)
+    assert isinstance(odds.win_probability, Fraction)
+    assert odds.win_probability + odds.loss_probability == 1
+    assert sum(odds.remaining_hp.values()) == odds.win_probability
+
+def test_one_hit_kill_is_certain():
+    odds = combat_odds.solve(5, 6, 0, 7, 1, 1, exact=True)
+    assert odds.win_probability == 1
+    assert odds.remaining_hp == {5: 1}
+    assert odds.expected_turns_to_kill == 1
+    assert odds.rating == "Trivial"
+
+def test_full_defense_never_loses():
+    odds = combat_odds.solve(1, 0, 10, 40, 1, 5)
+    assert odds.loss_probability == 0
+
+def test_player_who_cannot_hurt_is_rejected():
+    with pytest.raises(ValueError):
+        combat_odds.solve(10, -1, 0, 10, 1, 2)
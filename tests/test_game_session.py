@@ -0,0 +1,100 @@
+import random
+from concurrent.futures import Future
+
+import pytest
+
+import ai_prefetch
+import ai_response
+import config
+import game_client
+import game_session
+import locations
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setattr(config, "AI_PROVIDER", "OFFLINE")
+    monkeypatch.setattr(config, "DEBUG_MODE", False)
+
+def texts(events):
+    return [event["text"] for event in events if event["type"] == "text"]
+
+def start_exploring(seed=0, **session_options):
+    session = game_session.GameSession(rng=random.Random(seed), allow_saves=False, **session_options)
+    events = session.start()
+    assert session.pending_prompt["options"] == ["Start New Game"]
+    events += session.step("1")
+    events += session.step("y") # Quick start
+    assert session.state == game_session.EXPLORING
+    return session, events
+
+def test_quick_start_describes_the_starting_location():
+    session, events = start_exploring()
+    assert session.player["location"] == "beach_starting"
+    assert session.player["last_described_location"] == "beach_starting"
+    assert any("Current Location" in text for text in texts(events))
+    assert session.pending_prompt["prompt"] == "> "
+
+def test_scripted_move_stats_and_quit():
+    session, _events = start_exploring()
+    events = session.step("2") # Move
+    assert session.state == game_session.MOVING
+    assert session.pending_prompt["options"][-1] == "[Stay Here]"
+    session.step("1") # First exit (north)
+    assert session.player["location"] == locations.LOCATIONS["beach_starting"]["exits"]["north"]
+    assert session.state == game_session.EXPLORING
+
+    session.step("2")
+    session.step(str(len(session.pending_prompt["options"]))) # Stay here
+    assert session.player["location"] == locations.LOCATIONS["beach_starting"]["exits"]["north"]
+
+    events = session.step("4") # Stats
+    assert any(session.player["name"] in text for text in texts(events))
+    events = session.step("5") # Saving is disabled here
+    assert "Saving is disabled in this session." in texts(events)
+
+    session.step("6")
+    assert session.is_over
+    with pytest.raises(ValueError):
+        session.step("1")
+    session.close()
+
+def test_invalid_commands_keep_the_game_going():
+    session, _events = start_exploring()
+    events = session.step("banana")
+    assert "Invalid choice. Please try again." in texts(events)
+    assert session.state == game_session.EXPLORING
+
+@pytest.mark.parametrize("seed", range(5))
+def test_bot_games_run_without_errors(seed):
+    rng = random.Random(seed)
+    events = []
+    session = game_session.GameSession(rng=random.Random(seed), on_event=events.append, allow_saves=False)
+    session.start()
+    for _ in range(300):
+        if session.is_over:
+            break
+        session.step(game_client.choose_bot_command(session.pending_prompt, rng))
+        assert session.is_over or session.pending_prompt is not None
+        if session.player and session.state == game_session.EXPLORING:
+            assert session.player["location"] in locations.LOCATIONS # Exits to missing areas reset to the start
+            assert session.player["health"] > 0
+    session.close()
+    assert any(event["type"] == "prompt" for event in events)
+
+def test_moves_use_prefetched_descriptions():
+    batches = []
+    def submit(prompts):
+        batches.append(prompts)
+        future = Future()
+        future.set_result([ai_response.AIResult(text=f"Prefetched: {prompt}") for prompt in prompts])
+        return future
+    session, _events = start_exploring(prefetcher=ai_prefetch.PrefetchScheduler(submit_fn=submit))
+    exits = locations.LOCATIONS["beach_starting"]["exits"]
+    assert batches == [[ai_prefetch.get_first_visit_prompt(destination) for destination in exits.values()]]
+
+    session.step("2")
+    events = session.step("1")
+    destination = exits["north"]
+    assert f"\nPrefetched: {ai_prefetch.get_first_visit_prompt(destination)}" in texts(events)
+    assert len(batches) == 2 # The new location's neighbours were requested on arrival
+    session.close()
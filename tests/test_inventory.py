@@ -0,0 +1,62 @@
+import pytest
+
+from inventory import Inventory
+
+def test_counts_and_pickup_order():
+    inventory = Inventory()
+    inventory.add_many(["berries_wild", "rusty_dagger", "berries_wild"])
+    assert list(inventory) == ["berries_wild", "rusty_dagger"]
+    assert inventory.count("berries_wild") == 2
+    assert len(inventory) == 3
+    assert inventory.distinct_count == 2
+
+def test_removed_id_comes_back_at_the_end():
+    inventory = Inventory({"berries_wild": 1, "rusty_dagger": 1})
+    inventory.remove("berries_wild")
+    inventory.add("berries_wild")
+    assert list(inventory) == ["rusty_dagger", "berries_wild"]
+
+def test_removing_more_than_held_raises():
+    inventory = Inventory({"berries_wild": 1})
+    with pytest.raises(ValueError):
+        inventory.remove("berries_wild", 2)
+    assert inventory.count("berries_wild") == 1
+
+def test_version_goes_up_on_every_change():
+    inventory = Inventory()
+    versions = [inventory.version]
+    inventory.add("berries_wild")
+    versions.append(inventory.version)
+    inventory.add("berries_wild", 2)
+    versions.append(inventory.version)
+    inventory.remove("berries_wild")
+    versions.append(inventory.version)
+    assert versions == sorted(set(versions))
+    inventory.add("berries_wild", 0) # Not a change
+    assert inventory.version == versions[-1]
+
+def test_category_view_is_memoized_until_a_change():
+    inventory = Inventory({"berries_wild": 2, "rusty_dagger": 1, "healing_potion_lesser": 1})
+    consumables = inventory.ids_in_category("Consumables")
+    assert consumables == ("berries_wild", "healing_potion_lesser")
+    assert inventory.ids_in_category("Consumables") is consumables
+    inventory.add("berries_wild") # Count-only change still invalidates
+    assert inventory.ids_in_category("Consumables") is not consumables
+
+def test_category_view_follows_adds_and_removes():
+    inventory = Inventory({"rusty_dagger": 1, "berries_wild": 1})
+    assert inventory.ids_in_category("Weapons") == ("rusty_dagger",)
+    inventory.add("short_sword_iron")
+    assert inventory.ids_in_category("Weapons") == ("rusty_dagger", "short_sword_iron")
+    inventory.remove("rusty_dagger")
+    assert inventory.ids_in_category("Weapons") == ("short_sword_iron",)
+    assert inventory.ids_in_category("All Items") == ("berries_wild", "short_sword_iron")
+
+def test_ids_of_type():
+    inventory = Inventory({"rusty_dagger": 1, "berries_wild": 1, "wooden_club": 1})
+    assert inventory.ids_of_type("weapon") == ["rusty_dagger", "wooden_club"]
+
+def test_save_data_round_trip():
+    inventory = Inventory({"berries_wild": 3, "rusty_dagger": 1})
+    assert Inventory.from_save_data(inventory.to_save_data()) == inventory
+    assert Inventory.from_save_data(["berries_wild", "berries_wild"]) == Inventory({"berries_wild": 2}) # Legacy list
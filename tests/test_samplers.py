@@ -0,0 +1,41 @@
+import random
+from collections import Counter
+
+import pytest
+
+import samplers
+
+DRAWS = 60000
+
+def observed_shares(sampler, seed=1):
+    rng = random.Random(seed)
+    counts = Counter(sampler.sample(rng) for _ in range(DRAWS))
+    return {outcome: count / DRAWS for outcome, count in counts.items()}
+
+@pytest.mark.parametrize("weights", [[1, 1, 1, 1], [5, 1, 3, 1], [0.7, 0.2, 0.1, 0], [100, 1, 1, 1]])
+def test_sample_matches_weights(weights):
+    outcomes = ["a", "b", "c", "d"]
+    shares = observed_shares(samplers.AliasSampler(outcomes, weights))
+    total = sum(weights)
+    for outcome, weight in zip(outcomes, weights):
+        assert shares.get(outcome, 0.0) == pytest.approx(weight / total, abs=0.01)
+
+def test_zero_weight_is_never_drawn():
+    shares = observed_shares(samplers.AliasSampler(["a", "b"], [1, 0]))
+    assert shares == {"a": 1.0}
+
+def test_all_zero_weights_sample_uniformly():
+    shares = observed_shares(samplers.AliasSampler(["a", "b"], [0, 0]))
+    assert shares["a"] == pytest.approx(0.5, abs=0.01)
+
+def test_single_outcome():
+    assert samplers.AliasSampler(["only"], [3]).sample(random.Random(0)) == "only"
+
+def test_empty_outcomes_are_rejected():
+    with pytest.raises(ValueError):
+        samplers.AliasSampler([], [])
+
+def test_same_seed_gives_same_draws():
+    sampler = samplers.AliasSampler(["a", "b", "c"], [1, 2, 3])
+    first = [sampler.sample(random.Random(7)) for _ in range(5)]
+    assert first == [sampler.sample(random.Random(7)) for _ in range(5)]
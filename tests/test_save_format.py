@@ -0,0 +1,36 @@
+import json
+
+import inventory
+import save_format
+import saveload
+
+LEGACY_PLAYER = {
+    "name": "Bot",
+    "health": 20,
+    "inventory": ["berries_wild", "rusty_dagger", "berries_wild", "berries_wild"],
+}
+
+def test_migrate_turns_inventory_list_into_counts():
+    player = save_format.migrate(json.loads(json.dumps(LEGACY_PLAYER)), 1)
+    assert player["inventory"] == {"berries_wild": 3, "rusty_dagger": 1}
+    assert list(player["inventory"]) == ["berries_wild", "rusty_dagger"] # First pickup order is kept
+    assert player["health"] == 20
+
+def test_migrate_handles_missing_inventory():
+    assert save_format.migrate({"name": "Bot"}, 1)["inventory"] == {}
+
+def test_current_version_is_not_migrated():
+    player = {"inventory": {"berries_wild": 3}}
+    assert save_format.migrate(dict(player), save_format.SCHEMA_VERSION) == player
+
+def test_unversioned_save_file_loads_as_schema_1():
+    data = json.dumps(LEGACY_PLAYER).encode("utf-8")
+    player = saveload.deserialize_save(data)
+    assert player["inventory"] == {"berries_wild": 3, "rusty_dagger": 1}
+    assert saveload.JSON_SCHEMA_KEY not in player
+
+def test_save_round_trip_keeps_the_current_schema():
+    player = {"name": "Bot", "health": 20, "inventory": inventory.Inventory({"berries_wild": 3})}
+    data = saveload.serialize_save(saveload.to_save_data(player))
+    assert json.loads(data)[saveload.JSON_SCHEMA_KEY] == save_format.SCHEMA_VERSION
+    assert saveload.deserialize_save(data)["inventory"] == {"berries_wild": 3}
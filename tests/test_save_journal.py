@@ -0,0 +1,76 @@
+import copy
+
+import pytest
+
+import save_journal
+
+BASE = {
+    "name": "Bot",
+    "health": 20,
+    "location": "village_square",
+    "inventory": {"rusty_dagger": 1, "berries_wild": 3},
+    "quests": ["intro"],
+    "visited": ["beach", "village_square", "forest_edge"],
+    "equipped": {"weapon": "rusty_dagger", "armor": None},
+}
+
+def round_trip(old, new):
+    ops = save_journal.diff_state(old, new)
+    return save_journal.apply_delta(copy.deepcopy(old), ops), ops
+
+@pytest.mark.parametrize("change", [
+    lambda s: s.update(health=12),
+    lambda s: s["inventory"].update(berries_wild=2, healing_potion_lesser=1),
+    lambda s: s["inventory"].pop("rusty_dagger"),
+    lambda s: s["quests"].append("find_the_shell"),
+    lambda s: s["visited"].pop(), # Truncate
+    lambda s: s["visited"].pop(1), # Delete from the middle
+    lambda s: s["visited"].__setitem__(0, "cave"),
+    lambda s: s.pop("equipped"),
+    lambda s: s.update(new_field={"nested": [1, 2]}),
+])
+def test_diff_then_apply_reproduces_new_state(change):
+    new = copy.deepcopy(BASE)
+    change(new)
+    result, ops = round_trip(BASE, new)
+    assert result == new
+    assert ops # Every change produces at least one op
+
+def test_identical_states_diff_to_nothing():
+    assert save_journal.diff_state(BASE, copy.deepcopy(BASE)) == []
+
+def test_small_change_is_a_small_delta():
+    new = copy.deepcopy(BASE)
+    new["inventory"]["berries_wild"] = 2
+    assert save_journal.diff_state(BASE, new) == [{"op": "replace", "path": ["inventory", "berries_wild"], "value": 2}]
+
+def test_root_replacement():
+    result, _ops = round_trip([1, 2, 3], {"a": 1})
+    assert result == {"a": 1}
+
+def test_journal_file_round_trip(tmp_path):
+    journal_path = str(tmp_path / "slot.journal")
+    digest = save_journal.snapshot_digest(b"snapshot")
+    new = copy.deepcopy(BASE)
+    new["health"] = 5
+    save_journal.append_delta(journal_path, digest, save_journal.diff_state(BASE, new))
+    deltas, torn = save_journal.read_journal(journal_path, digest)
+    assert not torn
+    state = copy.deepcopy(BASE)
+    for ops in deltas:
+        state = save_journal.apply_delta(state, ops)
+    assert state == new
+
+def test_journal_for_another_snapshot_is_ignored(tmp_path):
+    journal_path = str(tmp_path / "slot.journal")
+    save_journal.append_delta(journal_path, save_journal.snapshot_digest(b"old"), [{"op": "replace", "path": ["health"], "value": 1}])
+    assert save_journal.read_journal(journal_path, save_journal.snapshot_digest(b"new")) == ([], False)
+
+def test_torn_last_line_is_dropped(tmp_path):
+    journal_path = str(tmp_path / "slot.journal")
+    digest = save_journal.snapshot_digest(b"snapshot")
+    ops = [{"op": "replace", "path": ["health"], "value": 1}]
+    save_journal.append_delta(journal_path, digest, ops)
+    with open(journal_path, "ab") as f:
+        f.write(b'[{"op": "repl')
+    assert save_journal.read_journal(journal_path, digest) == ([ops], True)
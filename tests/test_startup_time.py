@@ -0,0 +1,14 @@
+import pytest
+
+import check_startup_time
+
+@pytest.mark.parametrize("module_name", check_startup_time.DEFAULT_MODULES)
+def test_import_fits_startup_budget(module_name):
+    timings = check_startup_time.measure_import(module_name)
+    total_ms = timings[module_name] / 1000
+    assert total_ms <= check_startup_time.DEFAULT_BUDGET_MS, f"import {module_name} took {total_ms:.1f} ms"
+
+@pytest.mark.parametrize("module_name", check_startup_time.DEFAULT_MODULES)
+def test_provider_sdks_are_not_imported_at_startup(module_name):
+    timings = check_startup_time.measure_import(module_name)
+    assert [name for name in check_startup_time.LAZY_ONLY_MODULES if name in timings] == []
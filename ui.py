@@ -1,5 +1,9 @@
 import curses # Import the curses library
+import functools
 import textwrap
+import item_registry
+import derived_stats
+import character # Item use/equip rules
 
 # Helper function for presenting numbered choices and getting valid input
 def get_numbered_choice(prompt_text, options_list):
@@ -27,10 +31,7 @@ def display_curses_menu(stdscr, title, options_list):
     current_row_idx = 0
     max_rows, max_cols = stdscr.getmaxyx()
 
-    # Basic color setup (can be expanded)
-    curses.start_color()
-    curses.init_pair(1, curses.COLOR_BLACK, curses.COLOR_WHITE) # Highlighted item
-    curses.init_pair(2, curses.COLOR_WHITE, curses.COLOR_BLACK) # Normal item
+    init_colors() # Pair 1: highlighted item, pair 2: normal item
 
     while True:
         stdscr.clear()
@@ -76,211 +77,334 @@ def display_curses_menu(stdscr, title, options_list):
             stdscr.clear()
             return None # Or a specific value like "[BACK]" if defined in options 
 
-# New 3-Pane Curses Inventory UI
-def display_curses_inventory(stdscr, player, items_module, config_module):
-    curses.curs_set(0)
-    stdscr.nodelay(0)
-    stdscr.timeout(-1)
+# --- Shared curses helpers ---
+# (pair number, foreground, background)
+COLOR_PAIRS = [
+    (1, curses.COLOR_BLACK, curses.COLOR_WHITE),  # Highlighted
+    (2, curses.COLOR_WHITE, curses.COLOR_BLACK),  # Normal
+    (3, curses.COLOR_YELLOW, curses.COLOR_BLACK), # Info Text / Titles
+    (4, curses.COLOR_CYAN, curses.COLOR_BLACK),   # Category Title
+]
 
+def init_colors():
+    """Sets up COLOR_PAIRS once per curses session; a no-op if the pairs are already defined."""
+    if not curses.has_colors():
+        return
+    try:
+        if all(curses.pair_content(pair) == (foreground, background) for pair, foreground, background in COLOR_PAIRS):
+            return
+    except curses.error: # start_color() not called yet in this session
+        pass
     curses.start_color()
-    curses.init_pair(1, curses.COLOR_BLACK, curses.COLOR_WHITE)  # Highlighted
-    curses.init_pair(2, curses.COLOR_WHITE, curses.COLOR_BLACK)  # Normal
-    curses.init_pair(3, curses.COLOR_YELLOW, curses.COLOR_BLACK) # Info Text / Titles
-    curses.init_pair(4, curses.COLOR_CYAN, curses.COLOR_BLACK)   # Category Title
-
-    # Updated categories based on user request
-    categories = ["All Items", "Weapons", "Armor", "Shields", "Consumables", "Scrolls", "Junk"]
-    category_to_type = {
-        "Weapons": ["weapon"],
-        "Armor": ["armor"], # Body armor, helmets, gloves, boots etc.
-        "Shields": ["shield"],
-        "Consumables": ["consumable"], # Potions, food etc.
-        "Scrolls": ["scroll"], # Magical scrolls
-        "Junk": ["junk", "valuable", "trade_good", "crafting_material", "alchemy_ingredient", "reagent", "tool", "quest_item", "book", "trinket"]
-        # "All Items" is special case
-        # Other item types like valuable, tool, quest_item, book, trinket will now fall into "Junk" 
-        # or a new more generic "Miscellaneous" category could be made if preferred.
-        # For now, per user request, only the specified categories are distinct. Other specific types are grouped into Junk for browsing.
-    }
-
-    active_pane = "categories" 
-    current_category_idx = 0
-    current_item_idx = 0
-    
-    cat_pane_w_pct = 0.20
-    item_pane_w_pct = 0.35 # Slightly wider for potentially longer item names + markers
+    for pair, foreground, background in COLOR_PAIRS:
+        curses.init_pair(pair, foreground, background)
 
-    while True:
-        stdscr.clear()
-        max_rows, max_cols = stdscr.getmaxyx()
-
-        cat_pane_width = int(max_cols * cat_pane_w_pct)
-        item_pane_width = int(max_cols * item_pane_w_pct)
-        info_pane_start_x = cat_pane_width + item_pane_width + 2 
-        info_pane_width = max_cols - info_pane_start_x -1
-
-        # --- 1. Draw Category Pane (Left) ---
-        stdscr.attron(curses.color_pair(4) | curses.A_BOLD)
-        stdscr.addstr(1, 1, "Categories".center(cat_pane_width - 2))
-        stdscr.attroff(curses.color_pair(4) | curses.A_BOLD)
-        for i, cat_name in enumerate(categories):
-            style = curses.color_pair(1) if i == current_category_idx and active_pane == "categories" else curses.color_pair(2)
-            stdscr.addstr(3 + i, 1, cat_name.ljust(cat_pane_width - 2)[:cat_pane_width-2], style)
-
-        # --- 2. Filter and Draw Item List Pane (Middle) ---
-        selected_category_name = categories[current_category_idx]
-        filtered_inventory_ids = []
-        if selected_category_name == "All Items":
-            filtered_inventory_ids = list(player['inventory'])
-        else:
-            target_types = category_to_type.get(selected_category_name, [])
-            for item_id in player['inventory']:
-                item_data = items_module.ITEM_DB.get(item_id, {})
-                if item_data.get('type') in target_types:
-                    filtered_inventory_ids.append(item_id)
-        
-        stdscr.attron(curses.color_pair(4) | curses.A_BOLD)
-        stdscr.addstr(1, cat_pane_width + 1, selected_category_name.center(item_pane_width -2))
-        stdscr.attroff(curses.color_pair(4) | curses.A_BOLD)
-
-        if not player['inventory']:
-             stdscr.addstr(3, cat_pane_width + 1, "Inventory is empty.")
-        elif not filtered_inventory_ids:
-            stdscr.addstr(3, cat_pane_width + 1, f"No items in '{selected_category_name}'.")
-        else:
-            for i, item_id in enumerate(filtered_inventory_ids):
-                item_data = items_module.ITEM_DB.get(item_id, {})
-                item_name = item_data.get("name", "Unknown")
-                marker = ""
-                if player.get('equipped_weapon') == item_id: marker = " (W)"
-                elif player.get('equipped_armor') == item_id: marker = " (A)"
-                elif player.get('equipped_shield') == item_id: marker = " (S)" # Shield marker
-                display_name = f"{item_name}{marker}"[:item_pane_width-2]
-                style = curses.color_pair(1) if i == current_item_idx and active_pane == "items" else curses.color_pair(2)
-                stdscr.addstr(3 + i, cat_pane_width + 1, display_name.ljust(item_pane_width -2), style)
-                if 3 + i >= max_rows - 4: break
-
-        # --- 3. Draw Item Info Pane (Right) ---
-        highlighted_item_id_from_list = None
-        if active_pane == "items" and filtered_inventory_ids and 0 <= current_item_idx < len(filtered_inventory_ids):
-            highlighted_item_id_from_list = filtered_inventory_ids[current_item_idx]
-        
-        stdscr.attron(curses.color_pair(3) | curses.A_BOLD)
-        info_title = "--- Item Details ---" 
-        if highlighted_item_id_from_list:
-            info_title = f"--- {items_module.ITEM_DB.get(highlighted_item_id_from_list, {}).get('name', 'Details')} ---"
-        stdscr.addstr(1, info_pane_start_x, info_title.center(info_pane_width-1))
-        stdscr.attroff(curses.color_pair(3) | curses.A_BOLD)
-
-        if highlighted_item_id_from_list:
-            item_data = items_module.ITEM_DB.get(highlighted_item_id_from_list, {})
-            pane_y = 3
-            desc_lines = textwrap.wrap(item_data.get('description', 'N/A'), info_pane_width - 2)
-            for line in desc_lines:
-                if pane_y >= max_rows - 6: break
-                stdscr.addstr(pane_y, info_pane_start_x, line); pane_y += 1
-            pane_y += 1
-            props = [
-                f"Type: {item_data.get('type', 'N/A')}",
-                f"Value: {item_data.get('value', 0)}"
-            ]
-            if item_data.get('type') == 'weapon': props.append(f"Damage: +{item_data.get('damage_bonus', 0)}")
-            # Armor and Shields both provide defense bonus
-            if item_data.get('type') == 'armor' or item_data.get('type') == 'shield': 
-                props.append(f"Defense: +{item_data.get('defense_bonus', 0)}")
-            if item_data.get('effect', {}).get('heal'): props.append(f"Heals: {item_data['effect']['heal']}")
-            if item_data.get('effect', {}).get('cast_spell'): props.append(f"Spell: {item_data['effect']['cast_spell']}")
-            
-            for prop_line in props:
-                if pane_y >= max_rows - 4: break
-                stdscr.addstr(pane_y, info_pane_start_x, prop_line); pane_y += 1
-        
-        # --- 4. Draw Action Hints ---
-        hints_y = max_rows - 2
+@functools.lru_cache(maxsize=512)
+def wrap_text(text, width):
+    """textwrap.wrap, cached: the info pane shows the same few descriptions at the same width over and over."""
+    return tuple(textwrap.wrap(text, width)) if width > 0 else ()
+
+def _put(window, y, x, text, attr=0):
+    """addstr clipped to the window (curses raises on writes past the edge, including the bottom-right cell)."""
+    rows, cols = window.getmaxyx()
+    if 0 <= y < rows and 0 <= x < cols:
+        try:
+            window.addnstr(y, x, text, cols - x, attr)
+        except curses.error:
+            pass
+
+# New 3-Pane Curses Inventory UI
+class InventoryScreen:
+    """Categories | items | item details, plus a line of key hints.
+
+    Each pane is a persistent curses window. A pane is redrawn only when the state it shows differs from
+    what it last drew (its "drawn key"), and all redrawn panes are sent in one curses.doupdate(), so a
+    keypress costs the few cells that actually changed instead of a cleared and repainted screen.
+
+    The item list is virtualized: only the rows inside the viewport (item_top onwards) are drawn, so drawing
+    costs the visible rows whatever the inventory size. PgUp/PgDn/Home/End page through it, and "/" starts
+    an incremental search over item names ("n" repeats the last search).
+    """
+    CAT_PANE_W_PCT = 0.20
+    ITEM_PANE_W_PCT = 0.35 # Slightly wider for potentially longer item names + markers
+
+    def __init__(self, stdscr, player):
+        self.stdscr = stdscr
+        self.player = player
+        self.registry = item_registry.REGISTRY
+        self.categories = item_registry.INVENTORY_CATEGORIES
+        self.active_pane = "categories"
+        self.current_category_idx = 0
+        self.current_item_idx = 0
+        self.item_top = 0 # First item row in the viewport
+        self.search_query = None # Text typed so far while searching, None when not searching
+        self.last_search_query = ""
+        self._search_origin = 0 # Selection when the search started, restored on ESC
+        self._search_matched = True
+        self._search_names = {} # item_id -> lowercased name
+        self.done = False
+        self.windows = {}
+        self._drawn = {} # pane name -> state key it was last drawn for
+        self._layout()
+
+    def _layout(self):
+        """(Re)creates the pane windows for the current terminal size."""
+        self.max_rows, self.max_cols = self.stdscr.getmaxyx()
+        self.cat_pane_width = int(self.max_cols * self.CAT_PANE_W_PCT)
+        self.item_pane_width = int(self.max_cols * self.ITEM_PANE_W_PCT)
+        info_pane_start_x = self.cat_pane_width + self.item_pane_width + 2
+        self.info_pane_width = self.max_cols - info_pane_start_x - 1
+        body_rows = max(1, self.max_rows - 2)
+        self.windows = {
+            "categories": curses.newwin(body_rows, self.cat_pane_width + 1, 0, 0),
+            "items": curses.newwin(body_rows, self.item_pane_width + 1, 0, self.cat_pane_width + 1),
+            "info": curses.newwin(body_rows, max(1, self.max_cols - info_pane_start_x), 0, info_pane_start_x),
+            "hints": curses.newwin(2, self.max_cols, self.max_rows - 2, 0),
+        }
+        self.windows["hints"].keypad(True) # Keys are read from the hint window, which is always up to date
+        self.stdscr.erase()
+        self.stdscr.noutrefresh()
+        self._drawn.clear()
+
+    @property
+    def visible_item_rows(self):
+        return max(1, self.max_rows - 6) # Item rows run from y=3 to max_rows - 4
+
+    def _clamp_viewport(self, item_count):
+        """Keeps the selection inside the list and the viewport around the selection."""
+        self.current_item_idx = max(0, min(self.current_item_idx, item_count - 1))
+        rows = self.visible_item_rows
+        if self.current_item_idx < self.item_top:
+            self.item_top = self.current_item_idx
+        elif self.current_item_idx >= self.item_top + rows:
+            self.item_top = self.current_item_idx - rows + 1
+        self.item_top = max(0, min(self.item_top, item_count - rows))
+
+    # --- Drawing ---
+    def _draw_if_changed(self, pane, key, draw):
+        if self._drawn.get(pane) == key:
+            return
+        window = self.windows[pane]
+        window.erase()
+        draw(window)
+        window.noutrefresh()
+        self._drawn[pane] = key
+
+    def _filtered_ids(self):
+        # Distinct ids (quantities shown as xN); memoized by the inventory until it changes, so this is O(1) per keypress
+        return self.player['inventory'].ids_in_category(self.categories[self.current_category_idx])
+
+    def render(self):
+        """Redraws the panes whose state changed. Returns (filtered item ids, highlighted item id or None)."""
+        inventory = self.player['inventory']
+        filtered_ids = self._filtered_ids()
+        self._clamp_viewport(len(filtered_ids))
+        highlighted = None
+        if self.active_pane == "items" and 0 <= self.current_item_idx < len(filtered_ids):
+            highlighted = filtered_ids[self.current_item_idx]
+        equipment = derived_stats.get_derived_stats(self.player).equipment
+        hints = self._hints(highlighted)
+
+        self._draw_if_changed("categories", (self.current_category_idx, self.active_pane), self._draw_categories)
+        self._draw_if_changed("items", (self.current_category_idx, self.current_item_idx, self.item_top, self.active_pane, inventory.version, equipment),
+                              lambda window: self._draw_items(window, filtered_ids, equipment))
+        self._draw_if_changed("info", (highlighted, self.info_pane_width), lambda window: self._draw_info(window, highlighted))
+        self._draw_if_changed("hints", hints, lambda window: _put(window, 0, 1, hints))
+        curses.doupdate()
+        return filtered_ids, highlighted
+
+    def _draw_categories(self, window):
+        width = self.cat_pane_width - 2
+        _put(window, 1, 1, "Categories".center(width), curses.color_pair(4) | curses.A_BOLD)
+        for i, cat_name in enumerate(self.categories):
+            style = curses.color_pair(1) if i == self.current_category_idx and self.active_pane == "categories" else curses.color_pair(2)
+            _put(window, 3 + i, 1, cat_name.ljust(width)[:width], style)
+
+    def _draw_items(self, window, filtered_ids, equipment):
+        width = self.item_pane_width - 2
+        selected_category_name = self.categories[self.current_category_idx]
+        title = selected_category_name
+        last_visible = min(len(filtered_ids), self.item_top + self.visible_item_rows)
+        if len(filtered_ids) > self.visible_item_rows: # Show where the viewport is
+            title = f"{selected_category_name} {self.item_top + 1}-{last_visible}/{len(filtered_ids)}"
+        _put(window, 1, 0, title.center(width), curses.color_pair(4) | curses.A_BOLD)
+        inventory = self.player['inventory']
+        if not inventory:
+            _put(window, 3, 0, "Inventory is empty.")
+            return
+        if not filtered_ids:
+            _put(window, 3, 0, f"No items in '{selected_category_name}'.")
+            return
+        weapon_id, armor_id, shield_id, trinket_ids = equipment
+        for i in range(self.item_top, last_visible):
+            item_id = filtered_ids[i]
+            marker = ""
+            if weapon_id == item_id: marker = " (W)"
+            elif armor_id == item_id: marker = " (A)"
+            elif shield_id == item_id: marker = " (S)" # Shield marker
+            elif item_id in trinket_ids: marker = " (T)"
+            quantity = inventory.count(item_id)
+            display_name = f"{self.registry.name_of(item_id)}{f' x{quantity}' if quantity > 1 else ''}{marker}"[:width]
+            style = curses.color_pair(1) if i == self.current_item_idx and self.active_pane == "items" else curses.color_pair(2)
+            _put(window, 3 + i - self.item_top, 0, display_name.ljust(width), style)
+
+    def _draw_info(self, window, highlighted):
+        info_title = f"--- {self.registry.name_of(highlighted, 'Details')} ---" if highlighted else "--- Item Details ---"
+        _put(window, 1, 0, info_title.center(self.info_pane_width - 1), curses.color_pair(3) | curses.A_BOLD)
+        if not highlighted:
+            return
+        item_data = self.registry.get(highlighted, {})
+        pane_y = 3
+        for line in wrap_text(item_data.get('description', 'N/A'), self.info_pane_width - 2):
+            if pane_y >= self.max_rows - 6: break
+            _put(window, pane_y, 0, line); pane_y += 1
+        pane_y += 1
+        props = [
+            f"Type: {item_data.get('type', 'N/A')}",
+            f"Value: {item_data.get('value', 0)}"
+        ]
+        if item_data.get('type') == 'weapon': props.append(f"Damage: +{item_data.get('damage_bonus', 0)}")
+        # Armor and Shields both provide defense bonus
+        if item_data.get('type') == 'armor' or item_data.get('type') == 'shield':
+            props.append(f"Defense: +{item_data.get('defense_bonus', 0)}")
+        if item_data.get('effect', {}).get('heal'): props.append(f"Heals: {item_data['effect']['heal']}")
+        if item_data.get('effect', {}).get('cast_spell'): props.append(f"Spell: {item_data['effect']['cast_spell']}")
+        if item_data.get('type') == 'trinket' and item_data.get('effect'):
+            props.append("Worn: " + ", ".join(f"{key.replace('_', ' ')} {value}" for key, value in item_data['effect'].items()))
+        for prop_line in props:
+            if pane_y >= self.max_rows - 4: break
+            _put(window, pane_y, 0, prop_line); pane_y += 1
+
+    def _hints(self, highlighted):
+        if self.search_query is not None:
+            no_match = "" if self._search_matched else " (no match)"
+            return f"Search: {self.search_query}_{no_match}  [Enter] Done | [ESC] Cancel"
         hints = "[ESC] Exit | [Arrows] Navigate Panes/Items"
-        if active_pane == "items" and highlighted_item_id_from_list:
-            item_type = items_module.ITEM_DB.get(highlighted_item_id_from_list, {}).get('type')
-            if item_type == 'consumable' or item_type == 'scroll': 
+        if self.active_pane == "items":
+            hints += " | [PgUp/PgDn] Page | [/] Search"
+        if self.active_pane == "items" and highlighted:
+            item_type = self.registry.type_of(highlighted)
+            if item_type == 'consumable' or item_type == 'scroll':
                 hints += " | [U] Use"
-            elif item_type in ['weapon', 'armor', 'shield']: 
+            elif item_type in ['weapon', 'armor', 'shield', 'trinket']:
                 hints += " | [E] Equip/Unequip"
-        stdscr.addstr(hints_y, 1, hints.ljust(max_cols -2))
+        return hints
 
-        stdscr.refresh()
-        key = stdscr.getch()
-        action_performed_message = None
+    def show_message(self, message):
+        """Shows a message over the whole screen until a key is pressed; the panes are repainted afterwards."""
+        max_rows, max_cols = self.max_rows, self.max_cols
+        self.stdscr.erase()
+        _put(self.stdscr, max_rows // 2, (max_cols - len(message)) // 2 if max_cols > len(message) else 1, message)
+        _put(self.stdscr, max_rows // 2 + 1, (max_cols - 28) // 2 if max_cols > 28 else 1, "Press any key to continue...")
+        self.stdscr.refresh()
+        self.stdscr.getch()
+        self.stdscr.erase()
+        self.stdscr.noutrefresh()
+        self._drawn.clear() # The message covered every pane
 
-        # --- 5. Handle Input ---
-        if active_pane == "categories":
+    # --- Input ---
+    def handle_key(self, key, filtered_ids, highlighted):
+        """Applies one keypress. Returns a message to show, or None."""
+        player = self.player
+        if self.active_pane == "categories":
             if key == curses.KEY_UP:
-                current_category_idx = (current_category_idx - 1) % len(categories)
-                current_item_idx = 0 
+                self.current_category_idx = (self.current_category_idx - 1) % len(self.categories)
+                self.current_item_idx = 0
             elif key == curses.KEY_DOWN:
-                current_category_idx = (current_category_idx + 1) % len(categories)
-                current_item_idx = 0 
+                self.current_category_idx = (self.current_category_idx + 1) % len(self.categories)
+                self.current_item_idx = 0
             elif key == curses.KEY_RIGHT or key == curses.KEY_ENTER or key in [10, 13]:
-                if player['inventory']: active_pane = "items"
-                current_item_idx = 0 
-            elif key == 27: 
-                return
-        elif active_pane == "items":
-            if key == curses.KEY_UP:
-                if filtered_inventory_ids: current_item_idx = (current_item_idx - 1) % len(filtered_inventory_ids)
-            elif key == curses.KEY_DOWN:
-                if filtered_inventory_ids: current_item_idx = (current_item_idx + 1) % len(filtered_inventory_ids)
-            elif key == curses.KEY_LEFT:
-                active_pane = "categories"
-            elif key == 27: 
-                 active_pane = "categories"
-            elif (key == ord('u') or key == ord('U')) and highlighted_item_id_from_list:
-                item_data = items_module.ITEM_DB.get(highlighted_item_id_from_list)
-                item_type = item_data.get('type')
-                if item_type == 'consumable' or item_type == 'scroll':
-                    # Basic use logic for consumables and scrolls
-                    # For scrolls, actual spell casting logic would be more complex
-                    # For now, just acknowledge use and remove if it's a one-time use item
-                    action_performed_message = f"Used {item_data['name']}."
-                    if item_data.get('effect',{}).get('heal'): # Example: simple heal effect
-                         player['health'] = min(player['max_health'], player['health'] + item_data['effect']['heal'])
-                         action_performed_message += f" Healed {item_data['effect']['heal']} HP."
-                    
-                    # Assume scrolls are consumed on use for now
-                    if item_type == 'scroll' or item_data.get("type") == "consumable": 
-                        player['inventory'].remove(highlighted_item_id_from_list)
-                        current_item_idx = max(0, current_item_idx -1) if len(filtered_inventory_ids) == 1 else current_item_idx
-                        if not player['inventory']: active_pane = "categories"
-                else: action_performed_message = "Cannot use this item type."
-            elif (key == ord('e') or key == ord('E')) and highlighted_item_id_from_list:
-                item_data = items_module.ITEM_DB.get(highlighted_item_id_from_list)
-                item_type = item_data.get('type')
-                equip_message_parts = []
-                if item_type == 'weapon':
-                    if player['equipped_weapon'] == highlighted_item_id_from_list: 
-                        player['equipped_weapon'] = None; equip_message_parts.append(f"Unequipped {item_data['name']}.")
-                    else: 
-                        if player['equipped_weapon']: equip_message_parts.append(f"Unequipped {items_module.ITEM_DB[player['equipped_weapon']]['name']}.")
-                        player['equipped_weapon'] = highlighted_item_id_from_list; equip_message_parts.append(f"Equipped {item_data['name']}.")
-                elif item_type == 'armor':
-                    if player['equipped_armor'] == highlighted_item_id_from_list: 
-                        player['equipped_armor'] = None; equip_message_parts.append(f"Unequipped {item_data['name']}.")
-                    else: 
-                        if player['equipped_armor']: equip_message_parts.append(f"Unequipped {items_module.ITEM_DB[player['equipped_armor']]['name']}.")
-                        player['equipped_armor'] = highlighted_item_id_from_list; equip_message_parts.append(f"Equipped {item_data['name']}.")
-                elif item_type == 'shield':
-                    if player['equipped_shield'] == highlighted_item_id_from_list: 
-                        player['equipped_shield'] = None; equip_message_parts.append(f"Unequipped {item_data['name']}.")
-                    else: 
-                        if player['equipped_shield']: equip_message_parts.append(f"Unequipped {items_module.ITEM_DB[player['equipped_shield']]['name']}.")
-                        player['equipped_shield'] = highlighted_item_id_from_list; equip_message_parts.append(f"Equipped {item_data['name']}.")
-                else: equip_message_parts.append("Cannot equip this item type.")
-                action_performed_message = " ".join(equip_message_parts)
-
-        if action_performed_message:
-            stdscr.clear() 
-            stdscr.addstr(max_rows // 2, (max_cols - len(action_performed_message)) // 2 if max_cols > len(action_performed_message) else 1, action_performed_message)
-            stdscr.addstr(max_rows // 2 + 1, (max_cols - 28) // 2 if max_cols > 28 else 1, "Press any key to continue...")
-            stdscr.refresh()
-            stdscr.getch()
-            if not player['inventory']:
-                active_pane = "categories" 
-                current_item_idx = 0 
\ No newline at end of file
+                if player['inventory']: self.active_pane = "items"
+                self.current_item_idx = 0
+            elif key == 27:
+                self.done = True
+            return None
+
+        if self.search_query is not None:
+            self._handle_search_key(key, filtered_ids)
+        elif key == curses.KEY_UP:
+            if filtered_ids: self.current_item_idx = (self.current_item_idx - 1) % len(filtered_ids)
+        elif key == curses.KEY_DOWN:
+            if filtered_ids: self.current_item_idx = (self.current_item_idx + 1) % len(filtered_ids)
+        elif key == curses.KEY_NPAGE:
+            self.current_item_idx += self.visible_item_rows
+            self.item_top += self.visible_item_rows # Clamped by _clamp_viewport on the next render
+        elif key == curses.KEY_PPAGE:
+            self.current_item_idx = max(0, self.current_item_idx - self.visible_item_rows)
+            self.item_top = max(0, self.item_top - self.visible_item_rows)
+        elif key == curses.KEY_HOME:
+            self.current_item_idx = 0
+        elif key == curses.KEY_END:
+            self.current_item_idx = len(filtered_ids) - 1
+        elif key == ord('/'):
+            self.search_query = ""
+            self._search_matched = True
+            self._search_origin = self.current_item_idx
+        elif key == ord('n') and self.last_search_query:
+            self._find(filtered_ids, self.last_search_query, self.current_item_idx + 1)
+        elif key == curses.KEY_LEFT or key == 27:
+            self.active_pane = "categories"
+        elif (key == ord('u') or key == ord('U')) and highlighted:
+            message = character.use_item(player, highlighted)
+            if highlighted not in player['inventory']: # Last one used; its row goes away
+                self.current_item_idx = min(self.current_item_idx, max(0, len(filtered_ids) - 2))
+            if not player['inventory']: self.active_pane = "categories"
+            return message
+        elif (key == ord('e') or key == ord('E')) and highlighted:
+            return character.toggle_equipped(player, highlighted)
+        return None
+
+    def _search_name(self, item_id):
+        name = self._search_names.get(item_id)
+        if name is None:
+            name = self._search_names[item_id] = self.registry.name_of(item_id, item_id).lower()
+        return name
+
+    def _find(self, filtered_ids, query, start):
+        """Selects the first item from `start` on (wrapping around) whose name contains query. Returns True if found."""
+        query = query.lower()
+        count = len(filtered_ids)
+        for offset in range(count):
+            index = (start + offset) % count
+            if query in self._search_name(filtered_ids[index]):
+                self.current_item_idx = index
+                return True
+        return False
+
+    def _handle_search_key(self, key, filtered_ids):
+        if key == 27: # Cancel: back to where the search started
+            self.current_item_idx = self._search_origin
+            self.search_query = None
+        elif key == curses.KEY_ENTER or key in [10, 13]:
+            self.last_search_query = self.search_query or self.last_search_query
+            self.search_query = None
+        elif key in (curses.KEY_BACKSPACE, 127, 8):
+            self.search_query = self.search_query[:-1]
+            # A shorter query can match earlier items again, so search from the origin
+            self._search_matched = self._find(filtered_ids, self.search_query, self._search_origin)
+            if not self._search_matched:
+                self.current_item_idx = self._search_origin
+        elif 32 <= key < 127:
+            self.search_query += chr(key)
+            # Items between the origin and the current match did not contain the shorter query, so they can't
+            # contain this one: continue from the current match instead of rescanning
+            self._search_matched = self._find(filtered_ids, self.search_query, self.current_item_idx)
+
+    def run(self):
+        curses.curs_set(0)
+        init_colors()
+        while not self.done:
+            filtered_ids, highlighted = self.render()
+            key = self.windows["hints"].getch()
+            if key == curses.KEY_RESIZE:
+                self._layout()
+                continue
+            message = self.handle_key(key, filtered_ids, highlighted)
+            if message:
+                self.show_message(message)
+                if not self.player['inventory']:
+                    self.active_pane = "categories"
+                    self.current_item_idx = 0
+
+def display_curses_inventory(stdscr, player, items_module, config_module):
+    InventoryScreen(stdscr, player).run()